@@ -11,7 +11,8 @@ from acispy.plots import DatePlot, MultiDatePlot, \
     HistogramPlot, make_dateplots, DummyDatePlot
 from acispy.thermal_models import SimulateECSRun, \
     ThermalModelRunner, ThermalModelFromLoad, \
-    ThermalModelFromRun, SimulateSingleState
+    ThermalModelFromRun, SimulateSingleState, \
+    MultiThermalModelRunner
 from acispy.load_review import ACISLoadReview
 
 
@@ -0,0 +1,123 @@
+"""
+Cached lookups of engineering archive metadata, such as the time
+range of the data for a MSID and the last value of a MSID before a
+given time. These are made many times when setting up datasets and
+thermal models, and each one reads from the archive files, so the
+results are kept for ``archive_ttl`` seconds.
+"""
+import time
+import Ska.engarchive.fetch_sci as fetch
+from cxotime import CxoTime
+
+# The number of seconds for which archive lookups are reused
+archive_ttl = 600.0
+
+_time_ranges = {}
+_last_values = {}
+
+
+def is_fresh(timestamp):
+    """
+    Return whether archive data looked up at *timestamp*, as returned
+    by ``time.time()``, are recent enough to be reused.
+    """
+    return time.time() - timestamp < archive_ttl
+
+
+def _lookup(cache, key):
+    entry = cache.get(key, None)
+    if entry is not None and is_fresh(entry[0]):
+        return entry[1]
+    return None
+
+
+def get_time_ranges(msids, format='secs'):
+    """
+    Get the time ranges of the data in the engineering archive for
+    a list of MSIDs.
+
+    Parameters
+    ----------
+    msids : list of strings
+        The MSIDs to look up.
+    format : string, optional
+        The format of the times, "secs" or "date". Default: "secs"
+
+    Returns
+    -------
+    A dict of (start, stop) tuples keyed by MSID.
+    """
+    ranges = {}
+    for msid in msids:
+        key = msid.lower()
+        trange = _lookup(_time_ranges, key)
+        if trange is None:
+            trange = tuple(fetch.get_time_range(key, format='secs'))
+            _time_ranges[key] = (time.time(), trange)
+        if format == 'date':
+            trange = tuple(CxoTime(trange).date)
+        ranges[msid] = trange
+    return ranges
+
+
+def get_time_range(msid, format='secs'):
+    """
+    Get the time range of the data in the engineering archive for
+    a single MSID, as a (start, stop) tuple. See ``get_time_ranges``.
+    """
+    return get_time_ranges([msid], format=format)[msid]
+
+
+def get_last_values(msids, t, window=700.0):
+    """
+    Get the last values of a list of MSIDs in the engineering archive
+    at or before the time *t*. All of the MSIDs which have not been
+    looked up recently are fetched together.
+
+    Parameters
+    ----------
+    msids : list of strings
+        The MSIDs to look up.
+    t : string or float
+        The time to look up the values at.
+    window : float, optional
+        The length of time in seconds before *t* to search for the
+        values. Default: 700.0
+
+    Returns
+    -------
+    A dict of values keyed by MSID.
+    """
+    t = CxoTime(t).secs
+    values = {}
+    missing = []
+    for msid in msids:
+        value = _lookup(_last_values, (msid.lower(), t, window))
+        if value is None:
+            missing.append(msid)
+        else:
+            values[msid] = value
+    if len(missing) > 0:
+        data = fetch.MSIDset([msid.lower() for msid in missing], t - window, t)
+        now = time.time()
+        for msid in missing:
+            value = data[msid.lower()].vals[-1]
+            _last_values[msid.lower(), t, window] = (now, value)
+            values[msid] = value
+    return values
+
+
+def get_last_value(msid, t, window=700.0):
+    """
+    Get the last value of a single MSID in the engineering archive at
+    or before the time *t*. See ``get_last_values``.
+    """
+    return get_last_values([msid], t, window=window)[msid]
+
+
+def clear_archive_cache():
+    """
+    Forget all cached archive lookups.
+    """
+    _time_ranges.clear()
+    _last_values.clear()
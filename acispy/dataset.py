@@ -1,16 +1,18 @@
 from acispy.msids import MSIDs, CombinedMSIDs, ConcatenatedMSIDs
 from acispy.states import States, cmd_state_codes
 from acispy.model import Model
-from acispy.units import APQuantity, APStringArray
+from acispy.units import APQuantity, APStringArray, Quantity
 from acispy.fields import create_builtin_derived_msids, \
-    DerivedField, FieldContainer, OutputFieldFunction, \
+    DerivedField, FieldContainer, \
     OutputFieldsNotFound, create_builtin_derived_states
-from acispy.time_series import TimeSeriesData, EmptyTimeSeries
-from acispy.utils import get_display_name, moving_average, \
-    ensure_list
+from acispy.time_series import TimeSeriesData, EmptyTimeSeries, \
+    copy_container
+from acispy.utils import moving_average, ensure_list, \
+    rolling_stats, binned_stats, rolling_window_key
 from acispy.units import get_units
+from acispy.archive import get_time_ranges
 import numpy as np
-import Ska.engarchive.fetch_sci as fetch
+import weakref
 from cxotime import CxoTime
 
 
@@ -27,6 +29,7 @@ class Dataset:
             self.model = model
             self._populate_fields("model", self.model)
         else:
+            self._model_types = list(model.keys())
             for key, value in model.items():
                 setattr(self, key, value)
                 self._populate_fields(key, value)
@@ -42,18 +45,14 @@ class Dataset:
         self.state_codes.update(cmd_state_codes)
         self._times = {}
         self._dates = {}
+        self._state_index_cache = {}
+        self._state_code_cache = {}
+        self._rolling_stats = {}
         self._checked_fields = []
 
     def _populate_fields(self, ftype, obj):
         for fname in obj.keys():
-            func = OutputFieldFunction(ftype, fname)
-            unit = str(getattr(obj[fname], "unit", ""))
-            display_name = get_display_name(ftype, fname)
-            df = DerivedField(ftype, fname, func, unit,
-                              display_name=display_name)
-            self.fields.output_fields[ftype, fname] = df
-            if ftype not in self.fields.types:
-                self.fields.types.append(ftype)
+            self.fields.add_output_field(ftype, fname, obj)
             self.field_list.append((ftype, fname))
 
     def __getitem__(self, item):
@@ -97,6 +96,52 @@ class Dataset:
             checked_field = field
         return checked_field
 
+    def window(self, tstart, tstop):
+        """
+        Return a new Dataset of the same type restricted to the times
+        between *tstart* and *tstop*. The MSIDs, states, and model data
+        of the new Dataset are views which share their data with this
+        one, and derived fields are evaluated on the window only when
+        they are accessed. States which overlap the window are included.
+
+        Parameters
+        ----------
+        tstart : string or float
+            The start time of the window in YYYY:DOY:HH:MM:SS format
+            or in seconds.
+        tstop : string or float
+            The stop time of the window in YYYY:DOY:HH:MM:SS format
+            or in seconds.
+
+        Examples
+        --------
+        >>> for day in range(30):
+        ...     dsw = ds.window(t0+day*86400.0, t0+(day+1)*86400.0)
+        ...     print(dsw["1dpamzt"].max())
+        """
+        tstart = CxoTime(tstart).secs
+        tstop = CxoTime(tstop).secs
+        msids = self.msids.window(tstart, tstop)
+        states = self.states.window(tstart, tstop)
+        if hasattr(self, "_model_types"):
+            model = dict((ftype, getattr(self, ftype).window(tstart, tstop))
+                         for ftype in self._model_types)
+        else:
+            model = self.model.window(tstart, tstop)
+        # The window has the same type as this Dataset, and copies of
+        # its other attributes, such as model names and limits
+        ds = type(self).__new__(type(self))
+        Dataset.__init__(ds, msids, states, model)
+        for attr, value in self.__dict__.items():
+            if attr not in ds.__dict__:
+                setattr(ds, attr, copy_container(value))
+        ds.fields.derived_fields.update(self.fields.derived_fields)
+        for ftype in self.fields.types:
+            if ftype not in ds.fields.types:
+                ds.fields.types.append(ftype)
+        ds.state_codes = dict(self.state_codes)
+        return ds
+
     @property
     def derived_field_list(self):
         return list(self.fields.derived_fields.keys())
@@ -228,6 +273,173 @@ class Dataset:
                                display_name=display_name, 
                                depends=[(ftype, fname)])
 
+    def add_rolling_fields(self, field, windows, stats="mean"):
+        """
+        Add new fields from rolling statistics of another over one or
+        more windows. All of the statistics for a field are computed
+        together the first time any of the new fields is accessed, and
+        bad samples are excluded from the windows.
+
+        The new fields are named "{stat}_{window}_{name}", e.g.
+        "max_1h_1dpamzt" or "mean_10_1dpamzt". Quantiles are named
+        like "q90_1h_1dpamzt".
+
+        Parameters
+        ----------
+        field : string or (type, name) tuple
+            The field to compute the statistics of.
+        windows : integer, string, Quantity, or list of these
+            The window lengths. An integer is a number of samples,
+            while a string such as "1 h" or a Quantity is a length of
+            time, which is appropriate for irregularly sampled data.
+        stats : string, float, or list of these, optional
+            The statistics to compute. Any of "mean", "min", "max",
+            "std", or a float between 0 and 1 for a quantile.
+            Default: "mean"
+
+        Examples
+        --------
+        >>> ds.add_rolling_fields("1dpamzt", ["1 h", "1 d"],
+        ...                       stats=["mean", "max", 0.95])
+        >>> ds.add_rolling_fields(("msids", "1dpicacu"), [10, 30], stats="std")
+        """
+        ftype, fname = self._determine_field(field)
+        windows = ensure_list(windows)
+        stats = ensure_list(stats)
+        wvals = []
+        wlabels = []
+        for window in windows:
+            if isinstance(window, (int, np.integer)):
+                wvals.append(int(window))
+                wlabels.append(str(window))
+            else:
+                if isinstance(window, str):
+                    label = window.replace(" ", "")
+                    window = Quantity(window)
+                else:
+                    label = f"{window.value:g}{window.unit}"
+                wvals.append(float(window.to_value("s")))
+                wlabels.append(label)
+        key = (ftype, fname, tuple(rolling_window_key(w) for w in wvals), 
+               tuple(stats))
+        def _compute(ds):
+            if key not in ds._rolling_stats:
+                v = ds[ftype, fname]
+                t = v.times.value
+                if t.ndim == 2:
+                    t = t[0]
+                ds._rolling_stats[key] = rolling_stats(v.value, t, wvals,
+                                                       stats=stats, mask=v.mask)
+            return ds._rolling_stats[key]
+        units = self.fields[ftype, fname].units
+        display_name = self.fields[ftype, fname].display_name
+        for stat in stats:
+            if isinstance(stat, str):
+                slabel = stat
+                sname = stat.capitalize()
+            else:
+                slabel = f"q{100*stat:g}"
+                sname = f"{100*stat:g}% Quantile"
+            for wval, wlabel in zip(wvals, wlabels):
+                def _stat(ds, stat=stat, wval=wval):
+                    v = ds[ftype, fname]
+                    ret = _compute(ds)[(stat,) + rolling_window_key(wval)]
+                    return APQuantity(ret, v.times, unit=units,
+                                      mask=np.isfinite(ret))
+                self.add_derived_field(ftype, f"{slabel}_{wlabel}_{fname}",
+                                       _stat, units,
+                                       display_name=f"Rolling {sname} ({wlabel}) {display_name}",
+                                       depends=[(ftype, fname)])
+
+    def resample(self, fields, dt=None, how="mean", bins=None,
+                 tstart=None, tstop=None):
+        """
+        Aggregate fields into time bins, e.g. hourly maxima or
+        per-orbit means, and return the results in a new Dataset.
+        Bad samples are excluded. All of the new fields share one set
+        of times, the centers of the bins.
+
+        The new fields have the same field type as the original fields
+        and are named "{how}_{name}", e.g. ("msids", "max_1dpamzt").
+
+        Parameters
+        ----------
+        fields : (type, name) tuple or list of tuples
+            The fields to aggregate. States cannot be resampled.
+        dt : float, string, or Quantity, optional
+            The width of the bins. A float is taken to be in seconds.
+            Either this or *bins* must be set.
+        how : string or list of strings, optional
+            The aggregations to compute. Any of "mean", "min", "max",
+            "std", or "count". Default: "mean"
+        bins : array_like, optional
+            The edges of the bins, as times in seconds or dates, e.g.
+            orbit boundaries. Overrides *dt*.
+        tstart : string or float, optional
+            The start time of the first bin when *dt* is set. Default:
+            the earliest time among the fields.
+        tstop : string or float, optional
+            The time at which the bins stop when *dt* is set. Default:
+            the latest time among the fields.
+
+        Examples
+        --------
+        >>> ds_hr = ds.resample(("msids", "1dpamzt"), dt="1 h",
+        ...                     how=["mean", "max", "count"])
+        >>> ds_hr["msids", "max_1dpamzt"]
+        """
+        fields = [self._determine_field(field) for field in ensure_list(fields)]
+        how = ensure_list(how)
+        for ftype, fname in fields:
+            if ftype == "states":
+                raise RuntimeError(f"Cannot resample the state '{fname}'!")
+        if bins is None:
+            if dt is None:
+                raise RuntimeError("Either 'dt' or 'bins' must be specified!")
+            if isinstance(dt, str):
+                dt = Quantity(dt)
+            if isinstance(dt, Quantity):
+                dt = dt.to_value("s")
+            if tstart is None:
+                tstart = min(self.times(*field).value[0] for field in fields)
+            else:
+                tstart = CxoTime(tstart).secs
+            if tstop is None:
+                tstop = max(self.times(*field).value[-1] for field in fields)
+            else:
+                tstop = CxoTime(tstop).secs
+            nbins = max(int(np.ceil((tstop - tstart) / dt)), 1)
+            bins = tstart + dt * np.arange(nbins + 1)
+        else:
+            bins = CxoTime(bins).secs
+        times = Quantity(0.5 * (bins[1:] + bins[:-1]), "s")
+        tables = {}
+        for ftype, fname in fields:
+            v = self[ftype, fname]
+            if v.dtype.char in ['S', 'U']:
+                raise RuntimeError(f"Cannot resample the string-valued "
+                                   f"field ('{ftype}', '{fname}')!")
+            out = binned_stats(v.value, v.times.value, bins, how=how,
+                               mask=v.mask)
+            if ftype not in tables:
+                tables[ftype] = TimeSeriesData()
+            for agg in how:
+                unit = "" if agg == "count" else v.unit
+                mask = None if agg == "count" else np.isfinite(out[agg])
+                tables[ftype].table[f"{agg}_{fname}"] = \
+                    APQuantity(out[agg], times, unit=unit, mask=mask,
+                               copy=False)
+        msids = tables.pop("msids", EmptyTimeSeries())
+        msids.state_codes = {}
+        msids.derived_msids = []
+        if len(tables) == 0:
+            model = EmptyTimeSeries()
+        elif list(tables.keys()) == ["model"]:
+            model = tables["model"]
+        else:
+            model = tables
+        return Dataset(msids, EmptyTimeSeries(), model)
+
     def map_state_to_msid(self, state, msid, ftype="msids"):
         """
         Create a new derived field by interpolating a state to the times of
@@ -235,8 +447,8 @@ class Dataset:
 
         Parameters
         ----------
-        state : string
-            The state to be interpolated.
+        state : string or list of strings
+            The state or states to be interpolated.
         msid : string
             The msid or model component to interpolate the state to.
         ftype : string, optional
@@ -245,24 +457,51 @@ class Dataset:
         Examples
         --------
         >>> ds.map_state_to_msid("ccd_count", "1dpamzt")
+        >>> ds.map_state_to_msid(["pitch", "off_nom_roll"], "1dpamzt")
         """
-        state = state.lower()
         msid = msid.lower()
         ftype = ftype.lower()
+        for st in ensure_list(state):
+            self._map_state_to_msid(st.lower(), msid, ftype)
+
+    def _map_state_to_msid(self, state, msid, ftype):
         units = get_units("states", state)
         def _state(ds):
             msid_times = ds.times(ftype, msid)
-            state_times = ds.times("states", state)[1]
-            indexes = np.searchsorted(state_times, msid_times)
-            v = ds["states", state][indexes].value
-            if v.dtype.char in ['S', 'U']:
-                return APStringArray(v, msid_times)
+            indexes = ds._state_indices(ftype, msid, state)
+            v = ds["states", state]
+            if isinstance(v, APStringArray):
+                # Index the codes, which keeps the categories of the state
+                return APStringArray.from_codes(v.codes[indexes], v.categories,
+                                                msid_times)
             else:
-                return APQuantity(v, msid_times, unit=units)
+                return APQuantity(v.value[indexes], msid_times, unit=units)
         self.add_derived_field(ftype, state, _state, units,
                                display_name=self.fields["states", state].display_name,
                                depends=[(ftype, msid)])
 
+    def _state_indices(self, ftype, msid, state):
+        # The indices which map the states onto the times of a MSID or
+        # model component depend only on the two time bases, so they are
+        # computed once per pair and shared by every mapped state.
+        msid_times = self.times(ftype, msid)
+        state_times = self.times("states", state)
+        key = (id(msid_times), id(state_times))
+        cache = self._state_index_cache
+        entry = cache.get(key, None)
+        if entry is not None and entry[0]() is msid_times \
+                and entry[1]() is state_times:
+            return entry[2]
+        indexes = np.searchsorted(state_times.value[1], msid_times.value)
+        # The entry goes away with either of the time arrays
+        def _remove(ref, key=key):
+            entry = cache.get(key, None)
+            if entry is not None and (entry[0] is ref or entry[1] is ref):
+                del cache[key]
+        cache[key] = (weakref.ref(msid_times, _remove),
+                      weakref.ref(state_times, _remove), indexes)
+        return indexes
+
     def add_diff_data_model_field(self, msid, ftype_model="model"):
         r"""
 
@@ -339,12 +578,15 @@ class Dataset:
         """
         from astropy.table import Table
         fields = ensure_list(fields)
-        base_times = self.dates(*fields[0])
+        base_times = self.times(*fields[0])
         if mask is None:
             mask = slice(None, None, None)
         if len(fields) > 1:
             for field in fields[1:]:
-                if not np.all(base_times == self.dates(*field)):
+                # Shared time bases can be detected by identity
+                if self.times(*field) is base_times:
+                    continue
+                if not np.all(self.dates(*fields[0]) == self.dates(*field)):
                     raise RuntimeError("To write MSIDs, all of the times should be the same," +
                                        "but '%s', '%s' does not have the same " % field +
                                        "set of times as '%s', '%s'!" % (fields[0][0], fields[0][1]))
@@ -733,10 +975,7 @@ class TelemData(Dataset):
         msids = ensure_list(msids)
         tstart = CxoTime(tstart).secs
         tstop = CxoTime(tstop).secs
-        tmid = 1.0e99
-        for msid in msids:
-            tm = fetch.get_time_range(msid, format="secs")[-1]
-            tmid = min(tmid, tm)
+        tmid = min(trange[-1] for trange in get_time_ranges(msids).values())
         tmid = CxoTime(tmid).secs
         if tmid < tstop:
             msids1 = MSIDs.from_database(msids, tstart, tstop=tmid,
@@ -1,6 +1,9 @@
 from acispy.units import APQuantity, APStringArray
+from acispy.utils import mylog, get_display_name, savez_atomic
 import numpy as np
-from itertools import count
+import atexit
+import os
+import zipfile
 from acis_taco import calc_earth_vis
 
 builtin_deps = {("states", "grating"): [("states", "hetg"),
@@ -67,20 +70,227 @@ class FieldContainer:
         self.output_fields = {}
         self.derived_fields = {}
         self.types = []
+        self._pending_fields = {}
+
+    def add_output_field(self, ftype, fname, obj):
+        """
+        Register the output field *fname* of *obj*. The units and
+        display name of the field are determined on first use.
+        """
+        self._pending_fields[ftype, fname] = obj
+        if ftype not in self.types:
+            self.types.append(ftype)
+
+    def _build_output_field(self, item):
+        ftype, fname = item
+        obj = self._pending_fields.pop(item)
+        func = OutputFieldFunction(ftype, fname)
+        unit = str(getattr(obj[fname], "unit", ""))
+        display_name = get_display_name(ftype, fname)
+        df = DerivedField(ftype, fname, func, unit,
+                          display_name=display_name)
+        self.output_fields[ftype, fname] = df
+        return df
 
     def __getitem__(self, item):
         if item in self.derived_fields:
             return self.derived_fields[item]
         elif item in self.output_fields:
             return self.output_fields[item]
+        elif item in self._pending_fields:
+            return self._build_output_field(item)
         else:
             raise KeyError(item)
 
     def __contains__(self, item):
-        return item in self.output_fields or item in self.derived_fields
+        return item in self.output_fields or item in self.derived_fields \
+            or item in self._pending_fields
 
     def list_all_fields(self):
-        return list(self.output_fields.keys())+list(self.derived_fields.keys())
+        return list(self.output_fields.keys())+list(self._pending_fields.keys()) + \
+            list(self.derived_fields.keys())
+
+
+def calc_earth_solid_angle(ephem, q_att):
+    """
+    Compute the effective earth solid angle in the ACIS radiator
+    field of view for a single ephemeris position *ephem* (in m)
+    and attitude quaternion *q_att*.
+    """
+    q_norm = np.sqrt(np.sum(q_att ** 2))
+    if q_norm < 0.9:
+        q_att = np.array([0.0, 0.0, 0.0, 1.0])
+    else:
+        q_att = q_att / q_norm
+    _, illums, _ = calc_earth_vis(ephem, q_att)
+    return illums.sum()
+
+
+class EarthVisCache:
+    """
+    A cache of earth solid angles keyed by the quantized ephemeris
+    position and attitude quaternion. Samples which fall into the
+    same quantization cell share one call to calc_earth_vis(), which
+    is made at the center of the cell so that results do not depend
+    on the order in which samples are seen. This means that the
+    cached values differ slightly from those computed at the exact
+    ephemeris and attitude of each sample, by an amount which depends
+    on *ephem_tol* and *q_tol*.
+
+    New entries are written to the .npz file in batches of
+    *save_every* and when :meth:`flush` is called. The cache turned
+    on with :func:`~acispy.fields.enable_earth_vis_cache` is also
+    flushed at exit.
+
+    Parameters
+    ----------
+    filename : string, optional
+        The path to a .npz file to persist the cache to between
+        sessions. The ".npz" suffix is added if it is missing.
+        Default: None, which keeps the cache in memory only.
+    ephem_tol : float, optional
+        The quantization step for the ephemeris position in m.
+        Default: 1000.0
+    q_tol : float, optional
+        The quantization step for the attitude quaternion components.
+        Default: 1.0e-4
+    save_every : integer, optional
+        The number of new entries after which the cache is written
+        to disk. Default: 10000
+    """
+    def __init__(self, filename=None, ephem_tol=1000.0, q_tol=1.0e-4,
+                 save_every=10000):
+        if filename is not None:
+            filename = str(filename)
+            if not filename.endswith(".npz"):
+                filename += ".npz"
+        self.filename = filename
+        self.ephem_tol = ephem_tol
+        self.q_tol = q_tol
+        self.save_every = save_every
+        self.table = {}
+        self._num_unsaved = 0
+        if filename is not None:
+            if os.path.exists(filename):
+                self._load()
+
+    def _load(self):
+        try:
+            f = np.load(self.filename)
+        except (OSError, ValueError, EOFError, zipfile.BadZipFile):
+            mylog.warning(f"The earth solid angle cache {self.filename} "
+                          f"could not be read. It will be overwritten.")
+            return
+        with f:
+            if f["ephem_tol"] != self.ephem_tol or f["q_tol"] != self.q_tol:
+                mylog.warning(f"The earth solid angle cache {self.filename} "
+                              f"was made with different tolerances. "
+                              f"It will be overwritten.")
+                return
+            for key, value in zip(f["keys"], f["values"]):
+                self.table[tuple(key)] = value
+
+    def save(self):
+        """
+        Write the cache to disk, if a filename was given.
+        """
+        if self.filename is None:
+            return
+        keys = np.array(list(self.table.keys()), dtype="int64").reshape(-1, 7)
+        values = np.array(list(self.table.values()), dtype="float64")
+        # Sessions may share one cache file, so it is replaced as a
+        # whole rather than written in place
+        savez_atomic(self.filename, keys=keys, values=values,
+                     ephem_tol=self.ephem_tol, q_tol=self.q_tol)
+        self._num_unsaved = 0
+
+    def flush(self):
+        """
+        Write the cache to disk if there are entries which have
+        not been saved yet.
+        """
+        if self._num_unsaved > 0:
+            self.save()
+
+    def calc(self, ephems, q_atts):
+        """
+        Return the earth solid angles for arrays of ephemeris
+        positions *ephems* (shape (N, 3)) and attitude quaternions
+        *q_atts* (shape (N, 4)), computing only those cells which
+        are not already in the cache.
+        """
+        keys = np.hstack([np.round(ephems / self.ephem_tol),
+                          np.round(q_atts / self.q_tol)]).astype("int64")
+        ukeys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        values = np.empty(ukeys.shape[0])
+        num_new = 0
+        for i, key in enumerate(ukeys):
+            k = tuple(key)
+            if k not in self.table:
+                self.table[k] = calc_earth_solid_angle(key[:3]*self.ephem_tol,
+                                                       key[3:]*self.q_tol)
+                num_new += 1
+            values[i] = self.table[k]
+        self._num_unsaved += num_new
+        if self._num_unsaved >= self.save_every:
+            self.flush()
+        return values[inverse.ravel()]
+
+
+_earth_vis_cache = None
+
+
+def _flush_earth_vis_cache():
+    if _earth_vis_cache is not None:
+        _earth_vis_cache.flush()
+
+
+atexit.register(_flush_earth_vis_cache)
+
+
+def enable_earth_vis_cache(filename=None, ephem_tol=1000.0, q_tol=1.0e-4,
+                           save_every=10000):
+    """
+    Turn on caching of the earth solid angles computed for the
+    "earth_solid_angle" derived field. See
+    :class:`~acispy.fields.EarthVisCache` for how the cached values
+    differ from those computed for each sample.
+
+    Parameters
+    ----------
+    filename : string, optional
+        The path to a .npz file to persist the cache to between
+        sessions. Default: None, which keeps the cache in memory only.
+    ephem_tol : float, optional
+        The quantization step for the ephemeris position in m.
+        Default: 1000.0
+    q_tol : float, optional
+        The quantization step for the attitude quaternion components.
+        Default: 1.0e-4
+    save_every : integer, optional
+        The number of new entries after which the cache is written
+        to disk. Default: 10000
+
+    Examples
+    --------
+    >>> from acispy.fields import enable_earth_vis_cache
+    >>> enable_earth_vis_cache("earth_vis_cache.npz", ephem_tol=500.0)
+    """
+    global _earth_vis_cache
+    _flush_earth_vis_cache()
+    _earth_vis_cache = EarthVisCache(filename=filename, ephem_tol=ephem_tol,
+                                     q_tol=q_tol, save_every=save_every)
+    return _earth_vis_cache
+
+
+def disable_earth_vis_cache():
+    """
+    Turn off caching of earth solid angles, writing any unsaved
+    entries to disk first.
+    """
+    global _earth_vis_cache
+    _flush_earth_vis_cache()
+    _earth_vis_cache = None
 
 
 def create_builtin_derived_states(dset):
@@ -162,21 +372,15 @@ def create_builtin_derived_msids(dset):
     if "earth_solid_angle" in dset.msids.derived_msids:
         def _earth_solid_angle(ds):
             # Collect individual MSIDs for use in calc_earth_vis()
-            ephem_xyzs = [ds["msids", f"orbitephem0_{x}"]
-                          for x in "xyz"]
-            aoattqt_1234s = [ds["msids",f"aoattqt{x}"]
-                             for x in range(1, 5)]
-            ephems = np.array([x.value for x in ephem_xyzs]).transpose()
-            q_atts = np.array([x.value for x in aoattqt_1234s]).transpose()
-            ret = np.empty(ds["msids", "orbitephem0_x"].shape, dtype=float)
-            for i, ephem, q_att in zip(count(), ephems, q_atts):
-                q_norm = np.sqrt(np.sum(q_att ** 2))
-                if q_norm < 0.9:
-                    q_att = np.array([0.0, 0.0, 0.0, 1.0])
-                else:
-                    q_att = q_att / q_norm
-                _, illums, _ = calc_earth_vis(ephem, q_att)
-                ret[i] = illums.sum()
+            ephems = np.array([ds["msids", f"orbitephem0_{x}"].value
+                               for x in "xyz"]).transpose()
+            q_atts = np.array([ds["msids", f"aoattqt{x}"].value
+                               for x in range(1, 5)]).transpose()
+            if _earth_vis_cache is None:
+                ret = np.array([calc_earth_solid_angle(ephem, q_att)
+                                for ephem, q_att in zip(ephems, q_atts)])
+            else:
+                ret = _earth_vis_cache.calc(ephems, q_atts)
             return APQuantity(ret, ds.msids["orbitephem0_x"].times, "sr")
         dset.add_derived_field("msids", "earth_solid_angle", _earth_solid_angle,
                                "sr", display_name="Effective Earth Solid Angle",
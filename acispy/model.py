@@ -2,7 +2,8 @@ import requests
 from astropy.io import ascii
 import Ska.Numpy
 from acispy.utils import mylog, find_load
-from acispy.units import APQuantity, Quantity, get_units
+from acispy.units import APQuantity, Quantity, get_units, \
+    intern_times, make_quantity
 from acispy.utils import ensure_list
 from acispy.time_series import TimeSeriesData
 import numpy as np
@@ -24,19 +25,21 @@ class Model(TimeSeriesData):
     def from_hdf5(cls, g):
         table = {}
         for k in g:
-            times = Quantity(g[k].attrs["times"])
+            times = intern_times(g[k].attrs["times"])
             table[k] = APQuantity(g[k][()], times, g[k].attrs["unit"],
                                   mask=g[k].attrs.get("mask", None))
         return cls(table=table)
 
     @classmethod
-    def from_xija(cls, model, components, interp_times=None, masks=None):
+    def from_xija(cls, model, components, interp_times=None, masks=None,
+                  precision="full"):
         if masks is None:
             masks = {}
         if interp_times is None:
             t = model.times
         else:
             t = interp_times
+        times = intern_times(t)
         table = {}
         for k in components:
             if k == "roll":
@@ -61,8 +64,8 @@ class Model(TimeSeriesData):
                 v = mvals
             else:
                 v = Ska.Numpy.interpolate(mvals, model.times, interp_times)
-            times = Quantity(t, "s")
-            table[key] = APQuantity(v, times, unit, dtype=v.dtype, mask=mask)
+            table[key] = make_quantity(v, times, unit, mask=mask,
+                                       precision=precision)
         return cls(table=table)
 
     @classmethod
@@ -97,7 +100,7 @@ class Model(TimeSeriesData):
             else:
                 idxs = np.logical_and(table["time"] >= time_range[0],
                                       table["time"] <= time_range[1])
-            times = Quantity(table["time"][idxs], 's')
+            times = intern_times(table["time"][idxs])
             data[comp] = APQuantity(table[table_key].data[idxs], times,
                                     get_units("model", comp), 
                                     dtype=table[table_key].data.dtype)
@@ -109,14 +112,14 @@ class Model(TimeSeriesData):
         table = ascii.read(temps_file)
         comp = list(table.keys())[-1]
         key = "fptemp_11" if comp == "fptemp" else comp
-        times = Quantity(table["time"], 's')
+        times = intern_times(table["time"])
         data[key] = APQuantity(table[comp].data, times, 
                                get_units("model", key), 
                                dtype=table[comp].data.dtype)
         if esa_file is not None:
             etable = ascii.read(esa_file)
             key = "earth_solid_angle"
-            times = Quantity(etable["time"], 's')
+            times = intern_times(etable["time"])
             data[key] = APQuantity(etable[key].data, times,
                                    get_units("model", key),
                                    dtype=etable[key].data.dtype)
@@ -1,7 +1,7 @@
 from acispy.utils import mit_trans_table, ensure_list, \
     get_state_codes
 from acispy.units import get_units, APQuantity, APStringArray, \
-    Quantity
+    intern_times, make_quantity
 import Ska.engarchive.fetch_sci as fetch
 from astropy.io import ascii
 import numpy as np
@@ -26,28 +26,32 @@ def check_depends(msids):
 
 class MSIDs(TimeSeriesData):
     def __init__(self, table, times, state_codes=None, masks=None,
-                 derived_msids=None):
+                 derived_msids=None, precision="full"):
         super(MSIDs, self).__init__()
         if state_codes is None:
             state_codes = {}
         if masks is None:
             masks = {}
         for k, v in table.items():
-            mask = masks.get(k, None)
-            t = Quantity(times[k], "s")
-            if v.dtype.char in ['S', 'U']:
-                self.table[k] = APStringArray(v, t, mask=mask)
-            else:
-                unit = get_units("msids", k)
-                self.table[k] = APQuantity(v, t, unit=unit, dtype=v.dtype,
-                                           mask=mask)
+            self.table.add_lazy(k, self._make_field, v, times[k],
+                                masks.get(k, None), precision)
         self.state_codes = state_codes
         if derived_msids is None:
             derived_msids = []
         self.derived_msids = derived_msids
 
+    @staticmethod
+    def _make_field(k, v, times, mask, precision):
+        # Units are only looked up once a MSID is actually accessed
+        t = intern_times(times)
+        if v.dtype.char in ['S', 'U']:
+            return APStringArray(v, t, mask=mask)
+        else:
+            unit = get_units("msids", k)
+            return make_quantity(v, t, unit, mask=mask, precision=precision)
+
     @classmethod
-    def from_hdf5(cls, g):
+    def from_hdf5(cls, g, precision="full"):
         table = {}
         times = {}
         masks = {}
@@ -59,10 +63,11 @@ class MSIDs(TimeSeriesData):
         state_codes = g.attrs.get("state_codes", None)
         derived_msids = g.attrs.get("derived_msids", None)
         return cls(table, times, masks=masks, state_codes=state_codes,
-                   derived_msids=derived_msids)
+                   derived_msids=derived_msids, precision=precision)
 
     @classmethod
-    def from_mit_file(cls, filename, tbegin=None, tend=None):
+    def from_mit_file(cls, filename, tbegin=None, tend=None,
+                      precision="full"):
         if tbegin is None:
             tbegin = -1.0e22
         else:
@@ -97,6 +102,7 @@ class MSIDs(TimeSeriesData):
                                              hours, mins, secs)]
         tsecs = CxoTime(time_arr).secs
         idxs = np.logical_and(tsecs >= tbegin, tsecs <= tend)
+        tsecs = tsecs[idxs]
         table = {}
         times = {}
         masks = {}
@@ -108,7 +114,7 @@ class MSIDs(TimeSeriesData):
                 else:
                     key = k.lower()
                 table[key] = np.array(data[k].data[idxs])
-                times[key] = tsecs[idxs]
+                times[key] = tsecs
                 if key == "bilevels":
                     masks[key] = np.array(table[key] != "0")
                 else:
@@ -124,10 +130,12 @@ class MSIDs(TimeSeriesData):
             times[key] = times["bilevels"]
             masks[key] = bmask
             state_codes[key] = get_state_codes(key)
-        return cls(table, times, masks=masks, state_codes=state_codes)
+        return cls(table, times, masks=masks, state_codes=state_codes,
+                   precision=precision)
 
     @classmethod
-    def from_tracelog(cls, filename, tbegin=None, tend=None):
+    def from_tracelog(cls, filename, tbegin=None, tend=None,
+                      precision="full"):
         if tbegin is None:
             tbegin = -1.0e22
         else:
@@ -161,13 +169,16 @@ class MSIDs(TimeSeriesData):
         data['time'] -= 410227200.
         idxs = np.logical_and(data['time'] >= tbegin, data['time'] <= tend)
         table = dict((k.lower(), data[k][idxs]) for k in data.dtype.names if k != "time")
-        times = dict((k.lower(), data["time"][idxs]) for k in header if k != "time")
+        tsecs = data["time"][idxs]
+        times = dict((k.lower(), tsecs) for k in header if k != "time")
         derived_msids = ["dpa_a_power", "dpa_b_power", "dea_a_power", "dea_b_power"]
-        return cls(table, times, state_codes=state_codes, derived_msids=derived_msids)
+        return cls(table, times, state_codes=state_codes,
+                   derived_msids=derived_msids, precision=precision)
 
     @classmethod
     def from_database(cls, msids, tstart, tstop=None, filter_bad=False,
-                      stat='5min', interpolate=None, interpolate_times=None):
+                      stat='5min', interpolate=None, interpolate_times=None,
+                      precision="full"):
         tstart = CxoTime(tstart).date
         tstop = CxoTime(tstop).date
         msids = ensure_list(msids)
@@ -207,10 +218,11 @@ class MSIDs(TimeSeriesData):
             if msid.bads is not None:
                 masks[k.lower()] = (~msid.bads)[indexes]
         return cls(table, times, state_codes=state_codes, masks=masks,
-                   derived_msids=derived_msids)
+                   derived_msids=derived_msids, precision=precision)
 
     @classmethod
-    def from_maude(cls, msids, tstart, tstop=None, user=None, password=None):
+    def from_maude(cls, msids, tstart, tstop=None, user=None, password=None,
+                   precision="full"):
         import maude
         tstart = CxoTime(tstart).date
         tstop = CxoTime(tstop).date
@@ -227,7 +239,7 @@ class MSIDs(TimeSeriesData):
             times[k] = msid['times']
             state_codes[k] = get_state_codes(k)
         return cls(table, times, state_codes=state_codes, 
-                   derived_msids=derived_msids)
+                   derived_msids=derived_msids, precision=precision)
 
 
 class CombinedMSIDs(TimeSeriesData):
@@ -236,8 +248,7 @@ class CombinedMSIDs(TimeSeriesData):
         self.state_codes = {}
         derived_msids = []
         for msids in msid_list:
-            self.table.update(msids.table)
-            self.table.update(msids.table)
+            self.table.merge(msids.table)
             self.state_codes.update(msids.state_codes)
             self.state_codes.update(msids.state_codes)
             derived_msids += msids.derived_msids
@@ -252,11 +263,12 @@ class ConcatenatedMSIDs(TimeSeriesData):
             v1 = msids1.table[key]
             v2 = msids2.table[key]
             v = np.concatenate([v1.value, v2.value])
-            t = Quantity(np.concatenate([v1.times.value, v2.times.value]), "s")
+            t = intern_times(np.concatenate([v1.times.value, v2.times.value]))
             mask = np.concatenate([v1.mask, v2.mask])
             if v1.dtype.char in ['S', 'U']:
                 self.table[key] = APStringArray(v, t, mask)
             else:
                 self.table[key] = APQuantity(v, t, unit=v1.unit, dtype=v.dtype,
-                                             mask=mask)
+                                             mask=mask,
+                                             full_dtype=v1._full_dtype)
         self.derived_msids = msids1.derived_msids
@@ -3,7 +3,7 @@ import requests
 from acispy.units import get_units
 from acispy.utils import ensure_list, find_load, calc_off_nom_rolls, \
     dict_to_array
-from acispy.units import APQuantity, APStringArray, Quantity
+from acispy.units import APQuantity, APStringArray, intern_times
 from acispy.time_series import TimeSeriesData
 import numpy as np
 from cxotime import CxoTime
@@ -53,9 +53,9 @@ class States(TimeSeriesData):
                 table["tstop"] = CxoTime(table["datestop"]).secs
                 state_names += ["tstart", "tstop"]
         if "tstart" in state_names:
-            times = Quantity([table["tstart"], table["tstop"]], "s")
+            times = intern_times([table["tstart"], table["tstop"]])
         else:
-            times = Quantity(table["time"], "s")
+            times = intern_times(table["time"])
         for k in state_names:
             v = np.asarray(table[k])
             if k == "trans_keys" and v.dtype.char == "O":
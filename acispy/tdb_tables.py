@@ -0,0 +1,131 @@
+"""
+Snapshot of the units and state codes of MSIDs in the Ska.tdb
+telemetry database, so that common lookups do not require importing
+and querying Ska.tdb at runtime.
+
+The snapshot is generated in the build directory when acispy is built
+in an environment with Ska.tdb, and in place for ``setup.py develop``.
+Other editable or source installs have no snapshot and look everything
+up in Ska.tdb, until it is generated in place with::
+
+    python acispy/tdb_tables.py
+
+This module does not import the rest of acispy, so that it can be
+loaded by its path when acispy is built.
+"""
+import gzip
+import json
+import os
+
+tdb_tables_file = os.path.join(os.path.dirname(__file__), "data",
+                               "tdb_tables.json.gz")
+
+_tables = None
+
+
+def load_tdb_tables():
+    """
+    Load the snapshot of units and state codes. If the snapshot file
+    does not exist, empty tables are returned and all lookups will
+    fall back to Ska.tdb.
+    """
+    global _tables
+    if _tables is None:
+        if os.path.exists(tdb_tables_file):
+            with gzip.open(tdb_tables_file, "rt") as f:
+                tables = json.load(f)
+        else:
+            tables = {"units": {}, "state_codes": {}, "missing": []}
+        tables["missing"] = set(tables["missing"])
+        _tables = tables
+    return _tables
+
+
+def tdb_units(msid):
+    """
+    Return the engineering unit of *msid* from the snapshot, or None
+    if *msid* has no unit or is known not to be in Ska.tdb. Raises a
+    KeyError if *msid* is not in the snapshot.
+    """
+    tables = load_tdb_tables()
+    if msid in tables["units"]:
+        return tables["units"][msid]
+    elif msid in tables["missing"]:
+        return None
+    raise KeyError(msid)
+
+
+def tdb_state_codes(msid):
+    """
+    Return a dict of the state codes and raw counts of *msid* from the
+    snapshot, or None if *msid* has no state codes. Raises a KeyError
+    if *msid* is not in the snapshot.
+    """
+    tables = load_tdb_tables()
+    if msid in tables["state_codes"]:
+        return dict(tables["state_codes"][msid])
+    elif msid in tables["units"] or msid in tables["missing"]:
+        return None
+    raise KeyError(msid)
+
+
+def query_state_codes(msid):
+    """
+    Query Ska.tdb for the state codes of *msid*, as a dict of raw
+    counts keyed by state code, or None if it has none.
+    """
+    import numpy as np
+    import Ska.tdb
+    try:
+        states = Ska.tdb.msids[msid].Tsc
+    except:
+        state_codes = None
+    else:
+        if states is None:
+            state_codes = None
+        else:
+            states = np.sort(states.data, order='LOW_RAW_COUNT')
+            state_codes = dict((state['STATE_CODE'], state['LOW_RAW_COUNT'])
+                               for state in states)
+    return state_codes
+
+
+def make_tdb_tables(msids=None, filename=tdb_tables_file):
+    """
+    Write a snapshot of the units and state codes of MSIDs from Ska.tdb.
+
+    Parameters
+    ----------
+    msids : list of strings, optional
+        The MSIDs to include. Default: None, which includes every MSID
+        in Ska.tdb.
+    filename : string, optional
+        The file to write the snapshot to. Default: the snapshot file
+        in the acispy source directory.
+    """
+    import Ska.tdb
+    if msids is None:
+        msids = [str(msid) for msid in Ska.tdb.tables['tmsrment'].data['MSID']]
+    units = {}
+    state_codes = {}
+    missing = []
+    for msid in sorted(set(msid.lower() for msid in msids)):
+        try:
+            unit = Ska.tdb.msids[msid].eng_unit
+        except KeyError:
+            missing.append(msid)
+            continue
+        # MSIDs without a unit are kept as None, so that they are
+        # handled in the same way as when Ska.tdb is queried
+        units[msid] = unit
+        codes = query_state_codes(msid)
+        if codes is not None:
+            state_codes[msid] = [[k, int(v)] for k, v in codes.items()]
+    tables = {"units": units, "state_codes": state_codes, "missing": missing}
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    with gzip.open(filename, "wt") as f:
+        json.dump(tables, f, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    make_tdb_tables()
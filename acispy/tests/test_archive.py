@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from acispy import archive
+
+
+class FakeMSID:
+    def __init__(self, vals):
+        self.vals = vals
+
+
+@pytest.fixture()
+def fake_archive(monkeypatch):
+    # An archive whose data end at the current time of a fake clock,
+    # which records every lookup
+    now = [1.0e9]
+    calls = []
+
+    def get_time_range(msid, format='secs'):
+        calls.append(("range", msid))
+        return (6.0e8, now[0])
+
+    def MSIDset(msids, start, stop):
+        calls.append(("values", tuple(msids)))
+        return {msid: FakeMSID(np.array([start, now[0]])) for msid in msids}
+
+    monkeypatch.setattr(archive.fetch, "get_time_range", get_time_range)
+    monkeypatch.setattr(archive.fetch, "MSIDset", MSIDset)
+    monkeypatch.setattr(archive.time, "time", lambda: now[0])
+    archive.clear_archive_cache()
+    yield now, calls
+    archive.clear_archive_cache()
+
+
+def test_time_ranges_cache(fake_archive):
+    now, calls = fake_archive
+    ranges = archive.get_time_ranges(["1dpamzt", "1DEAMZT"])
+    assert ranges == {"1dpamzt": (6.0e8, now[0]), "1DEAMZT": (6.0e8, now[0])}
+    assert calls == [("range", "1dpamzt"), ("range", "1deamzt")]
+    # Lookups within the TTL, in any case, do not go to the archive
+    assert archive.get_time_range("1DPAMZT") == (6.0e8, now[0])
+    assert len(calls) == 2
+    # Once the TTL has passed, the range is looked up again
+    old_end = now[0]
+    now[0] += archive.archive_ttl + 1.0
+    assert archive.get_time_range("1dpamzt") == (6.0e8, now[0])
+    assert archive.get_time_range("1deamzt")[1] > old_end
+    assert len(calls) == 4
+
+
+def test_last_values_cache(fake_archive):
+    now, calls = fake_archive
+    t = 9.0e8
+    values = archive.get_last_values(["1dpamzt", "1deamzt"], t)
+    assert values == {"1dpamzt": now[0], "1deamzt": now[0]}
+    # The MSIDs which were not looked up yet are fetched together
+    assert calls == [("values", ("1dpamzt", "1deamzt"))]
+    values = archive.get_last_values(["1dpamzt", "1pdeaat"], t)
+    assert calls[-1] == ("values", ("1pdeaat",))
+    assert len(calls) == 2
+    # Values within the TTL are reused, unless the window is different
+    assert archive.get_last_value("1deamzt", t) == values["1dpamzt"]
+    assert len(calls) == 2
+    archive.get_last_value("1deamzt", t, window=1000.0)
+    assert len(calls) == 3
+    # Once the TTL has passed, the values are fetched again
+    now[0] += archive.archive_ttl + 1.0
+    assert archive.get_last_value("1dpamzt", t) == now[0]
+    assert len(calls) == 4
+
+
+def test_clear_archive_cache(fake_archive):
+    now, calls = fake_archive
+    archive.get_time_range("1dpamzt")
+    archive.get_last_value("1dpamzt", 9.0e8)
+    assert len(calls) == 2
+    archive.clear_archive_cache()
+    archive.get_time_range("1dpamzt")
+    archive.get_last_value("1dpamzt", 9.0e8)
+    assert len(calls) == 4
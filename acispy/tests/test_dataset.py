@@ -0,0 +1,136 @@
+import numpy as np
+from acispy.dataset import Dataset
+from acispy.model import Model
+from acispy.time_series import EmptyTimeSeries
+from acispy.units import APQuantity, intern_times
+from .utils import assert_allclose_nounits, assert_equal_nounits
+
+
+def make_model_dataset(n=100, dt=32.8):
+    times = intern_times(6.0e8 + dt * np.arange(n))
+    rng = np.random.default_rng(42)
+    table = {"1dpamzt": APQuantity(rng.normal(20.0, 2.0, size=n), times,
+                                   "deg_C"),
+             "1deamzt": APQuantity(rng.normal(25.0, 2.0, size=n), times,
+                                   "deg_C")}
+    return Dataset(EmptyTimeSeries(), EmptyTimeSeries(), Model(table=table))
+
+
+def test_rolling_fields():
+    ds = make_model_dataset()
+    # A window of 10 samples and one of 10 seconds are different fields
+    ds.add_rolling_fields(("model", "1dpamzt"), [10, "10 s"], stats="max")
+    ds.add_rolling_fields(("model", "1dpamzt"), ["10 s"], stats="max")
+    max_10 = ds["model", "max_10_1dpamzt"]
+    max_10s = ds["model", "max_10s_1dpamzt"]
+    assert str(max_10.unit) == str(ds.fields["model", "1dpamzt"].units)
+    v = ds["model", "1dpamzt"].value
+    # The 10-second window only contains one sample
+    assert_allclose_nounits(max_10s, v)
+    assert_allclose_nounits(max_10[5], v[:10].max())
+
+
+def test_window_keeps_type(tmp_path):
+    from acispy.thermal_models import ModelDataset
+    from acispy.states import States
+    ds0 = make_model_dataset()
+    states = States({"ccd_count": np.array([6, 4]),
+                     "off_nom_roll": np.array([0.0, 0.0]),
+                     "simpos": np.array([75624.0, 75624.0]),
+                     "hetg": np.array(["RETR", "RETR"]),
+                     "letg": np.array(["RETR", "RETR"]),
+                     "datestart": np.array(["2017:005:10:40:00.000",
+                                            "2017:005:11:00:00.000"]),
+                     "datestop": np.array(["2017:005:11:00:00.000",
+                                           "2017:005:12:00:00.000"])})
+    ds = ModelDataset(EmptyTimeSeries(), states, ds0.model)
+    ds.limits = {"1dpamzt": {"planning_hi": 37.5}}
+    t = ds["model", "1dpamzt"].times.value
+    dsw = ds.window(t[10], t[20])
+    assert type(dsw) is ModelDataset
+    assert isinstance(dsw.model, Model)
+    assert isinstance(dsw.states, States)
+    # Only the first state overlaps the window
+    assert len(dsw.states) == 1
+    assert_allclose_nounits(dsw["model", "1dpamzt"],
+                            ds["model", "1dpamzt"][10:21])
+    assert dsw.limits == ds.limits
+    # Per-instance containers are copies
+    dsw.limits["1deamzt"] = {}
+    dsw.state_codes["model", "1dpamzt"] = {}
+    assert "1deamzt" not in ds.limits
+    assert ("model", "1dpamzt") not in ds.state_codes
+    # The methods of the subclass work on the window
+    assert hasattr(dsw, "make_dashboard_plots")
+    dsw.write_model(tmp_path / "window_model.dat")
+
+
+def test_resample():
+    n = 100
+    times = intern_times(6.0e8 + 60.0 * np.arange(n))
+    values = np.arange(n, dtype="float64")
+    mask = np.ones(n, dtype="bool")
+    mask[10:20] = False
+    table = {"1dpamzt": APQuantity(values, times, "deg_C", mask=mask)}
+    ds = Dataset(EmptyTimeSeries(), EmptyTimeSeries(), Model(table=table))
+    # The masked samples fill the second bin, and the last sample is
+    # on the left edge of the last bin
+    edges = 6.0e8 + np.array([0.0, 600.0, 1200.0, 5940.0, 6600.0])
+    dsr = ds.resample(("model", "1dpamzt"), bins=edges,
+                      how=["mean", "max", "count"])
+    mean = dsr["model", "mean_1dpamzt"]
+    vmax = dsr["model", "max_1dpamzt"]
+    count = dsr["model", "count_1dpamzt"]
+    assert str(mean.unit) == "deg_C"
+    assert str(vmax.unit) == "deg_C"
+    assert str(count.unit) == ""
+    assert_allclose_nounits(mean.times, 0.5 * (edges[1:] + edges[:-1]))
+    assert_allclose_nounits(count, [10.0, 0.0, 79.0, 1.0])
+    assert_allclose_nounits(mean, [4.5, np.nan, 59.0, 99.0])
+    assert_allclose_nounits(vmax, [9.0, np.nan, 98.0, 99.0])
+    assert_allclose_nounits(mean.mask, [True, False, True, True])
+    # Bins from dt end at the last sample, which is included
+    dsr = ds.resample(("model", "1dpamzt"), dt="11 min", how="count")
+    assert dsr["model", "count_1dpamzt"].value.sum() == n - 10
+
+
+def test_map_state_to_msid():
+    from acispy.states import States
+    ds0 = make_model_dataset()
+    t = ds0["model", "1dpamzt"].times.value
+    states = States({"ccd_count": np.array([6, 4, 5]),
+                     "off_nom_roll": np.array([0.0, 0.0, 0.0]),
+                     "simpos": np.array([75624.0, -99616.0, 75624.0]),
+                     "hetg": np.array(["RETR", "INSR", "RETR"]),
+                     "letg": np.array(["RETR", "RETR", "RETR"]),
+                     "tstart": np.array([t[0], t[30], t[60]]),
+                     "tstop": np.array([t[30], t[60], t[-1]]),
+                     "datestart": np.array(["", "", ""]),
+                     "datestop": np.array(["", "", ""])})
+    ds = Dataset(EmptyTimeSeries(), states, ds0.model)
+    ds.map_state_to_msid(["ccd_count", "hetg"], "1dpamzt", ftype="model")
+    hetg = ds["model", "hetg"]
+    assert hetg.categories is ds["states", "hetg"].categories
+    assert hetg.times is ds["model", "1dpamzt"].times
+    expected = np.where((t > t[30]) & (t <= t[60]), "INSR", "RETR")
+    assert_equal_nounits(hetg.value, expected)
+    assert_equal_nounits(hetg == "INSR", expected == "INSR")
+    ccd_count = ds["model", "ccd_count"]
+    assert_equal_nounits(ccd_count.value[[0, 30, 31, 60, 61]], 
+                         [6, 6, 4, 4, 5])
+    # The indices are shared by both states, and only kept as long as
+    # the time arrays they were made for
+    import gc
+    from astropy.units import Quantity
+    cache = ds._state_index_cache
+    assert len(cache) == 1
+    old_times = ds._times["model", "1dpamzt"]
+    new_times = Quantity(t.copy(), "s")
+    ds._times["model", "1dpamzt"] = new_times
+    idxs = ds._state_indices("model", "1dpamzt", "ccd_count")
+    assert len(cache) == 2
+    assert ds._state_indices("model", "1dpamzt", "hetg") is idxs
+    ds._times["model", "1dpamzt"] = old_times
+    del new_times
+    gc.collect()
+    assert len(cache) == 1
@@ -0,0 +1,113 @@
+import numpy as np
+from acispy import fields
+from acispy.fields import EarthVisCache, calc_earth_solid_angle
+from .utils import assert_allclose_nounits
+
+
+def make_ephem_and_attitudes(n, seed=42):
+    rng = np.random.default_rng(seed)
+    ephems = np.array([2.0e7, -3.0e7, 1.0e7]) + \
+        rng.uniform(-5.0e5, 5.0e5, size=(n, 3))
+    q_atts = rng.normal(size=(n, 4))
+    q_atts /= np.sqrt((q_atts**2).sum(axis=1))[:, np.newaxis]
+    return ephems, q_atts
+
+
+def counting_calc(monkeypatch):
+    calls = []
+
+    def _calc(ephem, q_att):
+        calls.append(1)
+        return calc_earth_solid_angle(ephem, q_att)
+
+    monkeypatch.setattr(fields, "calc_earth_solid_angle", _calc)
+    return calls
+
+
+def test_earth_vis_cache_hits(monkeypatch):
+    calls = counting_calc(monkeypatch)
+    ephems, q_atts = make_ephem_and_attitudes(5)
+    cache = EarthVisCache()
+    # Repeated samples in the same cell are computed once
+    v1 = cache.calc(np.repeat(ephems, 3, axis=0), np.repeat(q_atts, 3, axis=0))
+    assert len(calls) == 5
+    assert len(cache.table) == 5
+    assert_allclose_nounits(v1, np.repeat(v1[::3], 3))
+    # A second call is served from the cache
+    v2 = cache.calc(ephems, q_atts)
+    assert len(calls) == 5
+    assert_allclose_nounits(v2, v1[::3])
+    # A new sample misses
+    e3, q3 = make_ephem_and_attitudes(1, seed=7)
+    cache.calc(e3, q3)
+    assert len(calls) == 6
+    assert len(cache.table) == 6
+
+
+def test_earth_vis_cache_reload(tmp_path):
+    ephems, q_atts = make_ephem_and_attitudes(5)
+    filename = tmp_path / "earth_vis"
+    cache = EarthVisCache(filename=filename, save_every=100)
+    assert cache.filename.endswith(".npz")
+    v1 = cache.calc(ephems, q_atts)
+    # Nothing is written until the batch is full or the cache is flushed
+    assert not (tmp_path / "earth_vis.npz").exists()
+    cache.flush()
+    assert (tmp_path / "earth_vis.npz").exists()
+    cache2 = EarthVisCache(filename=filename, save_every=100)
+    assert cache2.table == cache.table
+    v2 = cache2.calc(ephems, q_atts)
+    assert_allclose_nounits(v1, v2)
+    # Different tolerances do not reuse the file
+    cache3 = EarthVisCache(filename=filename, ephem_tol=500.0)
+    assert len(cache3.table) == 0
+
+
+def test_earth_vis_cache_atomic(tmp_path):
+    import os
+    ephems, q_atts = make_ephem_and_attitudes(5)
+    filename = tmp_path / "earth_vis.npz"
+    cache = EarthVisCache(filename=filename)
+    cache.calc(ephems, q_atts)
+    cache.flush()
+    # The file is replaced as a whole, and nothing else is left
+    assert os.listdir(tmp_path) == ["earth_vis.npz"]
+    # A truncated file is treated as an empty cache
+    data = filename.read_bytes()
+    filename.write_bytes(data[:len(data) // 2])
+    cache2 = EarthVisCache(filename=filename)
+    assert len(cache2.table) == 0
+    cache2.calc(ephems, q_atts)
+    cache2.flush()
+    assert EarthVisCache(filename=filename).table == cache.table
+
+
+def test_earth_vis_cache_accuracy():
+    ephems, q_atts = make_ephem_and_attitudes(20)
+    cache = EarthVisCache()
+    v1 = cache.calc(ephems, q_atts)
+    v2 = np.array([calc_earth_solid_angle(ephem, q_att)
+                   for ephem, q_att in zip(ephems, q_atts)])
+    assert_allclose_nounits(v1, v2, rtol=1.0e-3, atol=1.0e-6)
+
+
+def test_earth_vis_cache_flush_at_exit(tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(fields.atexit, "register", registered.append)
+    ephems, q_atts = make_ephem_and_attitudes(5)
+    try:
+        # Enabling caches does not register anything more at exit
+        cache1 = fields.enable_earth_vis_cache(tmp_path / "vis1")
+        cache1.calc(ephems, q_atts)
+        cache2 = fields.enable_earth_vis_cache(tmp_path / "vis2")
+        assert registered == []
+        # The cache which was replaced has been written
+        assert (tmp_path / "vis1.npz").exists()
+        # The function run at exit writes the active cache
+        cache2.calc(ephems, q_atts)
+        assert not (tmp_path / "vis2.npz").exists()
+        fields._flush_earth_vis_cache()
+        assert (tmp_path / "vis2.npz").exists()
+    finally:
+        fields.disable_earth_vis_cache()
+    assert fields._earth_vis_cache is None
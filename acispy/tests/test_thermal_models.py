@@ -1,9 +1,12 @@
 import numpy as np
+import pytest
 from acispy.thermal_models import ThermalModelRunner, \
     ThermalModelFromRun, ThermalModelFromLoad, \
-    SimulateSingleState, SimulateECSRun
+    SimulateSingleState, SimulateECSRun, ModelCheckpoint, \
+    MultiThermalModelRunner
 from pathlib import Path
 from astropy.io import ascii
+from cxotime import CxoTime
 from .utils import assert_equal_nounits, assert_allclose_nounits
 
 
@@ -14,16 +17,25 @@ dea_spec = test_dir / "dea_test_spec.json"
 fp_spec = test_dir / "acisfp_test_spec.json"
 
 
+def make_states(dates, ccd_count):
+    # States at a pitch of 150 degrees with HRC-S in the focal plane,
+    # with *ccd_count* CCDs between each pair of consecutive *dates*
+    n = len(ccd_count)
+    return {"ccd_count": np.array(ccd_count),
+            "pitch": np.array([150.0] * n),
+            "fep_count": np.array(ccd_count),
+            "clocking": np.array([1] * n),
+            "vid_board": np.array([1] * n),
+            "off_nom_roll": np.array([0.0] * n),
+            "simpos": np.array([-99616.0] * n),
+            "datestart": np.array(dates[:-1]),
+            "datestop": np.array(dates[1:])}
+
+
 def test_handmade_states(answer_store):
-    states = {"ccd_count": np.array([5, 6, 1]),
-              "pitch": np.array([150.0] * 3),
-              "fep_count": np.array([5, 6, 1]),
-              "clocking": np.array([1] * 3),
-              "vid_board": np.array([1] * 3),
-              "off_nom_roll": np.array([0.0] * 3),
-              "simpos": np.array([-99616.0] * 3),
-              "datestart": np.array(["2015:002:00:00:00", "2015:002:12:00:00", "2015:003:12:00:00"]),
-              "datestop": np.array(["2015:002:12:00:00", "2015:003:12:00:00", "2015:005:00:00:00"])}
+    states = make_states(["2015:002:00:00:00", "2015:002:12:00:00",
+                          "2015:003:12:00:00", "2015:005:00:00:00"],
+                         [5, 6, 1])
     dpa_model = ThermalModelRunner("1dpamzt", "2015:002:00:00:00",
                                    "2015:005:00:00:00", states=states,
                                    T_init=13.0, model_spec=dpa_spec)
@@ -94,6 +106,131 @@ def test_states_from_backstop(answer_store):
         assert_equal_nounits(t["date"].data, aca_model["aacccdpt"].dates)
 
 
+def test_continuity_states():
+    from kadi import commands
+    from acispy.states import States
+    from acispy.thermal_models import get_continuity_states, \
+        _states_from_continuity
+    bs_cmds = commands.get_cmds_from_backstop(test_dir / "CR229_2202.backstop")
+    rltt = bs_cmds["date"][bs_cmds["event_type"] == "RUNNING_LOAD_TERMINATION_TIME"][0]
+    cont_cmds, cont_states = get_continuity_states("2020:225:00:00:00", rltt)
+    assert get_continuity_states("2020:225:00:00:00", rltt)[1] is cont_states
+    states1 = _states_from_continuity(cont_cmds, cont_states, bs_cmds)
+    states2 = States.from_commands(cont_cmds.add_cmds(bs_cmds))
+    for k in ["ccd_count", "fep_count", "simpos", "pitch", "tstart", "tstop"]:
+        assert_allclose_nounits(states1[k], states2[k])
+
+
+def test_continuity_cache(monkeypatch):
+    from acispy import archive, thermal_models
+    from acispy.thermal_models import get_continuity_states, \
+        clear_continuity_cache
+    calls = []
+
+    def get_cmds(start, stop, inclusive_stop=False):
+        calls.append((start, stop))
+        return object()
+
+    now = [1.0e9]
+    monkeypatch.setattr(thermal_models.commands, "get_cmds", get_cmds)
+    monkeypatch.setattr(thermal_models.cmd_states, "get_states",
+                        lambda cmds, merge_identical: object())
+    monkeypatch.setattr(thermal_models.time, "time", lambda: now[0])
+    monkeypatch.setattr(archive.time, "time", lambda: now[0])
+    monkeypatch.setattr(thermal_models, "continuity_cache_size", 2)
+    clear_continuity_cache()
+    starts = ["2020:001:00:00:00", "2020:002:00:00:00", "2020:003:00:00:00"]
+    first = get_continuity_states(starts[0], "2020:010:00:00:00")
+    assert get_continuity_states(starts[0], "2020:010:00:00:00") is first
+    assert len(calls) == 1
+    # Continuity which is older than the TTL is looked up again
+    now[0] += 2.0 * archive.archive_ttl
+    assert get_continuity_states(starts[0], "2020:010:00:00:00") is not first
+    assert len(calls) == 2
+    # Only the most recently used periods are kept
+    for start in starts:
+        get_continuity_states(start, "2020:010:00:00:00")
+    assert len(calls) == 4
+    get_continuity_states(starts[0], "2020:010:00:00:00")
+    assert len(calls) == 5
+    clear_continuity_cache()
+
+
+def test_continuity_states_mid_maneuver():
+    from cxotime import CxoTime
+    from kadi import commands
+    from acispy.states import States
+    from acispy.thermal_models import get_continuity_states, \
+        _states_from_continuity
+    cmds = commands.get_cmds("2020:225:00:00:00", "2020:229:00:00:00")
+    man = cmds[cmds["tlmsid"] == "AOMANUVR"][0]
+    # Split the commands a few minutes into a maneuver
+    tsplit = CxoTime(CxoTime(man["date"]).secs + 300.0).date
+    cont_cmds, cont_states = get_continuity_states("2020:225:00:00:00", tsplit)
+    new_cmds = commands.get_cmds(tsplit, "2020:229:00:00:00")
+    new_cmds = new_cmds[new_cmds["date"] > tsplit]
+    # The maneuver is still in progress at the split
+    assert cont_states["datestart"][-1] > tsplit
+    states1 = _states_from_continuity(cont_cmds, cont_states, new_cmds)
+    states2 = States.from_commands(cont_cmds.add_cmds(new_cmds))
+    for k in ["pitch", "off_nom_roll", "q1", "q2", "q3", "q4", "ccd_count",
+              "simpos", "tstart", "tstop"]:
+        assert_allclose_nounits(states1[k], states2[k])
+
+
+def test_multi_model_runner():
+    states = make_states(["2015:002:00:00:00", "2015:002:12:00:00",
+                          "2015:003:12:00:00", "2015:005:00:00:00"],
+                         [5, 6, 1])
+    T_init = {"1dpamzt": 13.0, "1deamzt": 15.0}
+    ds = MultiThermalModelRunner("2015:002:00:00:00", "2015:005:00:00:00",
+                                 states=states, T_init=T_init,
+                                 names=["1dpamzt", "1deamzt"], workers=2)
+    for name in ["1dpamzt", "1deamzt"]:
+        tm = ThermalModelRunner(name, "2015:002:00:00:00",
+                                "2015:005:00:00:00", states=states,
+                                T_init=T_init[name])
+        assert_allclose_nounits(ds["model", name], tm["model", name])
+        assert_allclose_nounits(ds["model", name].times,
+                                tm["model", name].times)
+        # Components which both models have are kept for each of them
+        assert_allclose_nounits(ds["model", f"{name}:dpa_power"],
+                                tm["model", "dpa_power"])
+    assert "dpa_power" not in ds.model.keys()
+    assert "1dpamzt:1dpamzt" not in ds.model.keys()
+    assert_equal_nounits(ds["states", "ccd_count"], states["ccd_count"])
+    # Initial temperatures may be keyed by the short model names, and
+    # the states are filled in for the results
+    ds2 = MultiThermalModelRunner("2015:002:00:00:00", "2015:005:00:00:00",
+                                  states=states, T_init={"dpa": 13.0},
+                                  names=["dpa"], workers=1)
+    assert_allclose_nounits(ds2["model", "1dpamzt"], ds["model", "1dpamzt"])
+    assert_equal_nounits(ds2.results[0].states["ccd_count"],
+                         states["ccd_count"])
+    # The limits are keyed by MSID, as for a single model
+    for name in ["1dpamzt", "1deamzt"]:
+        assert ds.limits[name] == ds.results[ds.names.index(name)].limits[name]
+    # The states are converted to a record array once, which is then
+    # passed through unchanged and shared by all of the results
+    from acispy.thermal_models import _states_to_array
+    states_array = _states_to_array(dict(states))
+    assert _states_to_array(states_array) is states_array
+    assert ds.results[0].states is ds.results[1].states
+
+
+def test_multi_model_dashboard_plots(tmp_path):
+    pytest.importorskip("xijafit")
+    import matplotlib
+    matplotlib.use("Agg")
+    ds = MultiThermalModelRunner("2020:002:00:00:00", "2020:005:00:00:00",
+                                 names=["1dpamzt", "fptemp_11"], workers=2,
+                                 get_msids=True)
+    for msid in ["1dpamzt", "fptemp_11"]:
+        figfile = tmp_path / f"{msid}_dashboard.png"
+        ds.make_dashboard_plots(msid, figfile=figfile)
+        assert figfile.exists()
+
+
 def test_load_output():
     tm1 = ThermalModelFromLoad("JUN2121")
     tm2 = ThermalModelFromRun(test_dir / "out_dpa")
@@ -138,6 +275,34 @@ def test_single_state(answer_store):
         func(tm["states", k][0], v)
 
 
+def test_model_templates():
+    import json
+    from acispy.thermal_models import clear_model_templates
+    clear_model_templates()
+    states = {"pitch": 75.0, "off_nom_roll": -6.0, "clocking": 1,
+              "ccd_count": 6, "simpos": 75624.0}
+    args = ("1deamzt", "2016:201:05:12:03", "2016:202:05:12:03", states)
+    tm1 = SimulateSingleState(*args, 15.0, model_spec=dea_spec)
+    tm2 = SimulateSingleState(*args, 20.0, model_spec=dea_spec)
+    # Runs with the same spec share one template
+    assert tm1.template is tm2.template
+    assert tm1.check_obj is tm2.check_obj
+    # A different spec, or the same spec parsed, gets its own template
+    spec = json.loads(dea_spec.read_text())
+    tm3 = SimulateSingleState(*args, 15.0, model_spec=spec)
+    assert tm3.template is not tm1.template
+    assert tm3.template.spec_hash == tm1.template.spec_hash
+    spec["pars"][0]["val"] += 0.1
+    tm4 = SimulateSingleState(*args, 15.0, model_spec=spec)
+    assert tm4.template is not tm3.template
+    assert tm4.template.spec_hash != tm3.template.spec_hash
+    # Once the templates are cleared, a new one is made
+    clear_model_templates()
+    tm5 = SimulateSingleState(*args, 15.0, model_spec=dea_spec)
+    assert tm5.template is not tm1.template
+    assert_equal_nounits(tm5["1deamzt"], tm1["1deamzt"])
+
+
 def test_ecs_run(answer_store):
     tm = SimulateECSRun("1deamzt", "2016:201:05:12:03", 24, 14.0,
                         (150., -6.0), 5, model_spec=dea_spec)
@@ -170,3 +335,313 @@ def test_ecs_run(answer_store):
         assert_allclose_nounits(t3["fptemp_11"].data, tm3["fptemp_11"])
         assert_allclose_nounits(t3["time"].data, tm3["fptemp_11"].times)
         assert_equal_nounits(t3["date"].data, tm3["fptemp_11"].dates)
+
+
+def test_run_many():
+    specs = [{"name": "1deamzt", "tstart": "2020:002:00:00:00",
+              "tstop": "2020:005:00:00:00", "T_init": T_init,
+              "model_spec": dea_spec} for T_init in [10.0, 20.0]]
+    results = ThermalModelRunner.run_many(specs, workers=2)
+    for spec, result in zip(specs, results):
+        dea_model = ThermalModelRunner(**spec)
+        assert_allclose_nounits(result.mvals, dea_model["1deamzt"])
+        assert_allclose_nounits(result.times, dea_model["1deamzt"].times)
+
+
+def test_share_model_specs():
+    from acispy.thermal_models import _share_model_specs, get_model_template
+    template = get_model_template("1deamzt", model_spec=dea_spec)
+    specs = [{"name": "1deamzt", "model_spec": template.model_spec,
+              "T_init": T_init} for T_init in [10.0, 20.0]]
+    model_specs = _share_model_specs(specs)
+    # The parsed spec is sent once, keyed by the hash of its template
+    assert list(model_specs.keys()) == [template.spec_hash]
+    for spec in specs:
+        assert "model_spec" not in spec
+        assert spec["spec_hash"] == template.spec_hash
+
+
+def test_single_state_sweep(tmp_path):
+    sweep = SimulateSingleState.sweep("1deamzt", "2016:201:05:12:03",
+                                      "2016:202:05:12:03", [75.0, 150.0],
+                                      ccd_count=[0, 6], T_init=15.0,
+                                      states={"simpos": 75624.0}, limit=30.0,
+                                      model_spec=dea_spec, workers=2,
+                                      cache_dir=tmp_path)
+    assert sweep.shape == (2, 1, 2, 1, 1)
+    states = {"pitch": 150.0, "ccd_count": 6, "clocking": 1,
+              "vid_board": 1, "simpos": 75624.0}
+    dea_run = SimulateSingleState("1deamzt", "2016:201:05:12:03",
+                                  "2016:202:05:12:03", states, 15.0,
+                                  model_spec=dea_spec)
+    assert_allclose_nounits(sweep.peak_temp[1, 0, 1, 0, 0],
+                            dea_run["1deamzt"].value.max())
+    assert_allclose_nounits(sweep.end_temp[1, 0, 1, 0, 0],
+                            dea_run["1deamzt"].value[-1])
+    # The second sweep is read entirely from the cache
+    sweep2 = SimulateSingleState.sweep("1deamzt", "2016:201:05:12:03",
+                                       "2016:202:05:12:03", [75.0, 150.0],
+                                       ccd_count=[0, 6], T_init=15.0,
+                                       states={"simpos": 75624.0}, limit=30.0,
+                                       model_spec=dea_spec, workers=2,
+                                       cache_dir=tmp_path)
+    assert_equal_nounits(sweep.end_temp, sweep2.end_temp)
+    # The cache file is written atomically, and a truncated one is
+    # recomputed instead of raising
+    cache_file, = tmp_path.iterdir()
+    data = cache_file.read_bytes()
+    cache_file.write_bytes(data[:len(data) // 2])
+    sweep3 = SimulateSingleState.sweep("1deamzt", "2016:201:05:12:03",
+                                       "2016:202:05:12:03", [75.0, 150.0],
+                                       ccd_count=[0, 6], T_init=15.0,
+                                       states={"simpos": 75624.0}, limit=30.0,
+                                       model_spec=dea_spec, workers=2,
+                                       cache_dir=tmp_path)
+    assert_equal_nounits(sweep.end_temp, sweep3.end_temp)
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_read_sweep_cache(tmp_path):
+    from acispy.thermal_models import _read_sweep_cache
+    from acispy.utils import savez_atomic
+    cache_file = tmp_path / "sweep.npz"
+    assert _read_sweep_cache(cache_file) == {}
+    savez_atomic(cache_file, keys=np.array(["a", "b"]),
+                 values=np.array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]))
+    cached = _read_sweep_cache(cache_file)
+    assert list(cached.keys()) == ["a", "b"]
+    assert_equal_nounits(cached["b"], [4.0, 5.0, 6.0])
+    cache_file.write_bytes(b"not a zip file")
+    assert _read_sweep_cache(cache_file) == {}
+
+
+def test_single_state_sweep_non_acis():
+    # The ACA model has no ACIS limits, and none in its model spec
+    with pytest.raises(ValueError):
+        SimulateSingleState.sweep("aacccdpt", "2016:201:05:12:03",
+                                  "2016:202:05:12:03", [75.0, 150.0],
+                                  T_init=-10.0, model_spec=aca_spec)
+    sweep = SimulateSingleState.sweep("aacccdpt", "2016:201:05:12:03",
+                                      "2016:202:05:12:03", [75.0, 150.0],
+                                      T_init=-10.0, limit=-8.0,
+                                      model_spec=aca_spec, workers=2)
+    assert sweep.shape == (2, 1, 1, 1, 1)
+    assert sweep.limit == -8.0
+    assert np.all(np.isfinite(sweep.peak_temp))
+
+
+def test_ecs_max_duration():
+    hours, run = SimulateECSRun.find_max_duration("1deamzt", "2016:201:05:12:03",
+                                                  35.0, (150., -6.0), 6,
+                                                  max_hours=48.0,
+                                                  model_spec=dea_spec)
+    assert run.limit_time is not None
+    assert 0.0 < hours.value < 48.0
+    tm = SimulateECSRun("1deamzt", "2016:201:05:12:03", hours.value, 35.0,
+                        (150., -6.0), 6, model_spec=dea_spec)
+    assert not tm.violate
+    # A measurement one model step longer violates the limit
+    step = run.xija_model.dt/3600.0
+    tm2 = SimulateECSRun("1deamzt", "2016:201:05:12:03", hours.value+step,
+                         35.0, (150., -6.0), 6, model_spec=dea_spec)
+    assert tm2.violate
+
+
+def test_stop_condition():
+    states = make_states(["2015:002:00:00:00", "2015:012:00:00:00"], [6])
+    full = ThermalModelRunner("1dpamzt", "2015:002:00:00:00",
+                              "2015:012:00:00:00", states=dict(states),
+                              T_init=13.0, model_spec=dpa_spec)
+    limit = 0.5*(13.0+full["1dpamzt"].value.max())
+    dpa_model = ThermalModelRunner("1dpamzt", "2015:002:00:00:00",
+                                   "2015:012:00:00:00", states=dict(states),
+                                   T_init=13.0, model_spec=dpa_spec,
+                                   stop_condition=lambda t, T: T > limit)
+    idx = np.where(full["1dpamzt"].value > limit)[0][0]
+    assert dpa_model.stop_time is not None
+    assert dpa_model["1dpamzt"].size == idx+1
+    # The chunks continue on the same time grid as the single run, and
+    # the joined trajectory is the same to float precision
+    assert_allclose_nounits(dpa_model["1dpamzt"].times,
+                            full["1dpamzt"].times[:idx+1], rtol=0.0, atol=1.0e-3)
+    assert_allclose_nounits(dpa_model["1dpamzt"], full["1dpamzt"][:idx+1],
+                            rtol=1.0e-10)
+    assert list(dpa_model.model.keys()) == list(full.model.keys())
+    # The model is not evolved past the chunk in which the condition is met
+    assert dpa_model.xija_model.times[-1] < full.xija_model.times[-1]
+    # Checkpoints are not made past the stop time
+    cp = dpa_model.make_checkpoint("2015:012:00:00:00")
+    assert cp.time == dpa_model.stop_time.value
+
+
+def test_stop_condition_cmd_states():
+    # Without states, both runs use the commanded states through xija
+    full = ThermalModelRunner("1deamzt", "2020:002:00:00:00",
+                              "2020:006:00:00:00", T_init=20.0,
+                              model_spec=dea_spec)
+    dea_model = ThermalModelRunner("1deamzt", "2020:002:00:00:00",
+                                   "2020:006:00:00:00", T_init=20.0,
+                                   model_spec=dea_spec,
+                                   stop_condition=lambda t, T: t < 0.0)
+    assert dea_model.stop_time is None
+    assert len(dea_model._chunks) > 1
+    assert list(dea_model.model.keys()) == list(full.model.keys())
+    for key in full.model.keys():
+        assert_allclose_nounits(dea_model["model", key],
+                                full["model", key], rtol=1.0e-10)
+
+
+def test_ecs_stop_condition():
+    full = SimulateECSRun("1deamzt", "2016:201:05:12:03", 24, 35.0,
+                          (150., -6.0), 6, model_spec=dea_spec)
+    limit = full.limit["value"]
+    tm = SimulateECSRun("1deamzt", "2016:201:05:12:03", 24, 35.0,
+                        (150., -6.0), 6, model_spec=dea_spec,
+                        stop_condition=lambda t, T: T > limit)
+    assert full.limit_time is not None
+    assert_allclose_nounits(tm.stop_time, full.limit_time)
+    assert_allclose_nounits(tm.limit_time, full.limit_time)
+    assert tm.violate == full.violate
+    assert tm["1deamzt"].times.value[-1] == tm.stop_time.value
+
+
+def test_find_start_time_shares_spec(monkeypatch):
+    import hashlib
+    import json
+    from acispy import thermal_models
+    from acispy.thermal_models import get_model_template, \
+        clear_model_templates
+    monkeypatch.setattr(thermal_models, "get_time_range",
+                        lambda msid: (0.0, 1.0e10))
+    hashes = []
+    sha1 = hashlib.sha1
+
+    def counting_sha1(data):
+        hashes.append(data)
+        return sha1(data)
+
+    monkeypatch.setattr(thermal_models.hashlib, "sha1", counting_sha1)
+    clear_model_templates()
+    boundary = 6.5e8
+    templates = []
+
+    class FakeRun:
+        # Runs which start after the boundary are not safe
+        def __init__(self, name, t, hours, T_init, attitude, ccd_count,
+                     model_spec=None):
+            templates.append(get_model_template(name, model_spec=model_spec))
+            self.violate = t > boundary
+
+    model_spec = json.loads(aca_spec.read_text())
+    date = SimulateECSRun.find_start_time.__func__(
+        FakeRun, "aacccdpt", 6.0e8, 7.0e8, 10.0, -10.0, "vehicle", 0,
+        model_spec=model_spec)
+    assert abs(CxoTime(date).secs - boundary) <= 3600.0
+    # Every run of the bisection uses one template, and the spec is
+    # only hashed once
+    assert len(templates) > 2
+    assert all(t is templates[0] for t in templates)
+    assert len(hashes) == 1
+
+
+def test_ephemeris_cache_persist(tmp_path):
+    import os
+    from acispy.thermal_models import EphemerisCache, ephem_msids
+    filename = tmp_path / "ephem_cache"
+    cache = EphemerisCache(filename=filename)
+    times = 6.0e8 + 300.0 * np.arange(10)
+    seg = {"tstart": times[0], "tstop": times[-1]}
+    for msid in ephem_msids:
+        seg[msid] = (times, np.ones(times.size))
+    cache.add_segment(seg)
+    cache.save()
+    # The file is written to the given name, and nothing else is left
+    assert os.listdir(tmp_path) == ["ephem_cache"]
+    mtime = os.stat(filename).st_mtime_ns
+    # Adding the same segment again does not write the file again
+    cache.add_segment(seg)
+    cache.save()
+    assert os.stat(filename).st_mtime_ns == mtime
+    # Segments are read back with the time they were fetched at
+    cache2 = EphemerisCache(filename=filename)
+    assert len(cache2.segments) == 1
+    assert cache2.segments[0]["fetched"] == seg["fetched"]
+    assert cache2.fetch(times[1], times[-2]) is cache2.segments[0]
+    cache2.clear()
+    assert not cache2._dirty
+
+
+class FakeMSID:
+    def __init__(self, times, vals):
+        self.times = times
+        self.vals = vals
+
+
+def test_ephemeris_cache_predictive(monkeypatch):
+    import time
+    from cxotime import CxoTime
+    from acispy import thermal_models
+    from acispy.archive import archive_ttl
+    from acispy.thermal_models import EphemerisCache, ephem_msids
+    now = [time.time()]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    t_now = CxoTime(now[0], format="unix").secs
+    calls = []
+
+    def MSIDset(msids, tstart, tstop):
+        # The archive has predictive ephemeris for 30 days ahead
+        calls.append((tstart, tstop))
+        times = np.arange(t_now - 10 * 86400.0, t_now + 30 * 86400.0, 300.0)
+        times = times[(times >= tstart) & (times <= tstop)]
+        return {msid: FakeMSID(times, np.ones(times.size)) for msid in msids}
+
+    monkeypatch.setattr(thermal_models.fetch, "MSIDset", MSIDset)
+    cache = EphemerisCache()
+    tstart, tstop = t_now - 5 * 86400.0, t_now + 5 * 86400.0
+    seg = cache.fetch(tstart, tstop)
+    assert seg["tstop"] == tstop
+    # Within the TTL, the predictive ephemeris is reused
+    assert cache.fetch(t_now, tstop) is seg
+    assert len(calls) == 1
+    # After it, only the part before the margin is
+    now[0] += archive_ttl + 1.0
+    assert cache.fetch(tstart, t_now - 4 * 86400.0) is seg
+    assert len(calls) == 1
+    assert seg["tstop"] == pytest.approx(t_now - cache.predictive_margin)
+    seg2 = cache.fetch(t_now, tstop)
+    assert seg2 is not seg
+    assert calls[-1] == (t_now, tstop)
+    # Segments which are all predictive are dropped once they are stale
+    now[0] += archive_ttl + 1.0
+    cache.fetch(t_now + 86400.0, t_now + 2 * 86400.0)
+    assert len(calls) == 3
+    assert all(s is not seg2 for s in cache.segments)
+    assert len(cache.segments) == 2
+
+
+def test_checkpoint(tmp_path):
+    states = make_states(["2015:002:00:00:00", "2015:002:12:00:00",
+                          "2015:003:12:00:00", "2015:005:00:00:00"],
+                         [5, 6, 1])
+    dpa_model = ThermalModelRunner("1dpamzt", "2015:002:00:00:00",
+                                   "2015:005:00:00:00", states=dict(states),
+                                   T_init=13.0, model_spec=dpa_spec)
+    cp = dpa_model.make_checkpoint("2015:003:00:00:00")
+    cp.write(tmp_path / "checkpoint.json")
+    cp = ModelCheckpoint.from_file(tmp_path / "checkpoint.json")
+    dpa_model2 = ThermalModelRunner("1dpamzt", "2015:002:00:00:00",
+                                    "2015:005:00:00:00", states=dict(states),
+                                    model_spec=dpa_spec, checkpoint=cp)
+    t = dpa_model2["1dpamzt"].times.value
+    np.testing.assert_allclose(t[0], cp.time)
+    # The warm-started run picks up where the cold run left off
+    t_cold = dpa_model["1dpamzt"].times.value
+    idx = np.searchsorted(t_cold, cp.time - 1.0)
+    assert_allclose_nounits(dpa_model2["1dpamzt"].value[0],
+                            dpa_model["1dpamzt"].value[idx])
+    overlap = min(t.size, t_cold.size - idx)
+    assert overlap > 1
+    assert_allclose_nounits(t[:overlap], t_cold[idx:idx+overlap])
+    assert_allclose_nounits(dpa_model2["1dpamzt"].value[:overlap],
+                            dpa_model["1dpamzt"].value[idx:idx+overlap],
+                            rtol=1.0e-3)
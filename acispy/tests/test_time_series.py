@@ -0,0 +1,81 @@
+import pytest
+from acispy.time_series import LazyTable
+
+
+def counting_builder():
+    built = []
+
+    def builder(key, value):
+        built.append(key)
+        return value
+
+    return builder, built
+
+
+def test_lazy_table_builds_on_access():
+    builder, built = counting_builder()
+    table = LazyTable()
+    table.add_lazy("a", builder, 1)
+    table.add_lazy("b", builder, 2)
+    # Registering, iterating, and membership do not build anything
+    assert "a" in table
+    assert list(table) == ["a", "b"]
+    assert len(table) == 2
+    assert built == []
+    assert table["b"] == 2
+    assert built == ["b"]
+    # Each entry is only built once
+    assert table["b"] == 2
+    assert built == ["b"]
+    # Registering an entry again replaces the built value
+    table.add_lazy("b", builder, 3)
+    assert table["b"] == 3
+    assert built == ["b", "b"]
+    assert list(table) == ["a", "b"]
+
+
+def test_lazy_table_merge():
+    builder, built = counting_builder()
+    table1 = LazyTable()
+    table1.add_lazy("a", builder, 1)
+    table1["b"] = 2
+    table1.add_lazy("c", builder, 3)
+    table2 = LazyTable()
+    table2["d"] = 4
+    table2.merge(table1)
+    # Pending entries stay pending, and built ones are shared
+    assert built == []
+    assert list(table2) == ["d", "a", "b", "c"]
+    assert table2["c"] == 3
+    assert built == ["c"]
+    assert "a" not in table2._built
+    # Merging a plain dict adds its entries in order
+    table2.merge({"e": 5, "a": 6})
+    assert list(table2) == ["d", "a", "b", "c", "e"]
+    assert table2["a"] == 6
+    assert built == ["c"]
+
+
+def test_lazy_table_order():
+    builder, built = counting_builder()
+    table = LazyTable()
+    table["a"] = 1
+    table.add_lazy("b", builder, 2)
+    table["c"] = 3
+    # Replacing an entry keeps its place
+    table["b"] = 4
+    assert list(table) == ["a", "b", "c"]
+    assert table["b"] == 4
+    assert built == []
+    del table["a"]
+    assert list(table) == ["b", "c"]
+    table["a"] = 5
+    assert list(table) == ["b", "c", "a"]
+    # Pending entries can be removed without building them
+    table.add_lazy("d", builder, 6)
+    del table["d"]
+    assert "d" not in table
+    assert list(table) == ["b", "c", "a"]
+    assert built == []
+    with pytest.raises(KeyError):
+        del table["d"]
@@ -0,0 +1,315 @@
+import numpy as np
+import pytest
+from acispy.units import APStringArray, APQuantity, intern_times, \
+    make_quantity, find_indices, compact_values
+from .utils import assert_equal_nounits, assert_allclose_nounits
+
+
+def make_string_array(values):
+    values = np.array(values)
+    times = intern_times(6.0e8 + 32.8 * np.arange(values.size))
+    return APStringArray(values, times)
+
+
+def test_string_array_categories():
+    values = np.array(["ON", "OFF", "ON", "NA", "OFF", "ON"])
+    a = make_string_array(values)
+    assert_equal_nounits(a.value, values)
+    assert_equal_nounits(a.categories, np.unique(values))
+    assert a.codes.dtype == np.uint8
+    assert_equal_nounits(a[1:4].value, values[1:4])
+    assert a[2] == "ON"
+    b = APStringArray.from_codes(a.codes[::-1], a.categories, a.times[::-1])
+    assert_equal_nounits(b.value, values[::-1])
+
+
+def test_shared_dates():
+    times = intern_times(6.0e8 + 32.8 * np.arange(10))
+    a = make_quantity(np.arange(10.0), times, "deg_C")
+    b = make_quantity(np.arange(10.0) * 2.0, times, "deg_C")
+    # Fields with the same times share one read-only array of dates
+    assert a.dates is b.dates
+    with pytest.raises(ValueError):
+        a.dates[0] = "2000:001:00:00:00.000"
+
+
+def test_string_array_value():
+    values = np.array(["ON", "OFF", "ON", "NA", "OFF", "ON"])
+    a = make_string_array(values)
+    # The strings are built once, and cannot be changed in place
+    assert a.value is a.value
+    with pytest.raises(ValueError):
+        a.value[0] = "NA"
+    assert_equal_nounits(a.value, values)
+    # Setting new strings re-encodes them
+    values[0] = "NEW"
+    a.value = values
+    assert_equal_nounits(a.value, values)
+    assert_equal_nounits(a.categories, np.unique(values))
+    assert a[0] == "NEW"
+    assert_equal_nounits(a == "NEW", values == "NEW")
+    with pytest.raises(RuntimeError):
+        a.value = values[:3]
+
+
+def test_string_array_comparisons():
+    values = np.array(["ON", "OFF", "ON", "NA", "OFF", "ON"])
+    a = make_string_array(values)
+    # Values in the categories, missing from them, and sorting before
+    # the first and after the last of them
+    for other in ["ON", "OFF", "NA", "MISSING", "", "AAA", "ZZZ",
+                  np.str_("ON"), b"ON"]:
+        assert_equal_nounits(a == other, values == other)
+        assert_equal_nounits(a != other, values != other)
+    # Other arrays, with the same or different categories
+    b = make_string_array(["ON", "ON", "ON", "NA", "NA", "ON"])
+    assert_equal_nounits(a == b, values == b.value)
+    assert_equal_nounits(a != b, values != b.value)
+    c = APStringArray.from_codes(a.codes[::-1], a.categories, a.times)
+    assert_equal_nounits(a == c, values == values[::-1])
+    assert_equal_nounits(a != c, values != values[::-1])
+    assert_equal_nounits(a == values[::-1], values == values[::-1])
+
+
+def test_bytes_string_array():
+    values = np.array([b"INSR", b"RETR", b"RETR"])
+    a = make_string_array(values)
+    for other in [b"INSR", b"RETR", b"NONE", np.bytes_(b"RETR")]:
+        assert_equal_nounits(a == other, values == other)
+        assert_equal_nounits(a != other, values != other)
+
+
+def test_quantity_views_keep_dtype():
+    times = intern_times(6.0e8 + 32.8 * np.arange(10))
+    ints = APQuantity(np.arange(10, dtype="int16"), times, "ct",
+                      dtype="int16")
+    compact = make_quantity(np.arange(10.0), times, "deg_C",
+                            precision="compact")
+    assert compact.dtype == np.uint8
+    for q in [ints, compact]:
+        for view in [q[2:7], q.window(times.value[2], times.value[6])]:
+            assert view.dtype == q.dtype
+            assert np.shares_memory(view.value, q.value)
+            assert_equal_nounits(view, q.value[2:7])
+
+
+def test_lazy_masks():
+    times = intern_times(6.0e8 + 32.8 * np.arange(6))
+    a = APQuantity(np.arange(6.0), times, "V")
+    mask = np.array([True, False, True, True, True, True])
+    b = APQuantity(np.ones(6), times, "V", mask=mask)
+    # A mask of None means that all samples are good
+    assert a._mask is None
+    assert not a.has_bad
+    assert b.has_bad
+    c = APQuantity(np.ones(6), times, "V", mask=np.ones(6, dtype="bool"))
+    assert c._mask is None
+    assert a._index_mask(slice(1, 3)) is None
+    assert_equal_nounits(b._index_mask(slice(1, 3)), mask[1:3])
+    assert a[1:3]._mask is None
+    assert_equal_nounits(b[1:3].mask, mask[1:3])
+    # Combining a None mask with a real one uses the real one, and
+    # combining two None masks does not make one
+    assert (a + a)._mask is None
+    assert_equal_nounits((a + b).mask, mask)
+    assert_equal_nounits((b * a).mask, mask)
+    assert (-a)._mask is None
+    # The full mask is only made when it is asked for
+    assert_equal_nounits(a.mask, np.ones(6, dtype="bool"))
+    s = make_string_array(["ON", "OFF", "ON", "ON", "OFF", "ON"])
+    assert s._mask is None
+    assert not s.has_bad
+    assert s[2:4]._mask is None
+
+
+def test_find_indices_arrays():
+    from cxotime import CxoTime
+    times = intern_times(6.0e8 + 32.8 * np.arange(20))
+    expected = [3, 7, 7, 15]
+    secs = times.value[expected] + 1.0
+    # Arrays of times in seconds, as floats or a Quantity
+    for item in [secs, secs.tolist(), times[expected] + 1.0 * times.unit]:
+        idxs, t = find_indices(item, times)
+        assert_equal_nounits(idxs, expected)
+        assert_equal_nounits(t, times.value[expected])
+    # Arrays of date strings, whose indices are reused for the same dates
+    dates = CxoTime(secs).date
+    idxs, t = find_indices(dates, times)
+    assert_equal_nounits(idxs, expected)
+    assert find_indices(np.array(dates), times)[0] is idxs
+    with pytest.raises(RuntimeError):
+        find_indices(np.array([times.value[0] - 100.0]), times)
+    # An all-true mask selects everything, as a view
+    idxs, t = find_indices(np.ones(20, dtype="bool"), times)
+    assert idxs == slice(None, None, None)
+    assert np.shares_memory(t.value, times.value)
+    a = APQuantity(np.arange(20.0), times, "V")
+    assert np.shares_memory(a[np.ones(20, dtype="bool")].value, a.value)
+    # Other masks select the samples where they are true
+    mask = np.arange(20) % 3 == 0
+    assert_equal_nounits(a[mask], np.arange(20.0)[mask])
+    assert_equal_nounits(a[mask].times, times.value[mask])
+
+
+def test_compact_values():
+    rng = np.random.default_rng(42)
+    # Integers, including those stored as floats, use the smallest
+    # integer type which holds them
+    for v, dtype in [(np.round(rng.uniform(0, 200, 100)), np.uint8),
+                     (np.round(rng.uniform(-1000, 1000, 100)), np.int16),
+                     (np.arange(100, dtype="int64"), np.uint8)]:
+        cv = compact_values(v)
+        assert cv.dtype == dtype
+        assert_equal_nounits(cv, v)
+    # Quantized floats are stored as float32 within the tolerance
+    v = np.round(rng.uniform(-20.0, 40.0, 1000), 1)
+    v[10] = np.nan
+    cv = compact_values(v)
+    assert cv.dtype == np.float32
+    resolution = np.diff(np.unique(v[np.isfinite(v)])).min()
+    err = np.nanmax(np.abs(cv.astype("float64") - v))
+    assert err <= 1.0e-3 * resolution
+    assert np.isnan(cv[10])
+    # Closely spaced floats which need their full resolution are kept
+    v = rng.normal(size=10000)
+    assert compact_values(v).dtype == np.float64
+
+
+def test_compact_quantity():
+    rng = np.random.default_rng(43)
+    times = intern_times(6.0e8 + 32.8 * np.arange(100))
+    v = np.round(rng.uniform(-20.0, 40.0, 100), 1)
+    q = make_quantity(v, times, "deg_C", precision="compact")
+    assert q.dtype == np.float32
+    assert q._full_dtype == np.float64
+    # Arithmetic and averages are done in the full dtype
+    for ret in [q * 2.0, q - q, np.sqrt(q * q)]:
+        assert ret.dtype == np.float64
+    assert_allclose_nounits(q * 2.0, v * 2.0, rtol=1.0e-6)
+    assert q.mean().dtype == np.float64
+    assert_allclose_nounits(q.mean(), v.mean(), rtol=1.0e-6)
+    # Integers are upcast before they can overflow
+    counts = make_quantity(np.arange(100.0), times, "", precision="compact")
+    assert counts.dtype == np.uint8
+    assert_equal_nounits(counts * 1000, np.arange(100.0) * 1000)
+    # Slices keep the full dtype
+    assert counts[10:20]._full_dtype == np.float64
+    assert make_quantity(v, times, "deg_C").dtype == np.float64
+    with pytest.raises(RuntimeError):
+        make_quantity(v, times, "deg_C", precision="half")
+
+
+class FakeComp:
+    def __init__(self, mvals):
+        self.mvals = mvals
+
+
+class FakeXijaModel:
+    def __init__(self, times, comps):
+        self.times = times
+        self.comp = {k: FakeComp(v) for k, v in comps.items()}
+
+
+def test_model_from_xija_precision():
+    from acispy.model import Model
+    rng = np.random.default_rng(44)
+    times = 6.0e8 + 328.0 * np.arange(10000)
+    temps = 20.0 + rng.normal(size=10000)
+    pitch = np.round(rng.uniform(45.0, 170.0, 10000), 1)
+    xija_model = FakeXijaModel(times, {"1dpamzt": temps, "pitch": pitch})
+    full = Model.from_xija(xija_model, ["1dpamzt", "pitch"])
+    compact = Model.from_xija(xija_model, ["1dpamzt", "pitch"],
+                              precision="compact")
+    assert full["pitch"].dtype == np.float64
+    assert compact["pitch"].dtype == np.float32
+    assert_allclose_nounits(compact["pitch"], pitch, rtol=1.0e-6)
+    assert (compact["pitch"] * 2.0).dtype == np.float64
+    # Model temperatures need their full resolution
+    assert compact["1dpamzt"].dtype == np.float64
+    assert_equal_nounits(compact["1dpamzt"], full["1dpamzt"])
+    assert compact["pitch"].times is full["pitch"].times
+
+
+def test_intern_times_copies():
+    t = 6.0e8 + 32.8 * np.arange(10)
+    base = intern_times(t)
+    assert not base.flags.writeable
+    assert intern_times(t.copy()) is base
+    # Changing the original array does not change the shared base
+    t[0] += 1.0
+    assert base.value[0] == 6.0e8
+    assert intern_times(t) is not base
+    assert intern_times(6.0e8 + 32.8 * np.arange(10)) is base
+
+
+def use_tdb_snapshot(monkeypatch, tables, tmp_path):
+    import gzip
+    import json
+    from acispy import tdb_tables
+    filename = tmp_path / "tdb_tables.json.gz"
+    with gzip.open(filename, "wt") as f:
+        json.dump(tables, f)
+    monkeypatch.setattr(tdb_tables, "tdb_tables_file", str(filename))
+    monkeypatch.setattr(tdb_tables, "_tables", None)
+
+
+def test_units_from_tdb_snapshot(monkeypatch, tmp_path):
+    from acispy import units
+    tables = {"units": {"1dp28avo": "V", "1dpamzt": "DEGC",
+                        "no_unit_msid": None},
+              "state_codes": {}, "missing": ["not_an_msid"]}
+    use_tdb_snapshot(monkeypatch, tables, tmp_path)
+
+    def _query_units(fname):
+        raise AssertionError(f"Ska.tdb was queried for {fname}!")
+
+    warnings = []
+    monkeypatch.setattr(units, "_query_units", _query_units)
+    monkeypatch.setattr(units.mylog, "warning", warnings.append)
+    for msid in ["1dp28avo", "no_unit_msid", "not_an_msid"]:
+        monkeypatch.delitem(units.msid_units, msid, raising=False)
+    assert units.get_units("msids", "1dp28avo") == "V"
+    assert len(warnings) == 0
+    # MSIDs with no unit, and MSIDs which are not in Ska.tdb, are
+    # dimensionless with a warning, as when Ska.tdb is queried
+    assert units.get_units("msids", "no_unit_msid") == ""
+    assert len(warnings) == 1
+    assert units.get_units("msids", "not_an_msid") == ""
+    assert len(warnings) == 2
+
+
+def test_units_without_tdb_snapshot(monkeypatch, tmp_path):
+    from acispy import tdb_tables, units
+    monkeypatch.setattr(tdb_tables, "tdb_tables_file",
+                        str(tmp_path / "tdb_tables.json.gz"))
+    monkeypatch.setattr(tdb_tables, "_tables", None)
+    monkeypatch.setattr(units, "msid_units", dict(units.msid_units))
+    units.msid_units.pop("1dpamzt", None)
+    queried = []
+
+    def _query_units(fname):
+        queried.append(fname)
+        return "DEGC"
+
+    monkeypatch.setattr(units, "_query_units", _query_units)
+    # Without a snapshot, units are looked up in Ska.tdb itself
+    assert units.get_units("msids", "1dpamzt") == units.units_trans["DEGC"]
+    assert queried == ["1dpamzt"]
+    # and are then kept, so that Ska.tdb is only queried once
+    assert units.get_units("msids", "1dpamzt") == units.units_trans["DEGC"]
+    assert queried == ["1dpamzt"]
+
+
+def test_make_tdb_tables(monkeypatch, tmp_path):
+    Ska_tdb = pytest.importorskip("Ska.tdb")
+    from acispy import tdb_tables
+    from acispy.tdb_tables import query_state_codes
+    filename = tmp_path / "tdb_tables.json.gz"
+    msids = ["1dpamzt", "ccsdstmf", "not_an_msid"]
+    tdb_tables.make_tdb_tables(msids=msids, filename=filename)
+    monkeypatch.setattr(tdb_tables, "tdb_tables_file", str(filename))
+    monkeypatch.setattr(tdb_tables, "_tables", None)
+    assert tdb_tables.tdb_units("1dpamzt") == Ska_tdb.msids["1dpamzt"].eng_unit
+    assert tdb_tables.tdb_units("not_an_msid") is None
+    assert tdb_tables.tdb_state_codes("ccsdstmf") == query_state_codes("ccsdstmf")
+    assert tdb_tables.tdb_state_codes("1dpamzt") is None
@@ -0,0 +1,183 @@
+import numpy as np
+from acispy.utils import rolling_stats, binned_stats, secs2date, \
+    _get_leap_table, convert_state_code
+from acispy.units import APStringArray, intern_times
+from cxotime import CxoTime
+from .utils import assert_allclose_nounits, assert_equal_nounits
+
+
+def brute_force_rolling(values, times, window, stat, good):
+    n = values.size
+    out = np.full(n, np.nan)
+    for i in range(n):
+        if isinstance(window, int):
+            lo = max(i - window // 2, 0)
+            hi = min(i - window // 2 + window, n)
+            idxs = np.arange(lo, hi)
+        else:
+            idxs = np.where(np.abs(times - times[i]) <= 0.5 * window)[0]
+        v = values[idxs][good[idxs]]
+        if v.size == 0:
+            continue
+        if stat == "mean":
+            out[i] = v.mean()
+        elif stat == "std":
+            out[i] = v.std()
+        elif stat == "min":
+            out[i] = v.min()
+        elif stat == "max":
+            out[i] = v.max()
+        else:
+            out[i] = np.quantile(v, stat)
+    return out
+
+
+def test_rolling_stats():
+    rng = np.random.default_rng(1234)
+    n = 500
+    # Irregularly sampled times with a gap, and repeated values
+    times = np.cumsum(rng.uniform(1.0, 60.0, size=n))
+    times[250:] += 7200.0
+    values = np.round(rng.normal(20.0, 5.0, size=n), 1)
+    values[100] = np.nan
+    mask = np.ones(n, dtype="bool")
+    mask[200:220] = False
+    good = mask & np.isfinite(values)
+    stats = ["mean", "std", "min", "max", 0.0, 0.1, 0.5, 0.95, 1.0]
+    # Windows of a single sample, windows longer than the data, windows
+    # lying entirely in the bad samples or the gap, and a number of
+    # samples equal to a length of time
+    windows = [1, 4, 15, 15.0, 600.0, 3600.0, 1000, 1.0e7]
+    out = rolling_stats(values, times, windows, stats=stats, mask=mask)
+    for window in windows:
+        kind = "samples" if isinstance(window, int) else "time"
+        for stat in stats:
+            expected = brute_force_rolling(values, times, window, stat, good)
+            # The std comes from cumulative sums of squares, so it is
+            # only accurate to about the square root of the roundoff
+            atol = 1.0e-5 if stat == "std" else 1.0e-8
+            assert_allclose_nounits(out[stat, kind, window], expected,
+                                    rtol=1.0e-10, atol=atol,
+                                    err_msg=f"{stat} {kind} {window}")
+
+
+def test_rolling_stats_no_good_samples():
+    times = np.arange(10.0)
+    values = np.arange(10.0)
+    out = rolling_stats(values, times, [3], stats=["mean", "max", 0.5],
+                        mask=np.zeros(10, dtype="bool"))
+    for stat in ["mean", "max", 0.5]:
+        assert np.all(np.isnan(out[stat, "samples", 3]))
+
+
+def test_binned_stats():
+    rng = np.random.default_rng(5678)
+    times = np.sort(rng.uniform(0.0, 1000.0, size=300))
+    # Samples exactly on the edges, including the first and last
+    times[[0, 50, -1]] = [0.0, 200.0, 1000.0]
+    values = rng.normal(10.0, 3.0, size=300)
+    values[10] = np.nan
+    mask = np.ones(300, dtype="bool")
+    mask[100:130] = False
+    # The bin from 500 to 520 contains no samples, and the bins before
+    # and after the data should be empty
+    times[(times >= 500.0) & (times < 520.0)] = 530.0
+    times = np.sort(times)
+    edges = np.array([-100.0, 0.0, 200.0, 500.0, 520.0, 1000.0, 1100.0])
+    how = ["mean", "std", "min", "max", "count"]
+    out = binned_stats(values, times, edges, how=how, mask=mask)
+    good = mask & np.isfinite(values)
+    for i in range(edges.size - 1):
+        if i == edges.size - 2:
+            in_bin = (times >= edges[i]) & (times <= edges[i+1])
+        else:
+            in_bin = (times >= edges[i]) & (times < edges[i+1])
+        v = values[in_bin & good]
+        assert out["count"][i] == v.size
+        if v.size == 0:
+            for agg in ["mean", "std", "min", "max"]:
+                assert np.isnan(out[agg][i])
+        else:
+            assert_allclose_nounits(out["mean"][i], v.mean())
+            assert_allclose_nounits(out["std"][i], v.std(), atol=1.0e-12)
+            assert out["min"][i] == v.min()
+            assert out["max"][i] == v.max()
+    # The bins before the data and with no samples are empty, and the
+    # sample at 1000 is the only one in the last bin
+    assert out["count"][0] == 0
+    assert out["count"][3] == 0
+    assert out["count"][5] == 1
+    assert out["count"].sum() == good.sum()
+    # The last bin includes its right edge
+    out = binned_stats([1.0, 2.0, 3.0], [0.0, 1.0, 2.0], [0.0, 1.0, 2.0],
+                       how=["count", "max"])
+    assert_allclose_nounits(out["count"], [1.0, 2.0])
+    assert_allclose_nounits(out["max"], [1.0, 3.0])
+
+
+def test_secs2date_leap_seconds():
+    starts, tai_utc, leap_starts = _get_leap_table()
+    # The first entry is the start of the table in 1972, not a leap
+    # second
+    leap_starts = leap_starts[1:]
+    # Times on either side of each leap second and during it, which
+    # is shown as the 60th second of the minute
+    offsets = np.array([-1.5, -1.0, -0.5, -0.0004, 0.0, 0.0004, 0.25,
+                        0.5, 0.9996, 1.0, 1.0004, 1.5, 86400.0])
+    secs = (leap_starts[:, np.newaxis] + offsets).ravel()
+    assert_equal_nounits(secs2date(secs), CxoTime(secs).date)
+    dates = secs2date(leap_starts)
+    assert all(date[15:17] == "60" for date in dates)
+    assert secs2date(leap_starts[-1]) == CxoTime(leap_starts[-1]).date
+
+
+def test_secs2date_rounding():
+    rng = np.random.default_rng(91011)
+    t0 = rng.uniform(0.0, 8.5e8, size=200)
+    # Fractional seconds at, just below, and just above the points
+    # where the milliseconds are rounded
+    half = np.floor(t0 * 1000.0) / 1000.0 + 0.0005
+    secs = np.concatenate([t0, half, half - 1.0e-7, half + 1.0e-7,
+                           np.floor(t0) + 0.9995, np.floor(t0) + 0.9999])
+    assert_equal_nounits(secs2date(secs), CxoTime(secs).date)
+    assert_equal_nounits(secs2date(secs.reshape(4, -1)),
+                         CxoTime(secs).date.reshape(4, -1))
+
+
+class FakeDataset:
+    def __init__(self, fields, state_codes):
+        self.fields = fields
+        self.state_codes = state_codes
+        self._state_code_cache = {}
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+
+class PlainField:
+    def __init__(self, value):
+        self.value = value
+        self.shape = value.shape
+
+
+def test_convert_state_code():
+    values = np.array(["NPNT", "NMAN", "NPNT", "NSUN", "UNKN", "NMAN"])
+    times = intern_times(6.0e8 + 32.8 * np.arange(values.size))
+    field = ("msids", "aopcadmd")
+    state_codes = {"NPNT": 1, "NMAN": 2, "NSUN": 3}
+    ds = FakeDataset({field: APStringArray(values, times)},
+                     {field: state_codes})
+    # The result is the same as looking up each state in turn
+    expected = np.array([state_codes.get(val, -1) for val in values])
+    codes = convert_state_code(ds, field)
+    assert_equal_nounits(codes, expected)
+    # A second conversion of the same data comes from the cache
+    assert convert_state_code(ds, field) is codes
+    # but new data for the field are converted again
+    ds.fields[field] = APStringArray(values[::-1], times)
+    codes2 = convert_state_code(ds, field)
+    assert codes2 is not codes
+    assert_equal_nounits(codes2, expected[::-1])
+    # Fields which are not stored as categories are converted as well
+    ds.fields[field] = PlainField(values)
+    assert_equal_nounits(convert_state_code(ds, field), expected)
@@ -7,17 +7,30 @@ import numpy as np
 from cxotime import CxoTime
 from acispy.states import States
 from acispy.model import Model
+from acispy.units import APQuantity, intern_times, lazy_mask
+from acispy.archive import get_time_range, get_time_ranges, \
+    get_last_value, is_fresh
 from acispy.msids import MSIDs
 from acispy.time_series import EmptyTimeSeries
 from acispy.utils import mylog, \
     ensure_list, plotdate2cxctime, \
-    dict_to_array
+    dict_to_array, savez_atomic
 import Ska.Numpy
 import Ska.engarchive.fetch_sci as fetch
 import matplotlib.pyplot as plt
 from kadi import events, commands
 from kadi.commands import states as cmd_states
+import copy
 import importlib
+import itertools
+import hashlib
+import json
+import multiprocessing
+import zipfile
+import os
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
 from matplotlib import font_manager
 from pathlib import Path
 
@@ -65,6 +78,322 @@ model_classes = {
 }
 
 
+ephem_msids = [f"{e}ephem0_{axis}" for e in ["orbit", "solar"]
+               for axis in "xyz"]
+
+
+class EphemerisCache:
+    """
+    A cache of the Chandra orbit and solar ephemeris. Ephemeris data
+    fetched from the archive are stored in segments, and the
+    ephemeris for any time range within a stored segment is
+    interpolated from it without fetching the data again. Segments
+    only cover the times which the archive had data for. The
+    ephemeris after the time it was fetched at is predictive, and is
+    revised later, so once a segment is older than ``archive_ttl``
+    it only covers the times up to *predictive_margin* seconds
+    before it was fetched. Custom ephemeris files are only read once.
+
+    Parameters
+    ----------
+    filename : string, optional
+        The path to a .npz file to persist the archive ephemeris to
+        between sessions. Default: None, which keeps the cache in
+        memory only.
+    predictive_margin : float, optional
+        The time in seconds before the fetch time of a segment after
+        which its ephemeris may still be revised. Default: 259200.0
+        (3 days)
+    """
+    def __init__(self, filename=None, predictive_margin=259200.0):
+        self.filename = filename
+        self.predictive_margin = predictive_margin
+        self.segments = []
+        self.files = {}
+        self._dirty = False
+        if filename is not None and os.path.exists(filename):
+            self._load()
+
+    def _load(self):
+        with np.load(self.filename) as f:
+            for i in range(int(f["num_segments"])):
+                # Segments written without a fetch time are expired
+                # on their first use
+                fetched = f[f"seg{i}_fetched"] \
+                    if f"seg{i}_fetched" in f.files else 0.0
+                seg = {"tstart": f[f"seg{i}_range"][0],
+                       "tstop": f[f"seg{i}_range"][1],
+                       "fetched": float(fetched)}
+                for msid in ephem_msids:
+                    seg[msid] = (f[f"seg{i}_{msid}_times"],
+                                 f[f"seg{i}_{msid}_vals"])
+                self.segments.append(seg)
+
+    def save(self):
+        """
+        Write the archive ephemeris to disk, if a filename was given
+        and segments were added since it was last written.
+        """
+        if self.filename is None or not self._dirty:
+            return
+        arrays = {"num_segments": len(self.segments)}
+        for i, seg in enumerate(self.segments):
+            arrays[f"seg{i}_range"] = np.array([seg["tstart"], seg["tstop"]])
+            arrays[f"seg{i}_fetched"] = seg["fetched"]
+            for msid in ephem_msids:
+                arrays[f"seg{i}_{msid}_times"] = seg[msid][0]
+                arrays[f"seg{i}_{msid}_vals"] = seg[msid][1]
+        savez_atomic(self.filename, **arrays)
+        self._dirty = False
+
+    def add_segment(self, seg):
+        """
+        Add a segment of ephemeris data, replacing any segments which
+        it covers.
+        """
+        if any(s is seg for s in self.segments):
+            return
+        seg.setdefault("fetched", time.time())
+        self.segments = [s for s in self.segments
+                         if not (seg["tstart"] <= s["tstart"]
+                                 and s["tstop"] <= seg["tstop"])]
+        self.segments.append(seg)
+        self._dirty = True
+
+    def clear(self):
+        """
+        Remove all of the ephemeris data from the cache.
+        """
+        self.segments = []
+        self.files = {}
+        self._dirty = False
+
+    def _expire(self):
+        # Stop using the predictive part of the segments which are
+        # older than the TTL, and drop those which have nothing else
+        segments = []
+        for seg in self.segments:
+            if not is_fresh(seg["fetched"]):
+                final = CxoTime(seg["fetched"], format="unix").secs - \
+                    self.predictive_margin
+                if seg["tstop"] > final:
+                    seg["tstop"] = final
+                    self._dirty = True
+                if seg["tstop"] <= seg["tstart"]:
+                    self._dirty = True
+                    continue
+            segments.append(seg)
+        self.segments = segments
+
+    def fetch(self, tstart, tstop):
+        """
+        Return a segment of archive ephemeris data which covers the
+        times *tstart* to *tstop* in seconds, fetching it if needed.
+        """
+        self._expire()
+        for seg in self.segments:
+            if seg["tstart"] <= tstart and seg["tstop"] >= tstop:
+                return seg
+        # Fetch over any overlapping segments, so that they are
+        # replaced by the new one
+        for seg in self.segments:
+            if seg["tstart"] <= tstop and seg["tstop"] >= tstart:
+                tstart = min(tstart, seg["tstart"])
+                tstop = max(tstop, seg["tstop"])
+        e = fetch.MSIDset(ephem_msids, tstart, tstop)
+        seg = {"fetched": time.time()}
+        for msid in ephem_msids:
+            seg[msid] = (e[msid].times, e[msid].vals)
+        # Only claim the times which the archive actually has, so that
+        # ranges past the end of the data are fetched again later
+        tfirst = max(seg[msid][0][0] for msid in ephem_msids)
+        tlast = min(seg[msid][0][-1] for msid in ephem_msids)
+        seg["tstart"] = tstart if tfirst <= tstart + 1000.0 else tfirst
+        seg["tstop"] = tstop if tlast >= tstop - 1000.0 else tlast
+        self.add_segment(seg)
+        self.save()
+        return seg
+
+    def interpolate(self, tstart, tstop, times):
+        """
+        Interpolate the archive ephemeris between the times *tstart*
+        and *tstop* in seconds onto *times*.
+        """
+        seg = self.fetch(tstart, tstop)
+        ephem = {}
+        for msid in ephem_msids:
+            t, v = seg[msid]
+            i0 = np.searchsorted(t, tstart, side="left")
+            i1 = np.searchsorted(t, tstop, side="right")
+            ephem[msid] = Ska.Numpy.interpolate(v[i0:i1], t[i0:i1], times)
+        return ephem
+
+    def interpolate_file(self, ephem_file, tstart, tstop, times):
+        """
+        Interpolate the ephemeris from the file *ephem_file* between
+        the times *tstart* and *tstop* in seconds onto *times*.
+        """
+        path = Path(ephem_file).resolve()
+        key = (str(path), path.stat().st_mtime)
+        if key not in self.files:
+            e = ascii.read(ephem_file)
+            self.files[key] = {k: np.asarray(e[k]) 
+                               for k in ["times"] + ephem_msids}
+        e = self.files[key]
+        idxs = np.logical_and(e["times"] >= tstart, e["times"] <= tstop)
+        ephem = {}
+        for msid in ephem_msids:
+            ephem[msid] = Ska.Numpy.interpolate(e[msid][idxs],
+                                                e["times"][idxs], times)
+        return ephem
+
+
+_ephem_cache = EphemerisCache()
+
+
+def enable_ephemeris_cache(filename):
+    """
+    Persist the ephemeris fetched for thermal model runs to a .npz
+    file, so that later sessions can reuse it.
+
+    Parameters
+    ----------
+    filename : string
+        The path to the .npz file.
+
+    Examples
+    --------
+    >>> from acispy.thermal_models import enable_ephemeris_cache
+    >>> enable_ephemeris_cache("ephem_cache.npz")
+    """
+    global _ephem_cache
+    _ephem_cache = EphemerisCache(filename=filename)
+    return _ephem_cache
+
+
+def disable_ephemeris_cache():
+    """
+    Stop persisting the ephemeris to disk, and clear the in-memory cache.
+    """
+    global _ephem_cache
+    _ephem_cache = EphemerisCache()
+
+
+# Read-only inputs which are looked up once by ThermalModelRunner.run_many
+# and shared with the worker processes
+_shared_inputs = {}
+
+
+def _init_worker(shared):
+    _shared_inputs.clear()
+    _shared_inputs.update(shared)
+    if "ephem" in shared:
+        _ephem_cache.add_segment(shared["ephem"])
+
+
+@contextmanager
+def _use_shared_inputs(shared):
+    old_inputs = dict(_shared_inputs)
+    _init_worker(shared)
+    try:
+        yield
+    finally:
+        _init_worker(old_inputs)
+
+
+def _prepare_shared_inputs(specs, time_range=None, states=None):
+    # Resolve the model specs of the runs in place, and look up the
+    # inputs which are the same for all of them. Shared states are
+    # converted to a record array here, once for all of the runs
+    ephem_range = None
+    for spec in specs:
+        name = spec["name"]
+        name = short_name_rev.get(name, name)
+        if spec.get("model_spec", None) is None:
+            template = get_model_template(
+                name, repo_path=spec.get("chandra_models_path", None),
+                version=spec.get("chandra_models_version", None))
+            spec["model_spec"] = template.model_spec
+        if name in acis_models and spec.get("ephem_file", None) is None:
+            if time_range is None:
+                tstart = CxoTime(spec["tstart"]).secs
+                tstop = CxoTime(spec["tstop"]).secs
+            else:
+                tstart, tstop = CxoTime(time_range).secs
+            tstart -= 3000.0
+            tstop += 3000.0
+            if ephem_range is None:
+                ephem_range = [tstart, tstop]
+            else:
+                ephem_range = [min(ephem_range[0], tstart),
+                               max(ephem_range[1], tstop)]
+    shared = {"last_ecl_time": get_time_range("aoeclips")[1]}
+    if ephem_range is not None:
+        shared["ephem"] = _ephem_cache.fetch(ephem_range[0], ephem_range[1])
+    if states is not None:
+        shared["states"] = _states_to_array(states)
+    return shared
+
+
+def _share_model_specs(specs):
+    # Replace the parsed model specs of the runs with their hashes, so
+    # that each one is sent to the workers once instead of with every run
+    model_specs = {}
+    hashes = {}
+    for spec in specs:
+        model_spec = spec.get("model_spec", None)
+        if isinstance(model_spec, dict):
+            if id(model_spec) not in hashes:
+                hashes[id(model_spec)] = _hash_spec(model_spec)
+            spec_hash = hashes[id(model_spec)]
+            model_specs[spec_hash] = model_spec
+            del spec["model_spec"]
+            spec["spec_hash"] = spec_hash
+    return model_specs
+
+
+def _shared_states():
+    # The States object of the shared states, which is only set up
+    # once in each process
+    if "states_obj" not in _shared_inputs:
+        _shared_inputs["states_obj"] = States(_shared_inputs["states"])
+    return _shared_inputs["states_obj"]
+
+
+def _states_to_array(states):
+    # Convert states supplied as a States object or a dict of arrays
+    # to the record array which the models are run with. A record
+    # array is passed through unchanged
+    if isinstance(states, np.ndarray):
+        return states
+    elif isinstance(states, States):
+        states = states.as_array()
+    elif isinstance(states, dict):
+        if "tstart" not in states:
+            states["tstart"] = CxoTime(states["datestart"]).secs
+        if "tstop" not in states:
+            states["tstop"] = CxoTime(states["datestop"]).secs
+        num_states = states["tstart"].size
+        if "letg" not in states:
+            states["letg"] = np.array(["RETR"] * num_states)
+        if "hetg" not in states:
+            states["hetg"] = np.array(["RETR"] * num_states)
+        states = dict_to_array(states)
+    return states
+
+
+def _run_spec(args):
+    cls, spec = args
+    kwargs = dict(spec)
+    if "spec_hash" in kwargs:
+        spec_hash = kwargs.pop("spec_hash")
+        kwargs["model_spec"] = _shared_inputs["model_specs"][spec_hash]
+    if "states" in spec or "states" not in _shared_inputs:
+        return ThermalModelResult(cls(**kwargs), spec)
+    runner = cls(states=_shared_inputs["states"], **kwargs)
+    return ThermalModelResult(runner, spec, shared_states=True)
+
+
 def find_json(name, model_spec, repo_path, version):
     from xija.get_model_spec import get_xija_model_spec
     msg = f"The JSON file {model_spec} does not exist! Please " \
@@ -78,6 +407,9 @@ def find_json(name, model_spec, repo_path, version):
         except ValueError:
             raise IOError(msg)
         mylog.info("Using model for %s from chandra_models version = %s", name, version)
+    elif isinstance(model_spec, dict):
+        # An already-parsed model specification
+        pass
     else:
         model_path = Path(model_spec).resolve()
         if not model_path.exists():
@@ -86,6 +418,214 @@ def find_json(name, model_spec, repo_path, version):
     return model_spec
 
 
+def load_model_spec(name, model_spec=None, repo_path=None, version=None):
+    """
+    Return the parsed model specification for the model *name* as a
+    dict, and a hash of its contents.
+    """
+    model_spec = find_json(name, model_spec, repo_path, version)
+    if not isinstance(model_spec, dict):
+        with open(model_spec, "r") as f:
+            model_spec = json.load(f)
+    return model_spec, _hash_spec(model_spec)
+
+
+def _hash_spec(model_spec):
+    # Model specs which were shared with the worker processes by
+    # ThermalModelRunner.run_many are already hashed
+    for spec_hash, spec in _shared_inputs.get("model_specs", {}).items():
+        if spec is model_spec:
+            return spec_hash
+    return hashlib.sha1(
+        json.dumps(model_spec, sort_keys=True).encode()).hexdigest()
+
+
+class ModelTemplate:
+    """
+    The parts of a thermal model which are the same for every run:
+    the parsed model specification, and for the ACIS models, the
+    acis_thermal_check check object and the limit tables. Templates
+    are obtained with ``get_model_template``, which keeps one for
+    each model name, specification, and chandra_models version.
+
+    Parameters
+    ----------
+    name : string
+        The name of the MSID to simulate, e.g. "1dpamzt"
+    model_spec : string or dict, optional
+        Path to the model spec JSON file for the model, or the parsed
+        model spec. Default: None, the standard model path will be used.
+    repo_path : str, optional
+        The path to the chandra_models repository. Default: None
+    version : str, optional
+        The version of the chandra_models repository. Default: None
+    """
+    def __init__(self, name, model_spec=None, repo_path=None, version=None):
+        self.name = name.lower()
+        self.sname = short_name.get(self.name, self.name)
+        self.model_spec, self.spec_hash = load_model_spec(name, model_spec,
+                                                          repo_path, version)
+        if self.name in acis_models:
+            self.model_check = importlib.import_module(
+                f"acis_thermal_check.apps.{self.sname}_check")
+            self.check_obj = getattr(self.model_check,
+                                     model_classes[self.sname])()
+        else:
+            self.model_check = None
+            self.check_obj = None
+        self._limits = {}
+
+    def new_spec(self):
+        """
+        Return a copy of the model spec, for a new xija model.
+        """
+        return copy.deepcopy(self.model_spec)
+
+    def limits(self, margin=0.0):
+        """
+        Return the limits of an ACIS model for the given *margin*.
+        """
+        if self.check_obj is None:
+            raise ValueError(f"The {self.name} model is not an ACIS model, "
+                             f"so it does not have ACIS limits!")
+        if margin not in self._limits:
+            self._limits[margin] = self.check_obj._limit_class(
+                model_spec=self.model_spec, margin=margin).limits
+        return self._limits[margin]
+
+
+_model_templates = {}
+
+
+def get_model_template(name, model_spec=None, repo_path=None, version=None):
+    """
+    Get the :class:`~acispy.thermal_models.ModelTemplate` for a model,
+    creating it the first time it is asked for. Templates are keyed by
+    the model name and either the path and modification time of the
+    model spec file, the hash of a parsed model spec, or the
+    chandra_models path and version.
+    """
+    name = short_name_rev.get(name, name).lower()
+    if isinstance(model_spec, dict):
+        key = (name, "spec", _hash_spec(model_spec))
+    elif model_spec is not None:
+        path = Path(model_spec).resolve()
+        mtime = path.stat().st_mtime if path.exists() else None
+        key = (name, "file", str(path), mtime)
+    else:
+        key = (name, "repo", repo_path, version)
+    if key not in _model_templates:
+        _model_templates[key] = ModelTemplate(name, model_spec=model_spec,
+                                              repo_path=repo_path,
+                                              version=version)
+    return _model_templates[key]
+
+
+def clear_model_templates():
+    """
+    Forget all of the model templates, e.g. after chandra_models
+    has been updated.
+    """
+    _model_templates.clear()
+
+
+# Columns of a kadi states table which are not state values
+_state_meta_keys = ("datestart", "datestop", "tstart", "tstop", "trans_keys")
+
+# The number of continuity periods kept by get_continuity_states
+continuity_cache_size = 4
+
+_continuity_cache = OrderedDict()
+
+
+def get_continuity_states(tstart, tstop):
+    """
+    Get the commands from the kadi archive between *tstart* and
+    *tstop* and the states derived from them, which are used for
+    continuity by :meth:`~acispy.thermal_models.ThermalModelRunner.from_backstop`.
+    Both are kept in memory keyed by the time range, so that many
+    backstop files can be run against the same continuity period.
+    They are looked up again once they are older than ``archive_ttl``
+    in :mod:`acispy.archive`, so that newly approved loads are picked
+    up, and only the ``continuity_cache_size`` most recently used
+    periods are kept.
+
+    Parameters
+    ----------
+    tstart : string or float
+        The start time of the continuity commands in YYYY:DOY:HH:MM:SS
+        format or seconds.
+    tstop : string or float
+        The stop time of the continuity commands in YYYY:DOY:HH:MM:SS
+        format or seconds. Commands at this time are included.
+
+    Returns
+    -------
+    A (CommandTable, states Table) tuple.
+    """
+    key = (CxoTime(tstart).date, CxoTime(tstop).date)
+    entry = _continuity_cache.get(key, None)
+    if entry is None or not is_fresh(entry[0]):
+        cmds = commands.get_cmds(key[0], key[1], inclusive_stop=True)
+        states = cmd_states.get_states(cmds=cmds, merge_identical=True)
+        entry = (time.time(), (cmds, states))
+        _continuity_cache[key] = entry
+    _continuity_cache.move_to_end(key)
+    while len(_continuity_cache) > continuity_cache_size:
+        _continuity_cache.popitem(last=False)
+    return entry[1]
+
+
+def clear_continuity_cache():
+    """
+    Forget all of the cached continuity commands and states, e.g.
+    after the kadi commands archive has been updated.
+    """
+    _continuity_cache.clear()
+
+
+def _states_from_continuity(cont_cmds, cont_states, new_cmds):
+    """
+    Derive the states for the continuity commands plus *new_cmds*,
+    reusing the continuity states up to the first new command and
+    starting the derivation of the rest from the continuity state at
+    that time. If transitions from earlier commands are still pending
+    at that time, such as a maneuver in progress, all of the states
+    are derived from all of the commands instead.
+    """
+    from astropy.table import vstack
+    tsplit = new_cmds["date"][0]
+    i = np.searchsorted(cont_states["datestart"], tsplit, side="left") - 1
+    # Continuity states which begin after the split come either from
+    # the continuity commands after it, which are used again below, or
+    # from transitions which were pending at the split and would be
+    # lost by restarting the derivation there
+    restart_dates = set(cont_cmds["date"][cont_cmds["date"] >= tsplit])
+    pending = any(date not in restart_dates
+                  for date in cont_states["datestart"][i+1:])
+    if i < 0 or pending:
+        # The states must be derived from all of the commands
+        cmds = cont_cmds.add_cmds(new_cmds)
+        return States(cmd_states.get_states(cmds=cmds,
+                                            merge_identical=True).as_array())
+    keys = [k for k in cont_states.colnames if k not in _state_meta_keys]
+    continuity = {k: cont_states[k][i] for k in keys}
+    cmds = cont_cmds[cont_cmds["date"] >= tsplit].add_cmds(new_cmds)
+    new_states = cmd_states.get_states(cmds=cmds, state_keys=keys,
+                                       continuity=continuity,
+                                       merge_identical=True)
+    old_states = cont_states[:i+1].copy()
+    old_states["datestop"][-1] = new_states["datestart"][0]
+    old_states["tstop"][-1] = new_states["tstart"][0]
+    if all(np.all(old_states[k][-1] == new_states[k][0]) for k in keys):
+        # Merge identical states across the join, as a single
+        # derivation would have done
+        old_states["datestop"][-1] = new_states["datestop"][0]
+        old_states["tstop"][-1] = new_states["tstop"][0]
+        new_states = new_states[1:]
+    return States(vstack([old_states, new_states]).as_array())
+
+
 class ModelDataset(Dataset):
     def __init__(self, msids, states, model):
         super(ModelDataset, self).__init__(msids, states, model)
@@ -144,9 +684,8 @@ class ModelDataset(Dataset):
                 if self.states._is_empty:
                     out += [("model", state) for state in states_to_map]
                 else:
-                    for state in states_to_map:
-                        self.map_state_to_msid(state, msid)
-                        out.append(("msids", state))
+                    self.map_state_to_msid(states_to_map, msid)
+                    out += [("msids", state) for state in states_to_map]
             out.append(("model", msid))
             if ("msids", msid) in self.field_list:
                 self.add_diff_data_model_field(msid)
@@ -185,9 +724,7 @@ class ModelDataset(Dataset):
             if "earth_solid_angle" in comps:
                 comps.remove("earth_solid_angle")
             comps.append("ccsdstmf")
-            tlast = 1.0e99
-            for comp in comps:
-                tlast = min(fetch.get_time_range(comp, format='secs')[1], tlast)
+            tlast = min(trange[1] for trange in get_time_ranges(comps).values())
             if tstop > tlast:
                 raise RuntimeError("The model extends past the the last date in the "
                                    "engineering archive. Please set get_msids=False.")
@@ -378,6 +915,113 @@ class ThermalModelFromLoad(ModelDataset):
         super(ThermalModelFromLoad, self).__init__(msids, states, model)
 
 
+def node_values(model, idx):
+    """
+    Return the values of all of the nodes and pseudo-nodes of the
+    xija *model* at the time index *idx*.
+    """
+    return {comp.name: float(comp.mvals[idx]) for comp in model.comps
+            if isinstance(comp, xija.Node)}
+
+
+class ModelCheckpoint:
+    """
+    The values of all of the nodes and pseudo-nodes of a thermal model
+    at a time, from which a new run can be started. Made by
+    :meth:`~acispy.thermal_models.ThermalModelRunner.make_checkpoint`.
+
+    Parameters
+    ----------
+    name : string
+        The name of the modeled MSID.
+    time : float
+        The time of the checkpoint in seconds.
+    nodes : dict
+        The values of the nodes, keyed by node name.
+    T_init : float
+        The value of the modeled MSID.
+    spec_hash : string, optional
+        The hash of the model specification of the run.
+    """
+    def __init__(self, name, time, nodes, T_init, spec_hash=None):
+        self.name = name
+        self.time = float(time)
+        self.nodes = nodes
+        self.T_init = float(T_init)
+        self.spec_hash = spec_hash
+
+    @property
+    def date(self):
+        return CxoTime(self.time).date
+
+    def write(self, filename, overwrite=False):
+        """
+        Write the checkpoint to a JSON file.
+        """
+        if Path(filename).exists() and not overwrite:
+            raise IOError(f"File {filename} already exists, but overwrite=False!")
+        with open(filename, "w") as f:
+            json.dump({"name": self.name, "time": self.time, 
+                       "nodes": self.nodes, "T_init": self.T_init,
+                       "spec_hash": self.spec_hash}, f, indent=2)
+
+    @classmethod
+    def from_file(cls, filename):
+        """
+        Read a checkpoint from a JSON file written by :meth:`write`.
+        """
+        with open(filename, "r") as f:
+            return cls(**json.load(f))
+
+    def __repr__(self):
+        return f"ModelCheckpoint({self.name}, {self.date})"
+
+
+class ThermalModelResult:
+    """
+    A lightweight result of a thermal model run, which holds the
+    model and state arrays but not the xija model itself, so that it
+    is cheap to send between processes. Returned by
+    :meth:`~acispy.thermal_models.ThermalModelRunner.run_many`.
+
+    Attributes
+    ----------
+    name : string
+        The name of the modeled MSID.
+    spec : dict
+        The keyword arguments the model was run with. A parsed model
+        spec is replaced by its hash, under "spec_hash".
+    times : NumPy array
+        The times of the model in seconds.
+    model : dict of Quantity arrays
+        The model components, keyed by name.
+    states : NumPy record array
+        The commanded states of the model run.
+    limits : dict
+        The limits for the model.
+    """
+    def __init__(self, runner, spec, shared_states=False):
+        self.name = runner.name
+        self.spec = spec
+        self.times = runner["model", runner.name].times.value
+        self.model = {}
+        for key in runner.model.keys():
+            v = runner["model", key]
+            self.model[key] = Quantity(v.value, v.unit)
+        # States shared by many runs are filled in by run_many
+        self.states = None if shared_states else runner.states.as_array()
+        self.T_init = runner.T_init
+        self.limits = runner.limits
+
+    @property
+    def mvals(self):
+        return self.model[self.name]
+
+    def __repr__(self):
+        return f"ThermalModelResult({self.name}, " \
+               f"{CxoTime(self.times[0]).date}, {CxoTime(self.times[-1]).date})"
+
+
 class ThermalModelRunner(ModelDataset):
     """
     Class for running Xija thermal models.
@@ -451,6 +1095,29 @@ class ThermalModelRunner(ModelDataset):
         when obtaining a model specification file. Can be a 
         version number or a named branch. Default is to use the
         latest tagged version. 
+    stop_condition : callable, optional
+        A function which takes arrays of times in seconds and model
+        temperatures of the modeled MSID, and returns a boolean array
+        which is True where the run should stop, e.g. a limit crossing.
+        If supplied, the model is evolved in chunks of *chunk_days*
+        and stops at the end of the first chunk in which the condition
+        is met. The model data then run up to the time at which the
+        condition is first met, which is stored in ``stop_time``.
+        Each chunk is started from the node values at the end of the
+        previous one, on the same time grid and with the same states,
+        so the model data are those of a single run up to the stop
+        time. ``xija_model`` is the model of the last chunk.
+        Default: None
+    chunk_days : float, optional
+        The length of the chunks in days if *stop_condition* is
+        supplied. Default: 1.0
+    checkpoint : :class:`~acispy.thermal_models.ModelCheckpoint`, optional
+        Start the run from the node values stored in a checkpoint from
+        a previous run, made with :meth:`make_checkpoint`. The run
+        starts at the time of the checkpoint, which must be between
+        *tstart* and *tstop*, and the checkpoint takes the place of
+        *T_init* and *other_init* (entries in *other_init* override
+        those in the checkpoint). Default: None
 
     Examples
     --------
@@ -471,29 +1138,35 @@ class ThermalModelRunner(ModelDataset):
                  other_init=None, get_msids=False, dt=328.0, model_spec=None,
                  mask_bad_times=False, ephem_file=None, evolve_method=None,
                  rk4=None, tl_file=None, compute_model_supp=None, 
-                 chandra_models_path=None, chandra_models_version=None):
+                 chandra_models_path=None, chandra_models_version=None,
+                 stop_condition=None, chunk_days=1.0, checkpoint=None):
 
         if name in short_name_rev:
             name = short_name_rev[name]
 
         self.name = name.lower()
         self.sname = short_name.get(name, name)
-        if self.name in acis_models:
-            self.model_check = importlib.import_module(
-                f"acis_thermal_check.apps.{self.sname}_check")
-            self.check_obj = getattr(self.model_check, model_classes[self.sname])()
-        else:
-            self.model_check = None
-            self.check_obj = None
-
-        model_spec = find_json(name, model_spec, 
-                               repo_path=chandra_models_path,
-                               version=chandra_models_version)
+        self.template = get_model_template(name, model_spec=model_spec,
+                                           repo_path=chandra_models_path,
+                                           version=chandra_models_version)
+        self.model_check = self.template.model_check
+        self.check_obj = self.template.check_obj
 
         self.ephem_file = ephem_file
  
         self.compute_model_supp = compute_model_supp
 
+        if checkpoint is not None:
+            if not CxoTime(tstart).secs <= checkpoint.time <= CxoTime(tstop).secs:
+                raise RuntimeError(f"The checkpoint at {checkpoint.date} is not "
+                                   f"between the start and stop times!")
+            if checkpoint.spec_hash != self.template.spec_hash:
+                mylog.warning("The checkpoint was made with a different "
+                              "model specification than this run.")
+            tstart = checkpoint.time
+            T_init = checkpoint.T_init
+            other_init = dict(checkpoint.nodes, **(other_init or {}))
+
         tstart = CxoTime(tstart).date
         tstop = CxoTime(tstop).date
 
@@ -505,54 +1178,73 @@ class ThermalModelRunner(ModelDataset):
         self.tstart = Quantity(tstart_secs, "s")
         self.tstop = Quantity(tstop_secs, "s")
 
-        last_ecl_time = fetch.get_time_range("aoeclips", format='secs')[1]
+        last_ecl_time = _shared_inputs.get("last_ecl_time", None)
+        if last_ecl_time is None:
+            last_ecl_time = get_time_range("aoeclips")[1]
         self.no_eclipse = tstop_secs > last_ecl_time
         self.no_earth_heat = getattr(self, "no_earth_heat", False)
 
-        if states is not None:
-            if isinstance(states, States):
-                states = states.as_array()
-            elif isinstance(states, dict):
-                if "tstart" not in states:
-                    states["tstart"] = CxoTime(states["datestart"]).secs
-                if "tstop" not in states:
-                    states["tstop"] = CxoTime(states["datestop"]).secs
-                num_states = states["tstart"].size
-                if "letg" not in states:
-                    states["letg"] = np.array(["RETR"] * num_states)
-                if "hetg" not in states:
-                    states["hetg"] = np.array(["RETR"] * num_states)
-                states = dict_to_array(states)
+        states_obj = states if isinstance(states, States) else None
+        if states is not None and states is _shared_inputs.get("states", None):
+            states_obj = _shared_states()
+        states = _states_to_array(states)
 
         if T_init is None:
-            last_tlm_date = fetch.get_time_range(self.name, format='secs')[1]
+            last_tlm_date = get_time_range(self.name)[1]
             if tstart_secs+700.0 > last_tlm_date:
                 raise RuntimeError(f"T_init=None, but the start time of {tstart} "
                                    "is ahead of the last time in telemetry. "
                                    "Please specify T_init or choose a different "
                                    "time.")
-            T_init = fetch.MSID(self.name, tstart_secs-700., tstart_secs).vals[-1]
+            T_init = get_last_value(self.name, tstart_secs)
 
         self.T_init = Quantity(T_init, "deg_C")
 
-        if self.name in acis_models and states is not None:
-            self.xija_model = self._compute_acis_model(self.name, tstart, tstop,
-                                                       states, dt, T_init, model_spec,
-                                                       rk4=rk4, other_init=other_init,
-                                                       evolve_method=evolve_method)
+        run_states = None
+        if stop_condition is not None:
+            if states is None:
+                # Fetch the commanded states for the whole run once, and
+                # hand them to xija for every chunk, so that they are used
+                # just as xija uses the states it fetches for a single run
+                run_states = cmd_states.get_states(tstart, tstop).as_array()
+            elif self.name in acis_models and ephem_file is None:
+                # Fetch the ephemeris for the whole run once, so that
+                # every chunk is interpolated from the cached segment
+                _ephem_cache.fetch(tstart_secs - 3000.0, tstop_secs + 3000.0)
+
+        def compute(t0, t1, T0, init):
+            model_spec = self.template.new_spec()
+            if self.name in acis_models and states is not None:
+                return self._compute_acis_model(self.name, t0, t1, states, dt,
+                                                T0, model_spec, rk4=rk4,
+                                                other_init=init,
+                                                evolve_method=evolve_method)
+            else:
+                return self._compute_model(name, t0, t1, dt, T0, states,
+                                           model_spec, other_init=init,
+                                           evolve_method=evolve_method,
+                                           rk4=rk4, cmd_states=run_states)
+
+        self.stop_time = None
+        self.stop_date = None
+        if stop_condition is None:
+            self.xija_model = compute(tstart, tstop, T_init, other_init)
+            keep = np.ones(self.xija_model.times.size, dtype='bool')
+            self._chunks = [(self.xija_model, keep)]
         else:
-            self.xija_model = self._compute_model(name, tstart, tstop, dt, T_init,
-                                                  states, model_spec, 
-                                                  other_init=other_init,
-                                                  evolve_method=evolve_method, 
-                                                  rk4=rk4)
+            self._chunks = self._compute_in_chunks(compute, tstart_secs,
+                                                   tstop_secs,
+                                                   chunk_days*86400.0, T_init,
+                                                   other_init, stop_condition)
+            self.xija_model = self._chunks[-1][0]
 
         self.model_spec = self.xija_model.model_spec
         self.limits = self.xija_model.limits
 
         if states is None:
-            states = self.xija_model.cmd_states
-        states_obj = States(states)
+            states = self._join_cmd_states()
+        if states_obj is None:
+            states_obj = States(states)
 
         self.bad_times = getattr(self.xija_model, "bad_times", None)
         self.bad_times_indices = getattr(self.xija_model, "bad_times_indices", None)
@@ -572,12 +1264,14 @@ class ThermalModelRunner(ModelDataset):
                     components.append(c)
 
         masks = {}
-        if mask_bad_times and self.bad_times is not None:
-            masks[self.name] = np.ones(self.xija_model.times.shape, dtype='bool')
-            for (left, right) in self.bad_times_indices:
-                masks[self.name][left:right] = False
-
-        model_obj = Model.from_xija(self.xija_model, components, masks=masks)
+        if stop_condition is not None:
+            model_obj = self._join_chunks(components, mask_bad_times)
+        else:
+            if mask_bad_times and self.bad_times is not None:
+                masks[self.name] = np.ones(self.xija_model.times.shape, dtype='bool')
+                for (left, right) in self.bad_times_indices:
+                    masks[self.name][left:right] = False
+            model_obj = Model.from_xija(self.xija_model, components, masks=masks)
 
         if get_msids:
             msids_obj = self._get_msids(model_obj, [self.name], tl_file)
@@ -585,31 +1279,119 @@ class ThermalModelRunner(ModelDataset):
             msids_obj = EmptyTimeSeries()
         super(ThermalModelRunner, self).__init__(msids_obj, states_obj, model_obj)
 
+    def _compute_in_chunks(self, compute, tstart, tstop, chunk, T_init,
+                           other_init, stop_condition):
+        # Evolve the model in chunks, each starting from the node values
+        # at the end of the last one, until the stop condition is met
+        chunks = []
+        t0 = tstart
+        init = other_init
+        name = "fptemp" if self.name == "fptemp_11" else self.name
+        while True:
+            t1 = min(t0 + chunk, tstop)
+            # Later chunks start at the last time of the previous one in
+            # seconds, so that they continue on the same time grid
+            model = compute(t0 if chunks else CxoTime(t0).date,
+                            CxoTime(t1).date, T_init, init)
+            if len(chunks) > 0:
+                keep = model.times > chunks[-1][0].times[-1]
+            else:
+                keep = np.ones(model.times.size, dtype='bool')
+            stop = stop_condition(model.times, model.comp[name].mvals) & keep
+            if np.any(stop):
+                idx = np.where(stop)[0][0]
+                keep[idx+1:] = False
+                self.stop_time = Quantity(model.times[idx], "s")
+                self.stop_date = CxoTime(model.times[idx]).date
+                mylog.info(f"The stop condition was met at {self.stop_date}.")
+            chunks.append((model, keep))
+            if self.stop_time is not None or t1 >= tstop:
+                break
+            t0 = model.times[-1]
+            T_init = model.comp[name].mvals[-1]
+            init = node_values(model, -1)
+        return chunks
+
+    def _join_cmd_states(self):
+        # The states which xija used at each of the model times
+        if len(self._chunks) == 1 and self._chunks[0][1].all():
+            return self.xija_model.cmd_states
+        return np.concatenate([np.asarray(model.cmd_states)[keep]
+                               for model, keep in self._chunks])
+
+    def _join_chunks(self, components, mask_bad_times):
+        times = intern_times(np.concatenate([model.times[keep]
+                                             for model, keep in self._chunks]))
+        models = [(Model.from_xija(model, components), keep)
+                  for model, keep in self._chunks]
+        table = {}
+        for key in models[0][0].keys():
+            v = np.concatenate([m[key].value[keep] for m, keep in models])
+            table[key] = APQuantity(v, times, models[0][0][key].unit,
+                                    dtype=v.dtype)
+        if mask_bad_times and self.bad_times is not None:
+            mask = np.ones(times.shape, dtype='bool')
+            for (left, right) in self.bad_times:
+                mask[(times.value >= CxoTime(left).secs) &
+                     (times.value <= CxoTime(right).secs)] = False
+            table[self.name]._mask = lazy_mask(mask)
+        return Model(table=table)
+
+    def make_checkpoint(self, time):
+        """
+        Store the values of all of the nodes and pseudo-nodes of the
+        model at the last model time at or before *time*, so that a
+        later run can be started from them with the *checkpoint*
+        keyword argument.
+
+        Parameters
+        ----------
+        time : string or float
+            The time of the checkpoint.
+
+        Returns
+        -------
+        A :class:`~acispy.thermal_models.ModelCheckpoint`.
+
+        Examples
+        --------
+        >>> cp = dpa_model.make_checkpoint("2021:102:00:00:00")
+        >>> dpa_model2 = ThermalModelRunner.from_backstop(
+        ...     "1dpamzt", "CR101_0510.backstop", checkpoint=cp)
+        """
+        time = CxoTime(time).secs
+        # Only the model times which are in the model data are used,
+        # which end at the stop time if there is one
+        for model, keep in reversed(self._chunks):
+            idxs = np.where(keep & (model.times <= time))[0]
+            if idxs.size > 0:
+                break
+        else:
+            raise RuntimeError(f"The time {CxoTime(time).date} is before "
+                               f"the start of the model!")
+        idx = idxs[-1]
+        name = "fptemp" if self.name == "fptemp_11" else self.name
+        return ModelCheckpoint(self.name, model.times[idx],
+                               node_values(model, idx),
+                               T_init=model.comp[name].mvals[idx],
+                               spec_hash=self.template.spec_hash)
+
     def _get_ephemeris(self, tstart, tstop, times):
-        msids = [f"orbitephem0_{axis}" for axis in "xyz"]
-        msids += [f"solarephem0_{axis}" for axis in "xyz"]
-        ephem = {}
         if self.ephem_file is None:
-            e = fetch.MSIDset(msids, tstart - 2000.0, tstop + 2000.0)
-            for msid in msids:
-                ephem[msid] = Ska.Numpy.interpolate(e[msid].vals, e[msid].times,
-                                                    times)
+            return _ephem_cache.interpolate(tstart - 2000.0, tstop + 2000.0,
+                                            times)
         else:
-            e = ascii.read(self.ephem_file)
-            idxs = np.logical_and(e["times"] >= tstart - 2000.0,
-                                  e["times"] <= tstop + 2000.0)
-            for msid in msids:
-                ephem[msid] = Ska.Numpy.interpolate(e[msid][idxs],
-                                                    e["times"][idxs], times)
-        return ephem
+            return _ephem_cache.interpolate_file(self.ephem_file, 
+                                                 tstart - 2000.0, 
+                                                 tstop + 2000.0, times)
 
     def _compute_model(self, name, tstart, tstop, dt, T_init, states,
-                       model_spec, other_init=None, evolve_method=None, 
-                       rk4=None):
+                       model_spec, other_init=None, evolve_method=None,
+                       rk4=None, cmd_states=None):
         if name == "fptemp_11":
             name = "fptemp"
         model = xija.XijaModel(name, start=tstart, stop=tstop, dt=dt,
-                               model_spec=model_spec,
+                               model_spec=model_spec, cmd_states=cmd_states,
                                evolve_method=evolve_method, rk4=rk4)
         model.comp[name].set_data(T_init)
         for t in ["dea0", "dpa0"]:
@@ -623,8 +1405,11 @@ class ThermalModelRunner(ModelDataset):
                 state_names = states.dtype.names
             else:
                 state_names = list(states.keys())
-            state_times = CxoTime(
-                np.array([states["datestart"], states["datestop"]])).secs
+            if "tstart" in state_names:
+                state_times = np.array([states["tstart"], states["tstop"]])
+            else:
+                state_times = CxoTime(
+                    np.array([states["datestart"], states["datestop"]])).secs
             for k in state_names:
                 if k in model.comp:
                     model.comp[k].set_data(states[k], state_times)
@@ -698,7 +1483,7 @@ class ThermalModelRunner(ModelDataset):
             model.comp["earthheat__fptemp"].k = 0.0
         if other_init is not None:
             for k, v in other_init.items():
-                model.comp[k] = v
+                model.comp[k].set_data(v)
         if self.compute_model_supp is not None:
             self.compute_model_supp(name, tstart, tstop, model)
         model.make()
@@ -756,7 +1541,10 @@ class ThermalModelRunner(ModelDataset):
         """
         Run a thermal model using states derived from a backstop
         file. Continuity with previous states will be automatically 
-        handled. 
+        handled. The continuity commands and states are cached by
+        :func:`~acispy.thermal_models.get_continuity_states`, so only
+        the states after the first backstop command are derived
+        for each new backstop file.
 
         Parameters
         ----------
@@ -779,11 +1567,10 @@ class ThermalModelRunner(ModelDataset):
         bs_cmds = commands.get_cmds_from_backstop(backstop_file)
         bs_dates = bs_cmds["date"]
         bs_cmds['time'] = CxoTime(bs_cmds['date']).secs
-        last_tlm_date = fetch.get_time_range(name, format='date')[1]
-        last_tlm_time = CxoTime(last_tlm_date).secs
+        last_tlm_time = get_time_range(name)[1]
         tstart = min(last_tlm_time-3600.0, bs_cmds['time'][0]-days*86400.)
-        if T_init is None:
-            T_init = fetch.MSID(name, tstart-700., tstart).vals[-1]
+        if T_init is None and kwargs.get("checkpoint", None) is None:
+            T_init = get_last_value(name, tstart)
         ok = bs_cmds['event_type'] == 'RUNNING_LOAD_TERMINATION_TIME'
         if np.any(ok):
             rltt = CxoTime(bs_dates[ok][0])
@@ -799,17 +1586,83 @@ class ThermalModelRunner(ModelDataset):
             else:
                 rltt = CxoTime(bs_cmds['date'][0])
 
-        # Get non-backstop commands for continuity
-        cmds = commands.get_cmds(tstart, rltt, inclusive_stop=True)
+        # Get non-backstop commands and states for continuity
+        cont_cmds, cont_states = get_continuity_states(tstart, rltt)
         # Add backstop commands
-        cmds = cmds.add_cmds(bs_cmds)
+        new_cmds = bs_cmds
 
         if other_cmds is not None:
             if not isinstance(other_cmds, commands.CommandTable):
                 other_cmds = commands.CommandTable(other_cmds)
-            cmds = cmds.add_cmds(other_cmds)
+            new_cmds = new_cmds.add_cmds(other_cmds)
+
+        states = _states_from_continuity(cont_cmds, cont_states, new_cmds)
+        return cls(name, states["datestart"][0], states["datestop"][-1],
+                   states=states, T_init=T_init, **kwargs)
+
+    @classmethod
+    def run_many(cls, specs, workers=None, tasks_per_worker=None,
+                 states=None):
+        """
+        Run many thermal models in a pool of processes. Inputs which
+        are the same for every run (the model specification files, the
+        eclipse data range, the ephemeris, and optionally the states)
+        are looked up once and shared with the workers.
 
-        return cls.from_commands(name, cmds, T_init=T_init, **kwargs)
+        Parameters
+        ----------
+        specs : list of dicts
+            The keyword arguments for each model run, which are passed
+            to the constructor of this class, e.g. ``{"name": "1dpamzt",
+            "tstart": "2020:001", "tstop": "2020:005", "states": states,
+            "T_init": 10.0}``.
+        workers : integer, optional
+            The number of worker processes. Default: None, which uses
+            the number of CPUs. If 1, the models are run serially in
+            this process.
+        tasks_per_worker : integer, optional
+            The number of runs after which a worker process is replaced
+            by a new one, which bounds the memory used by each worker.
+            Default: None, workers are not replaced.
+        states : :class:`~acispy.states.States`, dict, or record array, optional
+            States which are used by every run whose spec does not
+            have its own. They are converted once, and sent to each
+            worker once instead of with every spec. Default: None
+
+        Returns
+        -------
+        A list of :class:`~acispy.thermal_models.ThermalModelResult`
+        objects, in the same order as *specs*.
+
+        Examples
+        --------
+        >>> specs = [{"name": "1deamzt", "tstart": "2020:001:00:00:00",
+        ...           "tstop": "2020:004:00:00:00", "T_init": T_init}
+        ...          for T_init in [10.0, 15.0, 20.0]]
+        >>> results = ThermalModelRunner.run_many(specs, workers=3)
+        >>> [r.mvals.max() for r in results]
+        """
+        if workers is None:
+            workers = os.cpu_count()
+        specs = [dict(spec) for spec in specs]
+        shared = _prepare_shared_inputs(specs, states=states)
+        shared["model_specs"] = _share_model_specs(specs)
+        args = [(cls, spec) for spec in specs]
+        if workers == 1:
+            with _use_shared_inputs(shared):
+                results = [_run_spec(arg) for arg in args]
+        else:
+            with multiprocessing.Pool(processes=workers, 
+                                      initializer=_init_worker,
+                                      initargs=(shared,),
+                                      maxtasksperchild=tasks_per_worker) as pool:
+                results = pool.map(_run_spec, args, chunksize=1)
+        if states is not None:
+            # The shared states are not sent back with each result
+            for result in results:
+                if result.states is None:
+                    result.states = shared["states"]
+        return results
 
     def make_solarheat_plot(self, node, figfile=None, fig=None):
         """
@@ -930,6 +1783,112 @@ class ThermalModelRunner(ModelDataset):
         return fig
 
 
+class MultiThermalModelRunner(ModelDataset):
+    """
+    Run several Xija thermal models, by default all of the ACIS
+    models, for the same commanded states. The states, the eclipse
+    data range and the ephemeris are prepared once, and the models
+    are run in a pool of processes by
+    :meth:`~acispy.thermal_models.ThermalModelRunner.run_many`. The
+    components of all of the models are stored under the "model"
+    field type. Components which are in more than one model, such as
+    "dpa_power", can differ between them, so they are stored under
+    the name of each model, e.g. "1deamzt:dpa_power".
+
+    Parameters
+    ----------
+    tstart : string
+        The start time in YYYY:DOY:HH:MM:SS format.
+    tstop : string
+        The stop time in YYYY:DOY:HH:MM:SS format.
+    states : dict or States, optional
+        The commanded states for the models, in any of the forms
+        accepted by :class:`~acispy.thermal_models.ThermalModelRunner`.
+        If not supplied, the states will be taken from the kadi
+        commanded states between *tstart* and *tstop*.
+    T_init : dict, optional
+        The initial temperatures of the models, keyed by MSID name or
+        short model name, e.g. "dpa". Models which are not in the dict
+        get their initial temperature
+        from telemetry. Default: None
+    names : list of strings, optional
+        The MSIDs to simulate. Default: all of the ACIS models.
+    workers : integer, optional
+        The number of worker processes. Default: None, which uses one
+        process for each model, up to the number of CPUs.
+    get_msids : boolean, optional
+        Whether or not to pull data from the engineering archive.
+        Default: False
+    tl_file : string, optional
+        The path to a tracelog file which will supply MSID information
+        if ``get_msids=True``. Default: None
+
+    All other keyword arguments which are passed to the main
+    :class:`~acispy.thermal_models.ThermalModelRunner`
+    constructor can be passed here as well, and are used for every
+    model.
+
+    Examples
+    --------
+    >>> ds = MultiThermalModelRunner("2021:160:00:00:00",
+    ...                              "2021:165:00:00:00",
+    ...                              T_init={"1dpamzt": 20.0})
+    >>> ds["model", "1deamzt"]
+    >>> ds.limits["tmp_bep_pcb"]
+    """
+    def __init__(self, tstart, tstop, states=None, T_init=None, names=None,
+                 workers=None, get_msids=False, tl_file=None, **kwargs):
+        if names is None:
+            names = acis_models
+        names = [short_name_rev.get(name, name).lower()
+                 for name in ensure_list(names)]
+        if T_init is None:
+            T_init = {}
+        T_init = {short_name_rev.get(name, name).lower(): v
+                  for name, v in T_init.items()}
+        tstart = CxoTime(tstart).date
+        tstop = CxoTime(tstop).date
+        if states is None:
+            states = cmd_states.get_states(tstart, tstop,
+                                           merge_identical=True).as_array()
+        # The states are converted once here and shared by all of the runs
+        states_obj = states if isinstance(states, States) else None
+        states = _states_to_array(states)
+        specs = [dict(kwargs, name=name, tstart=tstart, tstop=tstop,
+                      T_init=T_init.get(name, None))
+                 for name in names]
+        if workers is None:
+            workers = min(len(specs), os.cpu_count())
+        self.results = ThermalModelRunner.run_many(specs, workers=workers,
+                                                   states=states)
+        self.names = names
+        self.datestart = tstart
+        self.datestop = tstop
+        self.T_init = {r.name: r.T_init for r in self.results}
+        # The limits of each model are keyed by MSID
+        self.limits = {}
+        for r in self.results:
+            self.limits.update(r.limits)
+        counts = Counter(key for r in self.results for key in r.model.keys())
+        table = {}
+        for r in self.results:
+            times = intern_times(r.times)
+            for key, v in r.model.items():
+                if counts[key] > 1:
+                    key = f"{r.name}:{key}"
+                table[key] = APQuantity(v.value, times, v.unit,
+                                        dtype=v.value.dtype)
+        model_obj = Model(table=table)
+        if get_msids:
+            msids_obj = self._get_msids(model_obj, names, tl_file)
+        else:
+            msids_obj = EmptyTimeSeries()
+        if states_obj is None:
+            states_obj = States(states)
+        super(MultiThermalModelRunner, self).__init__(msids_obj, states_obj,
+                                                      model_obj)
+
+
 def find_text_time(time, hours=1.0):
     return CxoTime(CxoTime(time).secs+hours*3600.0).date
 
@@ -953,6 +1912,20 @@ def make_default_states():
     }
 
 
+def _read_sweep_cache(cache_file):
+    # An unreadable cache file, e.g. one left by an older version, is
+    # treated as an empty cache and is overwritten
+    if not cache_file.exists():
+        return {}
+    try:
+        with np.load(cache_file) as f:
+            return dict(zip(f["keys"], f["values"]))
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        mylog.warning(f"The sweep cache {cache_file} could not be read. "
+                      f"It will be overwritten.")
+        return {}
+
+
 class SimulateSingleState(ThermalModelRunner):
     """
     Class for simulating thermal models under constant conditions.
@@ -1040,6 +2013,146 @@ class SimulateSingleState(ThermalModelRunner):
                          other_init=other_init, 
                          compute_model_supp=compute_model_supp)
 
+    @classmethod
+    def sweep(cls, name, tstart, tstop, pitch, off_nom_roll=0.0, ccd_count=0,
+              dh_heater=0, T_init=10.0, states=None, limit="planning_hi",
+              model_spec=None, dt=328.0, evolve_method=None, rk4=None,
+              no_earth_heat=False, workers=None, cache_dir=None):
+        """
+        Run single-state models over a grid of pitch, off-nominal roll,
+        CCD count, detector housing heater state, and initial temperature,
+        and return the end temperature, peak temperature, and time to
+        reach a limit for each point on the grid. The model spec is
+        parsed once and shared by all of the runs, which are done in
+        parallel.
+
+        Parameters
+        ----------
+        name : string
+            The name of the model to simulate.
+        tstart : string or float
+            The start time of the single-state runs.
+        tstop : string or float
+            The stop time of the single-state runs.
+        pitch : float or array_like
+            The pitch angle(s) in degrees.
+        off_nom_roll : float or array_like, optional
+            The off-nominal roll angle(s) in degrees. Default: 0.0
+        ccd_count : integer or array_like, optional
+            The number(s) of CCDs (and FEPs) on. If nonzero, the CCDs are
+            clocking unless "clocking" is set in *states*. Default: 0
+        dh_heater : integer or array_like, optional
+            Whether (1) or not (0) the detector housing heater is on.
+            Default: 0
+        T_init : float or array_like, optional
+            The starting temperature(s) for the model. Default: 10.0
+        states : dict, optional
+            Other states which are the same for every run, e.g.
+            ``{"simpos": 75624.0}``. Default: None
+        limit : string or float, optional
+            The limit to find the time to, either a temperature or the
+            name of a limit. For the ACIS models this is one of their
+            limits, e.g. "planning_hi", and for other models one of the
+            limits in the model spec, e.g. "planning.warning.high".
+            Default: "planning_hi"
+        model_spec : string, optional
+            Path to the model spec JSON file for the model. Default: None,
+            the standard model path will be used.
+        workers : integer, optional
+            The number of worker processes. Default: None, which uses
+            the number of CPUs.
+        cache_dir : string, optional
+            A directory in which results are cached for each model spec
+            (by the hash of its contents), so that points which have
+            already been run are not run again. Default: None, no caching.
+
+        Returns
+        -------
+        A :class:`~acispy.thermal_models.SingleStateSweep`.
+
+        Examples
+        --------
+        >>> sweep = SimulateSingleState.sweep("1dpamzt", "2021:001:00:00:00",
+        ...                                   "2021:004:00:00:00",
+        ...                                   np.arange(45.0, 181.0, 5.0),
+        ...                                   ccd_count=[4, 5, 6], T_init=20.0)
+        >>> sweep.time_to_limit[:, 0, 2, 0, 0]
+        """
+        name = short_name_rev.get(name, name)
+        template = get_model_template(name, model_spec=model_spec)
+        model_spec, spec_hash = template.model_spec, template.spec_hash
+        if isinstance(limit, str):
+            if template.check_obj is not None:
+                limit_value = template.limits(0.0)[limit]["value"]
+            else:
+                # Other models only have the limits in their model spec
+                spec_limits = model_spec.get("limits", {}).get(name, {})
+                if limit not in spec_limits:
+                    raise ValueError(f"The limit '{limit}' is not defined "
+                                     f"for the {name} model! Specify it as "
+                                     f"a temperature instead.")
+                limit_value = spec_limits[limit]
+        else:
+            limit_value = limit
+        tstart = CxoTime(tstart).secs
+        tstop = CxoTime(tstop).secs
+        axes = {"pitch": np.atleast_1d(pitch).astype("float64"),
+                "off_nom_roll": np.atleast_1d(off_nom_roll).astype("float64"),
+                "ccd_count": np.atleast_1d(ccd_count).astype("int"),
+                "dh_heater": np.atleast_1d(dh_heater).astype("int"),
+                "T_init": np.atleast_1d(T_init).astype("float64")}
+        if states is None:
+            states = {}
+        run_key = json.dumps([tstart, tstop, dt, evolve_method, rk4,
+                              no_earth_heat, limit_value,
+                              sorted((k, str(v)) for k, v in states.items())])
+        # The keys of the grid points, in the order of the flattened grid,
+        # which are used both to look up the cache and to fill the grid
+        shape = tuple(a.size for a in axes.values())
+        points = list(itertools.product(*axes.values()))
+        keys = [json.dumps([run_key, [float(p) for p in point]])
+                for point in points]
+        cached = {}
+        if cache_dir is not None:
+            cache_file = Path(cache_dir) / f"{name}_sweep_{spec_hash}.npz"
+            cached = _read_sweep_cache(cache_file)
+        specs = []
+        todo = []
+        for key, (p, r, c, d, T) in zip(keys, points):
+            if key in cached:
+                continue
+            run_states = dict(states)
+            run_states.update({"pitch": p, "off_nom_roll": r,
+                               "ccd_count": c, "dh_heater": d})
+            if c > 0:
+                run_states.setdefault("clocking", 1)
+                run_states.setdefault("vid_board", 1)
+            specs.append({"name": name, "tstart": tstart, "tstop": tstop,
+                          "states": run_states, "T_init": T,
+                          "model_spec": model_spec, "dt": dt,
+                          "evolve_method": evolve_method, "rk4": rk4,
+                          "no_earth_heat": no_earth_heat})
+            todo.append(key)
+        if len(specs) > 0:
+            mylog.info(f"Running {len(specs)} of {len(keys)} single-state models.")
+            for key, result in zip(todo, cls.run_many(specs, workers=workers)):
+                mvals = result.mvals.value
+                viols = np.where(mvals > limit_value)[0]
+                if viols.size > 0:
+                    limit_time = (result.times[viols[0]]-tstart)*0.001
+                else:
+                    limit_time = np.nan
+                cached[key] = np.array([mvals[-1], mvals.max(), limit_time])
+            if cache_dir is not None:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                # Keep the points which other sweeps have added since
+                # the file was read
+                cached = dict(_read_sweep_cache(cache_file), **cached)
+                savez_atomic(cache_file, keys=np.array(list(cached.keys())),
+                             values=np.array(list(cached.values())))
+        values = np.array([cached[key] for key in keys]).reshape(shape+(3,))
+        return SingleStateSweep(name, axes, values, limit_value, spec_hash)
+
     def write_msids(self, filename, fields, mask_field=None, overwrite=False):
         raise NotImplementedError
 
@@ -1053,6 +2166,44 @@ class SimulateSingleState(ThermalModelRunner):
         raise NotImplementedError
 
 
+class SingleStateSweep:
+    """
+    The results of :meth:`~acispy.thermal_models.SimulateSingleState.sweep`.
+    Each result array has one dimension for each of the axes, in the
+    order pitch, off_nom_roll, ccd_count, dh_heater, T_init.
+
+    Attributes
+    ----------
+    name : string
+        The name of the modeled MSID.
+    axes : dict of NumPy arrays
+        The values of each state on the grid, keyed by state name.
+    end_temp : Quantity array
+        The model temperature at the end of each run.
+    peak_temp : Quantity array
+        The maximum model temperature of each run.
+    time_to_limit : Quantity array
+        The time from the start of each run until the limit is
+        exceeded, which is NaN if it never is.
+    limit : float
+        The limit temperature.
+    spec_hash : string
+        The hash of the model specification which was used.
+    """
+    def __init__(self, name, axes, values, limit, spec_hash):
+        self.name = name
+        self.axes = axes
+        self.end_temp = Quantity(values[..., 0], "deg_C")
+        self.peak_temp = Quantity(values[..., 1], "deg_C")
+        self.time_to_limit = Quantity(values[..., 2], "ks")
+        self.limit = limit
+        self.spec_hash = spec_hash
+
+    @property
+    def shape(self):
+        return self.end_temp.shape
+
+
 class SimulateECSRun(ThermalModelRunner):
     """
     Class for simulating thermal models for ECS measurements.
@@ -1108,6 +2259,14 @@ class SimulateECSRun(ThermalModelRunner):
         A function which takes the model name, tstart, tstop,
         and a XijaModel object, and allows the user to 
         perform custom operations on the model.
+    stop_condition : callable, optional
+        A function which takes arrays of times in seconds and model
+        temperatures, and returns a boolean array which is True where
+        the run should stop, as in
+        :class:`~acispy.thermal_models.ThermalModelRunner`. The limit
+        is then only checked up to the stop time, so a condition which
+        stops at the planning limit is enough to find a violation.
+        Default: None
 
     Examples
     --------
@@ -1117,7 +2276,7 @@ class SimulateECSRun(ThermalModelRunner):
     def __init__(self, name, tstart, hours, T_init, attitude, ccd_count,
                  dh_heater=0, dt=328.0, evolve_method=None, 
                  rk4=None, model_spec=None, no_earth_heat=False,
-                 other_init=None, compute_model_supp=None):
+                 other_init=None, compute_model_supp=None, stop_condition=None):
         if name in short_name_rev:
             name = short_name_rev[name]
         tstart = CxoTime(tstart).secs
@@ -1178,7 +2337,8 @@ class SimulateECSRun(ThermalModelRunner):
         super().__init__(name, tstart, tstop, states=states, T_init=T_init,
                          dt=dt, evolve_method=evolve_method, rk4=rk4,
                          model_spec=model_spec, other_init=other_init,
-                         compute_model_supp=compute_model_supp)
+                         compute_model_supp=compute_model_supp,
+                         stop_condition=stop_condition)
 
         mylog.info("Run Parameters")
         mylog.info("--------------")
@@ -1206,7 +2366,7 @@ class SimulateECSRun(ThermalModelRunner):
         mylog.info("Model Result")
         mylog.info("------------")
 
-        self.limits = self.check_obj._limit_class(model_spec=self.model_spec, margin=0.0).limits
+        self.limits = self.template.limits(0.0)
         self.limit_time = None
         self.limit_date = None
         self.duration = None
@@ -1215,7 +2375,7 @@ class SimulateECSRun(ThermalModelRunner):
 
         if self.name.lower() == "fptemp_11":
             cold = self.mvals.value < self.limits["cold_ecs"]["value"]
-            cold &= self.xija_model.times < self.tend
+            cold &= self.mvals.times.value < self.tend
             cold_time = np.sum(cold)
             if cold_time == 0:
                 msg = "The focal plane is never cold for this ECS measurement."
@@ -1234,7 +2394,7 @@ class SimulateECSRun(ThermalModelRunner):
             msg = f"The limit of {self.limit['value']} degrees C will be " \
                   f"reached at {self.limit_date}, after {self.duration.value} ksec."
             mylog.info(msg)
-            if self.limit_time.value < self.tend:
+            if self._reaches_limit_before(self.limit_time.value, tstart, hours):
                 self.violate = True
                 viol_time = "before"
             else:
@@ -1251,10 +2411,151 @@ class SimulateECSRun(ThermalModelRunner):
             else:
                 mylog.info("This observation is safe from a thermal perspective.")
 
+    @staticmethod
+    def _reaches_limit_before(limit_time, tstart, hours):
+        # Whether a limit reached at *limit_time* violates an ECS
+        # measurement of length *hours* starting at *tstart*
+        return limit_time < tstart+hours*3600.0
+
+    @classmethod
+    def find_max_duration(cls, name, tstart, T_init, attitude, ccd_count,
+                          max_hours=72.0, **kwargs):
+        """
+        Find the longest ECS measurement starting at *tstart* which
+        does not violate the planning limit. The model is run once over
+        a horizon of *max_hours*, and the maximum duration is the time
+        of the first model step above the limit, since a measurement
+        violates the limit only if it is exceeded before the end.
+
+        Parameters
+        ----------
+        name : string
+            The msid of the model to simulate.
+        tstart : string or float
+            The start time of the ECS measurement.
+        T_init : float
+            The starting temperature for the model in degrees C.
+        attitude : array_like
+            The input attitude for the ECS run, as in 
+            :class:`~acispy.thermal_models.SimulateECSRun`.
+        ccd_count : integer
+            The number of CCDs to clock.
+        max_hours : float, optional
+            The longest duration to consider, in hours. Default: 72.0
+
+        All other keyword arguments which are passed to the main
+        :class:`~acispy.thermal_models.SimulateECSRun` constructor can
+        be passed to this method as well.
+
+        Returns
+        -------
+        The maximum duration as a Quantity in hours, and the 
+        :class:`~acispy.thermal_models.SimulateECSRun` over the full
+        horizon.
+
+        Examples
+        --------
+        >>> hours, run = SimulateECSRun.find_max_duration(
+        ...     "1dpamzt", "2021:100:00:00:00", 15.0, (150.0, 0.0), 6)
+        """
+        run = cls(name, tstart, max_hours, T_init, attitude, ccd_count,
+                  **kwargs)
+        tstart = run.tstart.value
+        hours = max_hours
+        if run.limit_time is not None:
+            limit_time = run.limit_time.value
+            hours = min(max(limit_time-tstart, 0.0)/3600.0, max_hours)
+            # Guard against roundoff putting the end past the limit time
+            while hours > 0.0 and \
+                    cls._reaches_limit_before(limit_time, tstart, hours):
+                hours = np.nextafter(hours, 0.0)
+        return Quantity(hours, "hr"), run
+
+    @classmethod
+    def find_start_time(cls, name, tbegin, tend, hours, T_init, attitude,
+                        ccd_count, tol=3600.0, **kwargs):
+        """
+        Find the boundary between start times in the range *tbegin* to
+        *tend* for which an ECS measurement of length *hours* is safe
+        and those for which it is not, by bisection. It is assumed that
+        this changes only once over the range. The model specification,
+        eclipse data range, and ephemeris for the whole range are looked
+        up only once and shared by all of the runs.
+
+        Parameters
+        ----------
+        name : string
+            The msid of the model to simulate.
+        tbegin : string or float
+            The earliest start time to consider.
+        tend : string or float
+            The latest start time to consider.
+        hours : float
+            The length of the ECS measurement in hours.
+        T_init : float
+            The starting temperature for the model in degrees C.
+        attitude : array_like
+            The input attitude for the ECS run, as in 
+            :class:`~acispy.thermal_models.SimulateECSRun`.
+        ccd_count : integer
+            The number of CCDs to clock.
+        tol : float, optional
+            The precision to find the start time to, in seconds.
+            Default: 3600.0
+
+        All other keyword arguments which are passed to the main
+        :class:`~acispy.thermal_models.SimulateECSRun` constructor can
+        be passed to this method as well.
+
+        Returns
+        -------
+        The date of the latest safe start time if runs starting at
+        *tbegin* are safe and those at *tend* are not, the date of the
+        earliest safe start time if the reverse is true, or None if
+        runs at both ends of the range are equally (un)safe.
+
+        Examples
+        --------
+        >>> date = SimulateECSRun.find_start_time(
+        ...     "1deamzt", "2021:100:00:00:00", "2021:107:00:00:00", 24.0,
+        ...     15.0, "vehicle", 6)
+        """
+        tbegin = CxoTime(tbegin).secs
+        tend = CxoTime(tend).secs
+        spec = dict(kwargs, name=name)
+        horizon = 1.5*hours*3600.0
+        shared = _prepare_shared_inputs([spec],
+                                        time_range=[tbegin, tend+horizon])
+        kwargs["model_spec"] = spec["model_spec"]
+        # A parsed model spec is hashed once here, rather than by
+        # every run of the bisection
+        shared["model_specs"] = _share_model_specs([spec])
+
+        def is_safe(t):
+            run = cls(name, t, hours, T_init, attitude, ccd_count, **kwargs)
+            return not run.violate
+
+        with _use_shared_inputs(shared):
+            safe_begin = is_safe(tbegin)
+            safe_end = is_safe(tend)
+            if safe_begin == safe_end:
+                mylog.warning("ECS runs at both ends of the time range are "
+                              f"{'safe' if safe_begin else 'not safe'}.")
+                return None
+            # Keep t0 on the same side of the boundary as tbegin
+            t0, t1 = tbegin, tend
+            while t1 - t0 > tol:
+                tmid = 0.5*(t0+t1)
+                if is_safe(tmid) == safe_begin:
+                    t0 = tmid
+                else:
+                    t1 = tmid
+        return CxoTime(t0 if safe_begin else t1).date
+
     def _time_ticks(self, dp, ymax, fontsize):
         from matplotlib.ticker import AutoMinorLocator
         axt = dp.ax.twiny()
-        mtimes = self.xija_model.times
+        mtimes = self["model", self.name].times.value
         xmin, xmax = (plotdate2cxctime(dp.ax.get_xlim())-mtimes[0])*1.0e-3
         axt.plot((mtimes-mtimes[0])*1.0e-3, 
                  ymax*np.ones_like(mtimes))
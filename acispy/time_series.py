@@ -1,9 +1,80 @@
+from collections.abc import MutableMapping
+import copy
+
+
+class LazyTable(MutableMapping):
+    """
+    A dict-like table whose values can be registered as a builder
+    function and its arguments, so that expensive objects (and their
+    metadata, such as units) are only created on first access.
+    """
+    def __init__(self):
+        self._built = {}
+        self._pending = {}
+        self._order = []
+
+    def add_lazy(self, key, builder, *args):
+        """
+        Register *key*, to be created with ``builder(key, *args)``
+        the first time it is accessed.
+        """
+        if key not in self:
+            self._order.append(key)
+        self._built.pop(key, None)
+        self._pending[key] = (builder, args)
+
+    def merge(self, other):
+        """
+        Add the entries of *other* to this table without building
+        any entries which have not yet been accessed.
+        """
+        if isinstance(other, LazyTable):
+            for key in other._order:
+                if key in other._pending:
+                    builder, args = other._pending[key]
+                    self.add_lazy(key, builder, *args)
+                else:
+                    self[key] = other._built[key]
+        else:
+            self.update(other)
+
+    def __getitem__(self, key):
+        if key not in self._built:
+            if key not in self._pending:
+                raise KeyError(key)
+            builder, args = self._pending.pop(key)
+            self._built[key] = builder(key, *args)
+        return self._built[key]
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self._order.append(key)
+        self._pending.pop(key, None)
+        self._built[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._built.pop(key, None)
+        self._pending.pop(key, None)
+        self._order.remove(key)
+
+    def __contains__(self, key):
+        return key in self._built or key in self._pending
+
+    def __iter__(self):
+        return iter(list(self._order))
+
+    def __len__(self):
+        return len(self._order)
+
+
 class TimeSeriesData:
     _is_empty = False
 
     def __init__(self, table=None):
         if table is None:
-            table = {}
+            table = LazyTable()
         self.table = table
 
     def __getitem__(self, item):
@@ -25,6 +96,39 @@ class TimeSeriesData:
     def items(self):
         return self.table.items()
 
+    def window(self, tstart, tstop):
+        """
+        Return a new object of the same type whose fields are views of
+        the fields of this one between the times *tstart* and *tstop*
+        in seconds. The views are only made when a field is first
+        accessed.
+        """
+        if self._is_empty:
+            return self
+        ret = type(self).__new__(type(self))
+        TimeSeriesData.__init__(ret)
+        for attr, value in self.__dict__.items():
+            if attr != "table":
+                setattr(ret, attr, copy_container(value))
+        for key in self.keys():
+            ret.table.add_lazy(key, _window_field, self, tstart, tstop)
+        return ret
+
+
+def copy_container(value):
+    """
+    Return a shallow copy of *value* if it is a dict, list, or set,
+    so that changes to the container in a window of a dataset do not
+    affect its parent. Other objects are shared.
+    """
+    if isinstance(value, (dict, list, set)):
+        return copy.copy(value)
+    return value
+
+
+def _window_field(key, parent, tstart, tstop):
+    return parent[key].window(tstart, tstop)
+
 
 class EmptyTimeSeries(TimeSeriesData):
     _is_empty = True
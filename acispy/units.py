@@ -1,8 +1,11 @@
 import astropy.units as u
 from astropy.units import Quantity
-from acispy.utils import mylog
+from acispy.utils import mylog, secs2date
+from acispy.tdb_tables import tdb_units
 import numpy as np
 from cxotime import CxoTime
+import weakref
+from functools import lru_cache
 
 u.imperial.enable()
 
@@ -146,25 +149,100 @@ msid_units = {'1deamzt': 'deg_C',
               }
 
 
+@lru_cache(maxsize=32)
+def _dates_to_secs(dates):
+    secs = np.atleast_1d(CxoTime(list(dates)).secs)
+    secs.flags.writeable = False
+    return secs
+
+
+def times_to_secs(idx):
+    """
+    Convert an array of times, which may be date strings, a CxoTime,
+    a Quantity, or numbers of seconds, to an array of seconds in one
+    call. Conversions of the same date strings are cached and return
+    the same read-only array.
+    """
+    if isinstance(idx, CxoTime):
+        return np.atleast_1d(idx.secs)
+    elif isinstance(idx, Quantity):
+        return np.atleast_1d(idx.to_value("s"))
+    arr = np.asarray(idx)
+    if arr.dtype.kind in "USO":
+        secs = _dates_to_secs(tuple(arr.ravel().tolist()))
+        # Return the cached array itself where possible, so that the
+        # indices found for it can be reused
+        return secs if secs.shape == arr.shape else secs.reshape(arr.shape)
+    return arr.astype("float64", copy=False)
+
+
+def _is_index_array(idx):
+    if isinstance(idx, (Quantity, CxoTime)):
+        return False
+    if isinstance(idx, np.ndarray):
+        return idx.dtype.kind in "biu"
+    if isinstance(idx, list):
+        return np.asarray(idx).dtype.kind in "biu"
+    return False
+
+
+def search_times(times, secs, orig_idx=None):
+    """
+    Find the indices of the last samples in *times* which are at or
+    before the times *secs*, which may be a scalar or an array.
+    """
+    bad = (secs < times[0]) | (secs > times[-1])
+    if np.any(bad):
+        if orig_idx is None:
+            orig_idx = secs
+        if np.ndim(bad) > 0:
+            orig_idx = np.asarray(orig_idx)[np.nonzero(bad)[0][0]]
+        raise RuntimeError(f"The time {orig_idx} is outside the bounds of this dataset!")
+    return np.searchsorted(times, secs, side='right')-1
+
+
 def parse_index(idx, times): 
-    if isinstance(idx, (int, np.ndarray)) or idx is None:
+    if isinstance(idx, (int, np.integer)) or idx is None or _is_index_array(idx):
         return idx
-    else:
-        orig_idx = idx
-        if isinstance(idx, str):
-            idx = CxoTime(idx).secs
-        if idx < times[0] or idx > times[-1]:
-            raise RuntimeError(f"The time {orig_idx} is outside the bounds of this dataset!")
-        idx = np.searchsorted(times, idx)-1
-    return idx
+    orig_idx = idx
+    if isinstance(idx, str):
+        idx = CxoTime(idx).secs
+    elif np.ndim(idx) > 0 or isinstance(idx, (Quantity, CxoTime)):
+        idx = times_to_secs(idx)
+    return search_times(times, idx, orig_idx)
+
+
+_index_cache = {}
+
+
+def _time_indices(times, tv, item):
+    """
+    Find the indices for an array of times *item*. Fields which share
+    the same times array (see ``intern_times``) and are indexed with
+    the same date strings reuse both the converted seconds and the
+    indices.
+    """
+    secs = times_to_secs(item)
+    key = id(times)
+    entry = _index_cache.get(key, None)
+    if entry is not None and entry[0]() is times and entry[1] is secs:
+        return entry[2]
+    idxs = search_times(tv, secs, item)
+    if not secs.flags.writeable:
+        def _remove(ref, key=key):
+            if _index_cache.get(key, (None,))[0] is ref:
+                del _index_cache[key]
+        _index_cache[key] = (weakref.ref(times, _remove), secs, idxs)
+    return idxs
 
 
 def find_indices(item, times):
+    tv = getattr(times, "value", times)
     if getattr(times, "ndim", None) == 2:
-        t1 = times[0]
-        t2 = times[1]
+        t1 = tv[0]
+        t2 = tv[1]
     else:
-        t1 = t2 = times
+        t1 = t2 = tv
     if isinstance(item, slice):
         idxs = slice(parse_index(item.start, t1),
                      parse_index(item.stop, t2),
@@ -173,38 +251,250 @@ def find_indices(item, times):
         idxs = slice(parse_index(item[0].start, t1),
                      parse_index(item[0].stop, t2),
                      item[0].step)
+    elif isinstance(item, np.ndarray) and item.dtype == bool and item.all():
+        # An all-true mask selects everything, so a view will do
+        idxs = slice(None, None, None)
+    elif np.ndim(item) > 0 and not _is_index_array(item):
+        idxs = _time_indices(times, t1, item)
     else:
         idxs = parse_index(item, t1)
+    # Indexing the times directly returns a view for basic slices
     if getattr(times, "ndim", None) == 2:
         t = times[:,idxs]
     else:
         t = times[idxs]
-    return idxs, Quantity(t, "s")
+    if not isinstance(t, Quantity):
+        t = Quantity(t, "s")
+    return idxs, t
+
+
+def window_slice(times, tstart, tstop):
+    """
+    Return the slice of samples with times between *tstart* and
+    *tstop*. For states, which have a (2, N) array of start and stop
+    times, all of the states which overlap the window are included.
+    """
+    if times.ndim == 2:
+        i0 = np.searchsorted(times[1], tstart, side='right')
+        i1 = np.searchsorted(times[0], tstop, side='left')
+    else:
+        i0 = np.searchsorted(times, tstart, side='left')
+        i1 = np.searchsorted(times, tstop, side='right')
+    return slice(i0, i1)
+
+
+class TimeBaseRegistry:
+    """
+    A registry which interns arrays of times, so that fields with
+    identical times all reference one shared, read-only Quantity.
+    Entries are only held by weak references.
+    """
+    def __init__(self):
+        self._bases = {}
+
+    def intern(self, times):
+        if isinstance(times, Quantity):
+            arr = times.to_value("s")
+        else:
+            arr = np.asarray(times, dtype="float64")
+        if arr.size == 0:
+            return Quantity(arr, "s")
+        key = (arr.shape, float(arr.flat[0]), float(arr.flat[-1]))
+        alive = []
+        found = None
+        for ref in self._bases.get(key, []):
+            t = ref()
+            if t is None:
+                continue
+            alive.append(ref)
+            if found is None and np.array_equal(t.value, arr):
+                found = t
+        if found is None:
+            # Copy the times, so that later changes to the caller's
+            # array cannot change the shared base
+            found = Quantity(np.array(arr, dtype="float64"), "s", copy=False)
+            found.flags.writeable = False
+            alive.append(weakref.ref(found))
+        self._bases[key] = alive
+        return found
+
+    def __len__(self):
+        return sum(ref() is not None for refs in self._bases.values()
+                   for ref in refs)
+
+
+time_bases = TimeBaseRegistry()
+
+
+def intern_times(times):
+    """
+    Return a shared, read-only Quantity in seconds for the array
+    *times*. Fields whose times are identical will receive the same
+    object, so shared time bases can be detected by identity.
+    """
+    return time_bases.intern(times)
+
+
+_date_cache = {}
+
+
+def get_dates(times):
+    """
+    Return the date strings for an array of *times*. The result is
+    cached for each times array, so that every field which shares the
+    same times also shares one array of dates.
+    """
+    key = id(times)
+    entry = _date_cache.get(key, None)
+    if entry is not None and entry[0]() is times:
+        return entry[1]
+    dates = secs2date(getattr(times, "value", times))
+    # The dates are shared by every field with these times
+    if isinstance(dates, np.ndarray):
+        dates.flags.writeable = False
+    def _remove(ref, key=key):
+        if _date_cache.get(key, (None,))[0] is ref:
+            del _date_cache[key]
+    _date_cache[key] = (weakref.ref(times, _remove), dates)
+    return dates
+
+
+def lazy_mask(mask):
+    """
+    Return None, which stands for "no bad samples", if *mask* is
+    None or all True, otherwise return *mask*.
+    """
+    if mask is None or np.all(mask):
+        return None
+    return mask
+
+
+def combine_masks(*masks):
+    """
+    Combine masks which may be None (all samples good), only
+    allocating a new mask if more than one has bad samples.
+    """
+    mask = None
+    for m in masks:
+        if m is not None:
+            mask = m if mask is None else np.logical_and(mask, m)
+    return mask
+
+
+class LazyMaskMixin:
+    # A mask of None means that there are no bad samples. A full
+    # mask is only created if someone asks for it.
+    _mask = None
+
+    @property
+    def mask(self):
+        if self._mask is None:
+            self._mask = np.ones(self.size, dtype='bool')
+        return self._mask
 
+    @mask.setter
+    def mask(self, mask):
+        self._mask = mask
 
-class APStringArray:
+    @property
+    def has_bad(self):
+        """
+        Whether or not any of the samples are bad.
+        """
+        return self._mask is not None and not np.all(self._mask)
+
+    def _index_mask(self, idxs):
+        if self._mask is None:
+            return None
+        return self._mask[idxs]
+
+
+def _code_dtype(ncat):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if ncat <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.int64
+
+
+class APStringArray(LazyMaskMixin):
+    """
+    An array of strings with times and a mask, stored as integer codes
+    into a sorted table of the distinct strings (the categories). The
+    full string array is available from ``.value``, which is built
+    once and is read-only. Assigning a new array to ``.value``
+    re-encodes it.
+    """
     def __init__(self, value, times, mask=None):
-        self.value = value
+        self._encode(value)
         self.times = times
-        if mask is None:
-            mask = np.ones(value.size, dtype='bool')
-        self.mask = mask
-        self.dtype = self.value.dtype
-        self.size = self.value.size
-        self.shape = self.value.shape
+        self._mask = lazy_mask(mask)
+
+    @classmethod
+    def from_codes(cls, codes, categories, times, mask=None):
+        """
+        Create an APStringArray directly from integer *codes* into the
+        sorted array of strings *categories*.
+        """
+        ret = cls.__new__(cls)
+        ret._set_codes(codes, categories)
+        ret.times = times
+        ret._mask = lazy_mask(mask)
+        return ret
+
+    def _encode(self, value):
+        categories, codes = np.unique(np.asarray(value), return_inverse=True)
+        codes = codes.reshape(np.shape(value))
+        self._set_codes(codes.astype(_code_dtype(categories.size)),
+                        categories)
+
+    def _set_codes(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+        self.dtype = categories.dtype
+        self.size = codes.size
+        self.shape = codes.shape
+        self._value = None
+
+    @property
+    def value(self):
+        if self._value is None:
+            # The strings are shared by every reader, so writes to
+            # them fail instead of being lost
+            value = self.categories[self.codes]
+            value.flags.writeable = False
+            self._value = value
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        if np.shape(value) != self.shape:
+            raise RuntimeError(f"Cannot set the values of an array with "
+                             f"shape {self.shape} from an array with "
+                             f"shape {np.shape(value)}!")
+        self._encode(value)
 
     def __getitem__(self, item):
-        idxs, t = find_indices(item, self.times.value)
-        mask = self.mask[idxs]
-        v = self.value[idxs]
-        if isinstance(v, np.ndarray):
-            return APStringArray(v, t, mask=mask)
+        idxs, t = find_indices(item, self.times)
+        mask = self._index_mask(idxs)
+        c = self.codes[idxs]
+        if isinstance(c, np.ndarray):
+            return APStringArray.from_codes(c, self.categories, t, mask=mask)
         else:
-            return v
+            return self.categories[c]
+
+    def window(self, tstart, tstop):
+        """
+        Return a view of this array between the times *tstart* and
+        *tstop* in seconds, which shares its data with this array.
+        """
+        slc = window_slice(self.times.value, tstart, tstop)
+        return APStringArray.from_codes(self.codes[slc], self.categories,
+                                        self.times[..., slc],
+                                        mask=self._index_mask(slc))
 
     @property
     def dates(self):
-        return CxoTime(self.times.value).date
+        return get_dates(self.times)
 
     def __repr__(self):
         return self.value.__repr__()
@@ -213,56 +503,103 @@ class APStringArray:
         return self.value.__str__()
 
     def __eq__(self, other):
+        if isinstance(other, APStringArray):
+            if other.categories is self.categories:
+                return self.codes == other.codes
+            other = other.value
+        elif isinstance(other, (str, bytes, np.str_, np.bytes_)):
+            # Compare against a single string using the integer codes
+            idx = np.searchsorted(self.categories, other)
+            if idx < self.categories.size and self.categories[idx] == other:
+                return self.codes == idx
+            return np.zeros(self.shape, dtype='bool')
         return self.value.__eq__(other)
 
     def __ne__(self, other):
-        return self.value.__eq__(other)
+        return np.logical_not(self.__eq__(other))
 
 
-class APQuantity(Quantity):
+class APQuantity(LazyMaskMixin, Quantity):
+    # If the values are stored in a compact dtype, this is the dtype
+    # they are computed with
+    _full_dtype = None
+
     def __new__(cls, value, times, unit=None, mask=None, dtype=None, copy=True,
-                order=None, ndmin=0):
+                order=None, ndmin=0, full_dtype=None):
         ret = Quantity.__new__(cls, value, unit=unit, dtype=dtype, copy=copy,
                                order=order, subok=True, ndmin=ndmin)
-        if mask is None:
-            mask = np.ones(ret.size, dtype='bool')
-        ret.mask = mask
+        ret._mask = lazy_mask(mask)
         ret.times = times
+        if full_dtype is not None and full_dtype != ret.dtype:
+            ret._full_dtype = np.dtype(full_dtype)
         return ret
 
     def __array_ufunc__(self, function, method, *inputs, **kwargs):
+        # Compact values are only a storage format, so they are
+        # upcast to their full dtype before any arithmetic
+        full_inputs = [inp.view(Quantity).astype(inp._full_dtype)
+                       if getattr(inp, "_full_dtype", None) is not None
+                       else inp for inp in inputs]
         ret = super(APQuantity, self).__array_ufunc__(function,
-                                                      method, *inputs,
+                                                      method, *full_inputs,
                                                       **kwargs)
         if ret.dtype == 'bool':
             return ret
-        mask = self.mask
         if len(inputs) == 2:
-            mask2 = getattr(inputs[1], "mask", None)
-            if mask2 is not None:
-                mask = np.logical_and(mask, mask2)
-        ret.mask = mask
+            ret._mask = combine_masks(getattr(inputs[0], "_mask", None),
+                                      getattr(inputs[1], "_mask", None))
+        else:
+            ret._mask = self._mask
         ret.times = self.times
         return ret
 
     def __getitem__(self, item):
-        idxs, t = find_indices(item, self.times.value)
-        ret = super(APQuantity, self).__getitem__(idxs)
-        mask = self.mask[idxs]
-        return APQuantity(ret.value, t, unit=self.unit, 
-                          dtype=self.dtype, mask=mask)
+        idxs, t = find_indices(item, self.times)
+        # Basic slices of the values, times, and mask are all views
+        ret = self.value[idxs]
+        mask = self._index_mask(idxs)
+        return APQuantity(ret, t, unit=self.unit, mask=mask, dtype=ret.dtype,
+                          copy=not isinstance(ret, np.ndarray),
+                          full_dtype=self._full_dtype)
+
+    def window(self, tstart, tstop):
+        """
+        Return a view of this quantity between the times *tstart* and
+        *tstop* in seconds, which shares its data with this quantity.
+        """
+        slc = window_slice(self.times.value, tstart, tstop)
+        return APQuantity(self.value[slc], self.times[..., slc],
+                          unit=self.unit, mask=self._index_mask(slc),
+                          dtype=self.dtype, copy=False,
+                          full_dtype=self._full_dtype)
 
     def to(self, unit, equivalencies=[]):
         ret = super(APQuantity, self).to(unit, equivalencies=equivalencies)
-        return APQuantity(ret.value, self.times, unit=ret.unit, mask=self.mask,
-                          dtype=ret.dtype)
+        return APQuantity(ret.value, self.times, unit=ret.unit, mask=self._mask,
+                          dtype=ret.dtype, full_dtype=self._full_dtype)
+
+    def _reduce_dtype(self, dtype):
+        # Averages of compact floats are accumulated in the full dtype
+        if dtype is None and self._full_dtype is not None and \
+                self._full_dtype.kind == "f":
+            return self._full_dtype
+        return dtype
+
+    def mean(self, axis=None, dtype=None, **kwargs):
+        return super(APQuantity, self).mean(
+            axis=axis, dtype=self._reduce_dtype(dtype), **kwargs)
+
+    def std(self, axis=None, dtype=None, **kwargs):
+        return super(APQuantity, self).std(
+            axis=axis, dtype=self._reduce_dtype(dtype), **kwargs)
+
+    def var(self, axis=None, dtype=None, **kwargs):
+        return super(APQuantity, self).var(
+            axis=axis, dtype=self._reduce_dtype(dtype), **kwargs)
 
-    _dates = None
     @property
     def dates(self):
-        if self._dates is None:
-            self._dates = CxoTime(self.times.value).date
-        return self._dates
+        return get_dates(self.times)
 
     def argmax(self, dates=False):
         idx = np.argmax(self.value)
@@ -281,6 +618,64 @@ class APQuantity(Quantity):
             return times
 
 
+def compact_values(v):
+    """
+    Return the numeric array *v* in the narrowest dtype which
+    preserves its resolution. Integer values (including floats which
+    are all integers) are stored in the smallest integer type which
+    holds them. Other values are stored as float32 if the rounding
+    error is well below the smallest spacing between distinct values.
+    Otherwise, *v* is returned unchanged.
+    """
+    v = np.asarray(v)
+    if v.dtype.kind not in "fiu" or v.size == 0:
+        return v
+    finite = np.isfinite(v)
+    if finite.all() and np.all(np.mod(v, 1) == 0):
+        vmin, vmax = v.min(), v.max()
+        for dtype in (np.uint8, np.int8, np.uint16, np.int16,
+                      np.uint32, np.int32):
+            info = np.iinfo(dtype)
+            if dtype().itemsize >= v.dtype.itemsize:
+                break
+            if vmin >= info.min and vmax <= info.max:
+                return v.astype(dtype)
+        return v
+    if v.dtype.kind != "f" or v.dtype.itemsize <= 4:
+        return v
+    vals = np.unique(v[finite])
+    if vals.size == 0:
+        return v.astype("float32")
+    if vals.size > 1:
+        resolution = np.diff(vals).min()
+    else:
+        resolution = max(abs(vals[0]), np.finfo("float32").tiny)
+    v32 = v.astype("float32")
+    with np.errstate(over="ignore", invalid="ignore"):
+        err = np.abs(v32[finite].astype(v.dtype) - v[finite]).max()
+    if err <= 1.0e-3*resolution:
+        return v32
+    return v
+
+
+def make_quantity(v, times, unit, mask=None, precision="full"):
+    """
+    Create an APQuantity from the array *v*. If *precision* is
+    "compact", the values are stored in the narrowest dtype which
+    preserves their resolution (see ``compact_values``), and are
+    upcast to their original dtype in arithmetic.
+    """
+    v = np.asarray(v)
+    if precision == "compact":
+        cv = compact_values(v)
+        return APQuantity(cv, times, unit=unit, dtype=cv.dtype, mask=mask,
+                          full_dtype=v.dtype)
+    elif precision == "full":
+        return APQuantity(v, times, unit=unit, dtype=v.dtype, mask=mask)
+    raise RuntimeError(f"Unknown precision '{precision}'! "
+                       "Must be 'full' or 'compact'.")
+
+
 units_trans = {"DEGC": "deg_C",
                "STEP": "",
                "0": "",
@@ -292,8 +687,15 @@ mit_fields = ["beptic", "blockid", "bepint",
               "relay", "rad_pcb_a", "rad_pcb_b"]
 
 
-def get_units(ftype, fname):
+def _query_units(fname):
     import Ska.tdb
+    try:
+        return Ska.tdb.msids[fname].eng_unit
+    except KeyError:
+        return None
+
+
+def get_units(ftype, fname):
     if ftype == 'states':
         unit = state_units.get(fname, '')
     else:
@@ -302,15 +704,20 @@ def get_units(ftype, fname):
         else:
             unit = msid_units.get(fname, None)
         if unit is None:
+            # Use the packaged snapshot of Ska.tdb first, and only
+            # query Ska.tdb itself for MSIDs which are not in it
             try:
-                unit = Ska.tdb.msids[fname].eng_unit
-                unit = units_trans.get(unit, unit)
-                msid_units[fname] = unit
+                unit = tdb_units(fname)
             except KeyError:
+                unit = _query_units(fname)
+            if unit is None:
                 if fname not in mit_fields:
                     mylog.warning(f"Cannot find a unit for MSID {fname}. "
                                   "Setting to dimensionless.")
                 unit = ''
+            else:
+                unit = units_trans.get(unit, unit)
+                msid_units[fname] = unit
     if unit == "DEG":
         unit = 'deg'
     if unit == "HZ":
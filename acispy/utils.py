@@ -4,6 +4,8 @@ import numpy as np
 import logging
 import sys
 import os
+import tempfile
+from acispy.tdb_tables import query_state_codes
 
 
 acispyLogger = logging.getLogger("acispy")
@@ -172,24 +174,413 @@ def moving_average(a, n=5):
     return Ska.Numpy.smooth(a, window_len=n, window='flat')
 
 
+def rolling_window_key(window):
+    """
+    The key of a rolling window in the output of ``rolling_stats``,
+    which includes the kind of window as well as its length, so that
+    a number of samples and an equal length of time are distinct.
+    """
+    if isinstance(window, (int, np.integer)):
+        return ("samples", int(window))
+    else:
+        return ("time", float(window))
+
+
+def _rolling_bounds(times, window):
+    # Index bounds [lo, hi) of the window centered on each sample, either
+    # a number of samples (integer) or a length of time in seconds
+    n = times.size
+    if isinstance(window, (int, np.integer)):
+        i = np.arange(n)
+        lo = np.clip(i - window // 2, 0, n)
+        hi = np.clip(i - window // 2 + window, 0, n)
+    else:
+        lo = np.searchsorted(times, times - 0.5 * window, side='left')
+        hi = np.searchsorted(times, times + 0.5 * window, side='right')
+    return lo, hi
+
+
+def _sliding_max_samples(x, window):
+    # The maximum of x over the window of a fixed number of samples
+    # centered on each sample, in O(n) with the van Herk/Gil-Werman
+    # algorithm: x is padded with -inf and split into blocks of the
+    # window length, so that each window is the suffix of one block
+    # followed by the prefix of the next
+    n = x.size
+    offset = window // 2
+    length = -(-(n + window - 1) // window) * window
+    padded = np.full(length, -np.inf)
+    padded[offset:offset+n] = x
+    blocks = padded.reshape(-1, window)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    i = np.arange(n)
+    return np.maximum(suffix[i], prefix[i+window-1])
+
+
+def _sliding_max_bounds(x, lo, hi):
+    # The maximum of x over the samples [lo, hi) for each sample, from a
+    # sparse table of the maxima over blocks of 2**k samples. The levels
+    # of the table are built one at a time, and each window is answered
+    # from the largest block length which fits in it, as the maximum of
+    # two overlapping blocks. This is O(n log w) for windows of up to w
+    # samples, with only one level in memory at a time
+    out = np.full(lo.size, -np.inf)
+    width = hi - lo
+    idxs = np.nonzero(width > 0)[0]
+    if idxs.size == 0:
+        return out
+    k = np.frexp(width[idxs].astype("float64"))[1] - 1
+    order = np.argsort(k, kind="stable")
+    idxs = idxs[order]
+    ends = np.searchsorted(k[order], np.arange(k.max() + 1), side="right")
+    level = x
+    start = 0
+    for j, end in enumerate(ends):
+        i = idxs[start:end]
+        out[i] = np.maximum(level[lo[i]], level[hi[i] - (1 << j)])
+        start = end
+        if end < idxs.size:
+            level = np.maximum(level[:-(1 << j)], level[(1 << j):])
+    return out
+
+
+def _rolling_max(x, window, lo, hi):
+    if isinstance(window, (int, np.integer)):
+        return _sliding_max_samples(x, int(window))
+    else:
+        return _sliding_max_bounds(x, lo, hi)
+
+
+class _RangeSelector:
+    # A wavelet matrix over the ranks of the good samples, which finds
+    # the k-th smallest good value in ranges of samples in O(log n) time,
+    # for all of the ranges at once. Only used for quantiles, since
+    # minima and maxima are found more cheaply without it
+    def __init__(self, values, good):
+        self.cn = np.concatenate([[0], np.cumsum(good)])
+        v = values[good]
+        m = v.size
+        order = np.argsort(v, kind="stable")
+        self.sorted = v[order]
+        ranks = np.empty(m, dtype="int64")
+        ranks[order] = np.arange(m)
+        self.nbits = max(int(m - 1).bit_length(), 1)
+        self.zeros = []
+        self.nzeros = []
+        for level in range(self.nbits):
+            is0 = ((ranks >> (self.nbits - 1 - level)) & 1) == 0
+            c0 = np.concatenate([[0], np.cumsum(is0)])
+            self.zeros.append(c0)
+            self.nzeros.append(c0[-1])
+            ranks = np.concatenate([ranks[is0], ranks[~is0]])
+
+    def count(self, lo, hi):
+        return self.cn[hi] - self.cn[lo]
+
+    def select(self, lo, hi, k):
+        # The k-th smallest (from 0) good value in the samples [lo, hi),
+        # which must contain more than k good samples
+        s = self.cn[lo]
+        e = self.cn[hi]
+        rank = np.zeros(s.shape, dtype="int64")
+        for level in range(self.nbits):
+            c0 = self.zeros[level]
+            zs = c0[s]
+            ze = c0[e]
+            nz = ze - zs
+            right = k >= nz
+            k = np.where(right, k - nz, k)
+            s = np.where(right, self.nzeros[level] + s - zs, zs)
+            e = np.where(right, self.nzeros[level] + e - ze, ze)
+            rank |= right.astype("int64") << (self.nbits - 1 - level)
+        return self.sorted[rank]
+
+
+def rolling_stats(values, times, windows, stats=("mean",), mask=None):
+    """
+    Compute rolling statistics of *values* over one or more centered
+    windows in a single pass.
+
+    Parameters
+    ----------
+    values : array_like
+        The data values.
+    times : array_like
+        The sorted times of the data in seconds.
+    windows : list of integers or floats
+        The window lengths. Integers are numbers of samples, floats
+        are lengths of time in seconds, which makes the windows
+        correct for irregularly sampled data.
+    stats : list, optional
+        The statistics to compute. Any of "mean", "min", "max", "std",
+        or a float between 0 and 1 for a quantile. Means and standard
+        deviations cost O(n) for each window, minima and maxima cost
+        O(n) for windows of samples and O(n log w) for windows of w
+        samples in time, and quantiles cost O(n log n).
+        Default: ("mean",)
+    mask : array_like of booleans, optional
+        Which samples are good. Bad samples and non-finite values are
+        excluded from every window. Default: None, all samples are good.
+
+    Returns
+    -------
+    A dict of arrays keyed by (stat, kind, window), where kind is
+    "samples" for integer windows and "time" for windows in seconds.
+    Windows which contain no good samples are set to NaN.
+
+    Examples
+    --------
+    >>> out = rolling_stats(v, t, [10, 3600.0], stats=["mean", "max", 0.9])
+    >>> hourly_max = out["max", "time", 3600.0]
+    >>> mean_10 = out["mean", "samples", 10]
+    """
+    values = np.asarray(values, dtype="float64")
+    times = np.asarray(times, dtype="float64")
+    n = values.size
+    good = np.isfinite(values)
+    if mask is not None:
+        good &= np.asarray(mask, dtype="bool")
+    bounds = [_rolling_bounds(times, window) for window in windows]
+    keys = [rolling_window_key(window) for window in windows]
+    out = {}
+    if "mean" in stats or "std" in stats:
+        # Subtract the mean first to keep the cumulative sums accurate
+        x0 = values[good].mean() if good.any() else 0.0
+        x = np.where(good, values - x0, 0.0)
+        cs = np.concatenate([[0.0], np.cumsum(x)])
+        cs2 = np.concatenate([[0.0], np.cumsum(x * x)])
+        cn = np.concatenate([[0], np.cumsum(good)])
+        for key, (lo, hi) in zip(keys, bounds):
+            count = cn[hi] - cn[lo]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = (cs[hi] - cs[lo]) / count
+                var = (cs2[hi] - cs2[lo]) / count - mean * mean
+            if "mean" in stats:
+                out[("mean",) + key] = mean + x0
+            if "std" in stats:
+                out[("std",) + key] = np.sqrt(np.maximum(var, 0.0))
+    extrema = [stat for stat in stats if stat in ("min", "max")]
+    if len(extrema) > 0:
+        # Bad samples can never be the maximum (or minimum) of a window
+        # which has good samples
+        cn = np.concatenate([[0], np.cumsum(good)])
+        for window, key, (lo, hi) in zip(windows, keys, bounds):
+            empty = cn[hi] == cn[lo]
+            for stat in extrema:
+                if stat == "max":
+                    v = _rolling_max(np.where(good, values, -np.inf),
+                                     window, lo, hi)
+                else:
+                    v = -_rolling_max(np.where(good, -values, -np.inf),
+                                      window, lo, hi)
+                v[empty] = np.nan
+                out[(stat,) + key] = v
+    quantiles = [stat for stat in stats
+                 if stat not in ("mean", "std", "min", "max")]
+    if len(quantiles) > 0:
+        # Quantiles are interpolated linearly in the same way as
+        # np.quantile, from the order statistics of each window
+        selector = _RangeSelector(values, good)
+        for key, (lo, hi) in zip(keys, bounds):
+            count = selector.count(lo, hi)
+            ok = count > 0
+            lo, hi, last = lo[ok], hi[ok], count[ok] - 1
+            for stat in quantiles:
+                v = np.full(n, np.nan)
+                pos = stat * last
+                j = np.floor(pos).astype("int64")
+                frac = pos - j
+                vj = selector.select(lo, hi, j)
+                vj1 = selector.select(lo, hi, np.minimum(j + 1, last))
+                v[ok] = vj + frac * (vj1 - vj)
+                out[(stat,) + key] = v
+    return out
+
+
+def binned_stats(values, times, edges, how=("mean",), mask=None):
+    """
+    Aggregate *values* into time bins in a single vectorized pass.
+
+    Parameters
+    ----------
+    values : array_like
+        The data values.
+    times : array_like
+        The sorted times of the data in seconds.
+    edges : array_like
+        The sorted edges of the bins in seconds. Each bin includes its
+        left edge, and the last bin also includes its right edge, as in
+        np.histogram. Samples outside of the edges are ignored.
+    how : list of strings, optional
+        The aggregations to compute. Any of "mean", "min", "max",
+        "std", "count". Default: ("mean",)
+    mask : array_like of booleans, optional
+        Which samples are good. Bad samples and non-finite values are
+        excluded. Default: None, all samples are good.
+
+    Returns
+    -------
+    A dict of arrays keyed by aggregation, one value per bin. Bins
+    with no good samples are set to NaN, except for "count".
+    """
+    values = np.asarray(values, dtype="float64")
+    times = np.asarray(times, dtype="float64")
+    edges = np.asarray(edges, dtype="float64")
+    nbins = edges.size - 1
+    good = np.isfinite(values)
+    if mask is not None:
+        good &= np.asarray(mask, dtype="bool")
+    idxs = np.searchsorted(edges, times, side='right') - 1
+    idxs[times == edges[-1]] = nbins - 1
+    good &= (idxs >= 0) & (idxs < nbins)
+    b = idxs[good]
+    x = values[good]
+    count = np.bincount(b, minlength=nbins)
+    out = {}
+    if "count" in how:
+        out["count"] = count.astype("float64")
+    if "mean" in how or "std" in how:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.bincount(b, weights=x, minlength=nbins) / count
+            if "std" in how:
+                dx = x - mean[b]
+                var = np.bincount(b, weights=dx * dx, minlength=nbins) / count
+                out["std"] = np.sqrt(var)
+        if "mean" in how:
+            out["mean"] = mean
+    if "min" in how or "max" in how:
+        # The bin indices are sorted, so each bin is a contiguous run
+        starts = np.flatnonzero(np.concatenate([[True], b[1:] != b[:-1]]))
+        starts = starts[starts < b.size]
+        for agg, func in [("min", np.minimum), ("max", np.maximum)]:
+            if agg in how:
+                out[agg] = np.full(nbins, np.nan)
+                if b.size > 0:
+                    out[agg][b[starts]] = func.reduceat(x, starts)
+    return out
+
+
+_leap_table = None
+
+
+def _get_leap_table():
+    # For each leap second: the time in CXC seconds at which the new
+    # value of TAI-UTC takes effect, the new value, and the time at
+    # which the leap second itself (23:59:60) begins.
+    global _leap_table
+    if _leap_table is None:
+        import erfa
+        ls = erfa.leap_seconds.get()
+        ls = ls[ls["year"] >= 1972]
+        epochs = np.array([f"{y:04d}-{m:02d}-01"
+                           for y, m in zip(ls["year"], ls["month"])],
+                          dtype="datetime64[D]")
+        utc = (epochs - np.datetime64("1998-01-01")).astype("int64") * 86400.0
+        tai_utc = np.asarray(ls["tai_utc"], dtype="float64")
+        starts = utc + tai_utc + 32.184
+        leap_starts = starts - 1.0
+        _leap_table = (starts, tai_utc, leap_starts)
+    return _leap_table
+
+
+def _put_digits(out, col, values, width):
+    for i in range(width):
+        out[:, col + width - 1 - i] = 48 + (values // 10**i) % 10
+
+
+def secs2date(secs):
+    """
+    Convert times in CXC seconds to UTC date strings in
+    YYYY:DOY:HH:MM:SS.sss format, with the same result as
+    ``CxoTime(secs).date`` but using only vectorized array
+    operations. Leap seconds are handled.
+
+    Parameters
+    ----------
+    secs : float or array_like
+        The times in seconds from the beginning of the mission.
+    """
+    secs = np.asarray(secs, dtype="float64")
+    shape = secs.shape
+    t = secs.ravel()
+    starts, tai_utc, _ = _get_leap_table()
+    # Round to milliseconds first, since times just before or at the
+    # end of a leap second may be rounded into or out of it
+    ms = (t - 32.184) * 1000.0
+    # Times within a microsecond of a half millisecond may be rounded
+    # differently by astropy, so these few are converted by CxoTime
+    near_half = np.abs(ms - np.floor(ms) - 0.5) < 1.0e-3
+    ms = np.round(ms).astype("int64")
+    starts_ms = np.round((starts - 32.184) * 1000.0).astype("int64")
+    k = np.maximum(np.searchsorted(starts_ms, ms, side='right') - 1, 0)
+    # Samples during a leap second are shown as 23:59:60.sss
+    kn = np.minimum(k + 1, starts.size - 1)
+    leap = (k + 1 < starts.size) & (ms >= starts_ms[kn] - 1000)
+    ms -= np.round(tai_utc[k] * 1000.0).astype("int64")
+    ms[leap] -= 1000
+    days = ms // 86400000
+    ms -= days * 86400000
+    dates = np.datetime64("1998-01-01", "D") + days.astype("timedelta64[D]")
+    years = dates.astype("datetime64[Y]")
+    doy = (dates - years.astype("datetime64[D]")).astype("int64") + 1
+    year = years.astype("int64") + 1970
+    sec = ms // 1000 % 60
+    sec[leap] += 1
+    out = np.empty((t.size, 21), dtype="uint8")
+    out[:, [4, 8, 11, 14]] = ord(":")
+    out[:, 17] = ord(".")
+    _put_digits(out, 0, year, 4)
+    _put_digits(out, 5, doy, 3)
+    _put_digits(out, 9, ms // 3600000, 2)
+    _put_digits(out, 12, ms // 60000 % 60, 2)
+    _put_digits(out, 15, sec, 2)
+    _put_digits(out, 18, ms % 1000, 3)
+    dates = out.view("S21").ravel().astype("U21")
+    if near_half.any():
+        from cxotime import CxoTime
+        dates[near_half] = CxoTime(t[near_half]).date
+    if len(shape) == 0:
+        return dates[0]
+    return dates.reshape(shape)
+
+
 def get_state_codes(msid):
-    import Ska.tdb
+    """
+    Get the state codes of *msid* as a dict of raw counts keyed by
+    state code, or None if it has none. The packaged snapshot of
+    Ska.tdb is used if it includes *msid*, otherwise Ska.tdb is queried.
+    """
+    from acispy.tdb_tables import tdb_state_codes
     try:
-        states = Ska.tdb.msids[msid].Tsc
-    except:
-        state_codes = None
-    else:
-        if states is None:
-            state_codes = None
-        else:
-            states = np.sort(states.data, order='LOW_RAW_COUNT')
-            state_codes = dict((state['STATE_CODE'], state['LOW_RAW_COUNT']) 
-                               for state in states)
-    return state_codes
+        return tdb_state_codes(msid)
+    except KeyError:
+        return query_state_codes(msid)
 
 
 def convert_state_code(ds, field):
-    return np.array([ds.state_codes[field].get(val, -1) for val in ds[field]])
+    """
+    Convert the state strings of the state-coded *field* in the
+    Dataset *ds* to their raw counts, with -1 for states that do not
+    have a code. Each distinct state is only looked up once, and the
+    result is cached on the Dataset.
+    """
+    data = ds[field]
+    cached = ds._state_code_cache.get(field, None)
+    if cached is not None and cached[0] is data:
+        return cached[1]
+    state_codes = ds.state_codes[field]
+    if hasattr(data, "categories"):
+        values, inverse = data.categories, data.codes
+    else:
+        values, inverse = np.unique(np.asarray(data.value),
+                                    return_inverse=True)
+    lookup = np.array([state_codes.get(val, -1) for val in values],
+                      dtype='int64')
+    codes = lookup[inverse].reshape(data.shape)
+    codes.flags.writeable = False
+    ds._state_code_cache[field] = (data, codes)
+    return codes
 
 
 lr_root = "/data/acis/LoadReviews"
@@ -225,3 +616,21 @@ def dict_to_array(a):
     for k, v in a.items():
         data[k] = getattr(v, "value", v)
     return data
+
+
+def savez_atomic(filename, **arrays):
+    """
+    Write *arrays* to the .npz file *filename* through a temporary
+    file in the same directory which is then moved into place, so that
+    the file is never seen half-written.
+    """
+    filename = os.path.abspath(filename)
+    fd, tmp = tempfile.mkstemp(suffix=".npz",
+                               dir=os.path.dirname(filename))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.unlink(tmp)
+        raise
@@ -1,8 +1,54 @@
 #!/usr/bin/env python
+import importlib.util
+import os
+import warnings
 from setuptools import setup
+from setuptools.command.build_py import build_py
+from setuptools.command.develop import develop
+
+
+def make_tdb_snapshot(filename):
+    # Generate the snapshot of Ska.tdb units and state codes, if Ska.tdb
+    # is available. tdb_tables.py is loaded by its path, so that building
+    # does not import acispy and its dependencies. Without the snapshot,
+    # acispy falls back to Ska.tdb at runtime, and the snapshot can be
+    # generated later with "python acispy/tdb_tables.py"
+    try:
+        import Ska.tdb  # noqa: F401
+    except ImportError:
+        warnings.warn("Ska.tdb is not available, so the snapshot of MSID "
+                      "units and state codes will not be generated, and "
+                      "acispy will need Ska.tdb to look them up. Run "
+                      "'python acispy/tdb_tables.py' in an environment "
+                      "with Ska.tdb to generate it.")
+        return
+    spec = importlib.util.spec_from_file_location(
+        "tdb_tables", os.path.join("acispy", "tdb_tables.py"))
+    tdb_tables = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tdb_tables)
+    tdb_tables.make_tdb_tables(filename=filename)
+
+
+class BuildPy(build_py):
+    # Generate the snapshot in the build directory
+    def run(self):
+        super().run()
+        make_tdb_snapshot(os.path.join(self.build_lib, "acispy", "data",
+                                       "tdb_tables.json.gz"))
+
+
+class Develop(develop):
+    # Generate the snapshot in place for editable installs
+    def run(self):
+        super().run()
+        make_tdb_snapshot(os.path.join("acispy", "data",
+                                       "tdb_tables.json.gz"))
+
 
 setup(name='acispy',
       packages=['acispy'],
+      package_data={'acispy': ['data/*.json.gz']},
+      cmdclass={'build_py': BuildPy, 'develop': Develop},
       use_scm_version=True,
       setup_requires=['setuptools_scm', 'setuptools_scm_git_archive'],
       description='Python tools for ACIS Ops',